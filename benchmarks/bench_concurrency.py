@@ -0,0 +1,107 @@
+"""Benchmark pemrosesan update: berurutan vs paralel dengan urutan per user.
+
+Menjalankan beban campuran (sebagian handler lambat karena I/O) lewat
+SimpleUpdateProcessor(1) dan PerUserUpdateProcessor, lalu mencetak latensi
+p50/p99 dan memastikan update dari user yang sama tetap berurutan.
+
+    python benchmarks/bench_concurrency.py --users 50 --updates 1000
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("TOKEN", "123:bench")
+os.environ.setdefault("OWNER_ID", "1")
+
+from telegram import Chat, Message, Update, User  # noqa: E402
+from telegram.ext import SimpleUpdateProcessor  # noqa: E402
+
+from run import PerUserUpdateProcessor  # noqa: E402
+
+
+def make_updates(users: int, count: int, slow_ratio: float, seed: int):
+    rng = random.Random(seed)
+    updates = []
+    for i in range(count):
+        user_id = rng.randint(1, users)
+        user = User(user_id, f"user{user_id}", False)
+        message = Message(i, datetime.now(), Chat(user_id, Chat.PRIVATE), from_user=user, text="x")
+        slow = rng.random() < slow_ratio
+        updates.append((Update(i, message=message), slow))
+    return updates
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_scenario(processor, updates, slow_ms: float, fast_ms: float):
+    latencies = []
+    seen = {}
+    violations = 0
+
+    async def handle(update, slow, enqueued):
+        nonlocal violations
+        await asyncio.sleep((slow_ms if slow else fast_ms) / 1000)
+        user_id = update.effective_user.id
+        if seen.get(user_id, -1) > update.update_id:
+            violations += 1
+        seen[user_id] = update.update_id
+        latencies.append(time.perf_counter() - enqueued)
+
+    await processor.initialize()
+    started = time.perf_counter()
+    # Sama seperti Application: satu task per update, dibuat sesuai urutan datang
+    tasks = [
+        asyncio.create_task(processor.process_update(update, handle(update, slow, time.perf_counter())))
+        for update, slow in updates
+    ]
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    await processor.shutdown()
+    return latencies, elapsed, violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--slow-ratio", type=float, default=0.1)
+    parser.add_argument("--slow-ms", type=float, default=50)
+    parser.add_argument("--fast-ms", type=float, default=2)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    updates = make_updates(args.users, args.updates, args.slow_ratio, args.seed)
+    scenarios = [
+        ("sequential", SimpleUpdateProcessor(1)),
+        (f"per-user x{args.concurrency}", PerUserUpdateProcessor(args.concurrency)),
+    ]
+
+    print(f"{args.updates} updates, {args.users} users, {args.slow_ratio:.0%} slow ({args.slow_ms}ms)")
+    print(f"{'scenario':<18}{'p50 ms':>10}{'p99 ms':>10}{'total s':>10}{'upd/s':>10}{'order':>8}")
+    for name, processor in scenarios:
+        latencies, elapsed, violations = asyncio.run(
+            run_scenario(processor, updates, args.slow_ms, args.fast_ms)
+        )
+        print(
+            f"{name:<18}"
+            f"{percentile(latencies, 50) * 1000:>10.1f}"
+            f"{percentile(latencies, 99) * 1000:>10.1f}"
+            f"{elapsed:>10.2f}"
+            f"{len(latencies) / elapsed:>10.0f}"
+            f"{'ok' if not violations else violations:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Benchmark jalur panas run.py di atas dataset sintetis.
+
+Mengukur DebtManager add/get/delete, UserManager.update_last_active,
+agregasi /stats, satu putaran scan NotificationManager dan
+check_user_joined_all_groups (bot di-stub). Hasil ditulis sebagai JSON
+agar bisa dibandingkan antar run.
+
+    python benchmarks/bench_hotpaths.py --users 1000 --debts 20
+    python benchmarks/bench_hotpaths.py --compare benchmarks/results/hotpaths-lama.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import subprocess
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+
+import datagen
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    total = sum(ordered)
+    return {
+        "n": len(ordered),
+        "mean_ms": total / len(ordered) * 1000,
+        "p50_ms": ordered[len(ordered) // 2] * 1000,
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        "max_ms": ordered[-1] * 1000,
+        "ops_per_sec": len(ordered) / total if total else 0.0
+    }
+
+
+def measure(func, args_iter):
+    samples = []
+    for args in args_iter:
+        start = time.perf_counter()
+        func(*args)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def measure_async(coro_func, args_iter):
+    async def runner():
+        samples = []
+        for args in args_iter:
+            start = time.perf_counter()
+            await coro_func(*args)
+            samples.append(time.perf_counter() - start)
+        return samples
+    return summarize(asyncio.run(runner()))
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=datagen.ROOT, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def run_benchmarks(args) -> dict:
+    import run
+
+    rng = random.Random(args.seed)
+    user_ids = [100000 + i for i in range(args.users)]
+    ops = args.ops
+    results = {}
+
+    # Data utang
+    sample = [rng.choice(user_ids) for _ in range(ops)]
+    results["debt_add"] = measure(run.DebtManager.add_debt, [
+        (user_id, {
+            "debtor_name": "Bench", "amount": "25000", "payment_date": "2030/01/01",
+            "notification_time": "09:00", "notes": ""
+        })
+        for user_id in sample
+    ])
+    results["debt_get"] = measure(run.DebtManager.get_debt, [(rng.choice(user_ids), 1) for _ in range(ops)])
+    # Cache dikosongkan agar setiap get membaca file (kasus cache miss)
+    def get_cold(user_id, debt_id):
+        run.DebtManager._cache.pop(user_id, None)
+        run.DebtManager.get_debt(user_id, debt_id)
+    results["debt_get_cold"] = measure(get_cold, [(rng.choice(user_ids), 1) for _ in range(ops)])
+    results["debt_delete"] = measure(run.DebtManager.delete_debt, [(user_id, 1) for user_id in sample])
+
+    # Data user
+    results["update_last_active"] = measure(run.UserManager.update_last_active, [(rng.choice(user_ids),) for _ in range(ops)])
+    def flush_users():
+        run.UserManager.update_last_active(user_ids[0])
+        run.UserManager._store.flush()
+    results["users_flush"] = measure(flush_users, [() for _ in range(args.repeat)])
+
+    # Agregasi /stats dan scan notifikasi (full scan semua file)
+    results["stats_aggregation"] = measure(run.DebtManager.get_global_stats, [() for _ in range(args.repeat)])
+    # Snapshot analitik: build = full scan, report = query /stats dari kolom di memori
+    results["analytics_build"] = measure(run.Analytics.build, [() for _ in range(args.repeat)])
+    snapshot = run.Analytics.get()
+    results["analytics_report"] = measure(run.Analytics.report, [(snapshot,) for _ in range(ops)])
+    notifier = object.__new__(run.NotificationManager)  # tanpa thread, pengiriman dilewati
+    notifier._bot = None
+    notifier._loop = None
+    results["notification_scan"] = measure(notifier.scan_once, [() for _ in range(args.repeat)])
+
+    # Gate join group dengan bot stub
+    async def get_chat_member(chat_id, user_id):
+        return SimpleNamespace(status=run.ChatMember.MEMBER)
+    context = SimpleNamespace(bot=SimpleNamespace(get_chat_member=get_chat_member))
+    results["join_gate_cached"] = measure_async(
+        run.check_user_joined_all_groups, [(rng.choice(user_ids), context) for _ in range(ops)]
+    )
+    stale = (datetime.now() - timedelta(hours=1)).isoformat()
+    def expire(user_id):
+        run.JoinGroupManager.load_join_users()["users"][str(user_id)]["last_checked"] = stale
+        return user_id
+    results["join_gate_refresh"] = measure_async(
+        run.check_user_joined_all_groups, [(expire(rng.choice(user_ids)), context) for _ in range(ops)]
+    )
+    return results
+
+
+def compare(current: dict, previous_path: str):
+    with open(previous_path, 'r', encoding='utf-8') as f:
+        previous = json.load(f)["results"]
+    print(f"\n{'benchmark':<22}{'lama p50':>12}{'baru p50':>12}{'rasio':>8}")
+    for name, stats in current.items():
+        old = previous.get(name)
+        if not old:
+            continue
+        ratio = stats["p50_ms"] / old["p50_ms"] if old["p50_ms"] else float("inf")
+        flag = "  <-- lebih lambat" if ratio > 1.2 else ""
+        print(f"{name:<22}{old['p50_ms']:>12.3f}{stats['p50_ms']:>12.3f}{ratio:>8.2f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--debts", type=int, default=20, help="rata-rata utang per user")
+    parser.add_argument("--groups", type=int, default=2)
+    parser.add_argument("--ops", type=int, default=500, help="jumlah operasi untuk jalur per-user")
+    parser.add_argument("--repeat", type=int, default=5, help="jumlah ulangan untuk full scan")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--data", help="direktori dataset yang sudah ada (default: generate baru)")
+    parser.add_argument("--output", help="file hasil JSON (default: benchmarks/results/hotpaths-<waktu>.json)")
+    parser.add_argument("--compare", help="file hasil sebelumnya untuk dibandingkan")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else os.path.join(
+        RESULTS_DIR, f"hotpaths-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    previous = os.path.abspath(args.compare) if args.compare else None
+    # Tanpa lease, scan_once langsung kembali (bukan leader) dan yang terukur hanya loop kosong
+    os.environ["LEADER_ELECTION"] = "0"
+
+    workdir = datagen.prepare_workdir(args.data)
+    if args.data and os.path.exists("users.json"):
+        dataset = {"users": args.users, "debts_per_user": args.debts, "reused": True}
+    else:
+        start = time.perf_counter()
+        dataset = datagen.generate(args.users, args.debts, args.groups, args.seed)
+        dataset["generate_s"] = time.perf_counter() - start
+
+    results = run_benchmarks(args)
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "workdir": str(workdir),
+            "dataset": dataset,
+            "ops": args.ops,
+            "repeat": args.repeat
+        },
+        "results": results
+    }
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'benchmark':<22}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'ops/s':>10}")
+    for name, stats in results.items():
+        print(
+            f"{name:<22}{stats['n']:>6}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}"
+            f"{stats['max_ms']:>10.3f}{stats['ops_per_sec']:>10.0f}"
+        )
+    print(f"\nHasil ditulis ke {output}")
+    if previous:
+        compare(results, previous)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""Generator dataset sintetis untuk benchmark.
+
+Menulis database/<user_id>.json, users.json, join_groups.json dan
+join_users.json untuk N user x M utang di direktori kerja.
+
+    python benchmarks/datagen.py --users 1000 --debts 20 --out /tmp/kapanbayar-data
+"""
+import os
+import sys
+import json
+import random
+import argparse
+import tempfile
+from pathlib import Path
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_NAMES = ["Budi", "Siti", "Andi", "Dewi", "Rina", "Agus", "Joko", "Lina", "Eko", "Maya", "Tono", "Putri"]
+LAST_NAMES = ["", "Santoso", "Wijaya", "Lestari", "Pratama", "Saputra", "Hidayat", "Kurnia"]
+NOTES = ["", "", "Utang makan siang", "Pinjam untuk bensin", "Patungan kado", "Cicilan HP", "Bayar kos"]
+
+
+def prepare_workdir(path: str = None) -> Path:
+    """Pindah ke direktori kerja (sementara jika kosong) lalu import run.py dari sana"""
+    workdir = Path(path) if path else Path(tempfile.mkdtemp(prefix="kapanbayar-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    os.chdir(workdir)
+    os.environ.setdefault("TOKEN", "123:bench")
+    os.environ.setdefault("OWNER_ID", "1")
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    return workdir
+
+
+def make_debt(rng: random.Random, debt_id: int, now: datetime) -> dict:
+    created = now - timedelta(days=rng.randint(0, 365), seconds=rng.randint(0, 86400))
+    amount = rng.choice([rng.randint(1, 500) * 1000, rng.randint(1, 500) * 1000, rng.randint(5, 200)])
+    debt = {
+        "debtor_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}".strip(),
+        # Campuran format yang dipakai user: angka penuh dan singkatan k
+        "amount": str(amount) if amount >= 1000 else f"{amount}k",
+        "payment_date": "",
+        "notification_time": "",
+        "notes": rng.choice(NOTES),
+        "id": debt_id,
+        "created_at": created.isoformat()
+    }
+    if rng.random() < 0.8:
+        due = now.date() + timedelta(days=rng.randint(-60, 120))
+        debt["payment_date"] = due.strftime("%Y/%m/%d")
+        debt["notification_time"] = f"{rng.randint(6, 21):02d}:{rng.choice(['00', '15', '30', '45'])}"
+    if rng.random() < 0.1 and debt["payment_date"]:
+        debt["recurrence"] = {
+            "freq": rng.choice(["weekly", "monthly"]),
+            "count": rng.randint(3, 12),
+            "anchor": debt["payment_date"],
+            "index": 0
+        }
+    if rng.random() < 0.15:
+        total = amount * 1000 if amount < 1000 else amount
+        paid = total // rng.randint(2, 5)
+        debt["payments"] = [[int(created.timestamp()), paid]]  # Format sama dengan record_payment: [epoch, jumlah]
+        debt["remaining"] = total - paid
+    return debt
+
+
+def generate(users: int, debts: int, groups: int = 2, seed: int = 1) -> dict:
+    """Menulis dataset di direktori kerja saat ini, mengembalikan ringkasannya"""
+    from run import DebtManager, DATABASE_DIR, USERS_FILE, JOIN_FILE, JOIN_USERS_FILE
+
+    rng = random.Random(seed)
+    now = datetime.now()
+    DATABASE_DIR.mkdir(exist_ok=True)
+    group_names = [f"grup_bench_{i}" for i in range(groups)]
+    user_docs = {}
+    join_docs = {}
+    total_debts = 0
+
+    for index in range(users):
+        user_id = 100000 + index
+        # Jumlah utang per user bervariasi di sekitar rata-rata M
+        count = max(0, int(rng.gauss(debts, debts / 3))) if debts else 0
+        data = {
+            "debts": [make_debt(rng, debt_id, now) for debt_id in range(1, count + 1)],
+            "notification_interval": rng.choice([0, 5, 15, 60]),
+            "is_notification_paused": rng.random() < 0.05
+        }
+        DebtManager._ensure_summary(data)
+        with open(DATABASE_DIR / f"{user_id}.json", 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        total_debts += count
+
+        joined = now - timedelta(days=rng.randint(0, 400))
+        user_docs[str(user_id)] = {
+            "username": f"user{user_id}",
+            "first_name": rng.choice(FIRST_NAMES),
+            "joined_at": joined.isoformat(),
+            "last_active": (joined + timedelta(days=rng.randint(0, 30))).isoformat()
+        }
+        join_docs[str(user_id)] = {
+            "groups_status": {group: rng.random() < 0.9 for group in group_names},
+            "last_checked": (now - timedelta(minutes=rng.randint(0, 30))).isoformat()
+        }
+
+    for path, payload in (
+        (USERS_FILE, {"users": user_docs}),
+        (JOIN_FILE, {"groups": group_names}),
+        (JOIN_USERS_FILE, {"users": join_docs})
+    ):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+
+    return {"users": users, "debts_per_user": debts, "total_debts": total_debts, "groups": groups, "seed": seed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--debts", type=int, default=20, help="rata-rata utang per user")
+    parser.add_argument("--groups", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="direktori tujuan (default: direktori sementara)")
+    args = parser.parse_args()
+
+    workdir = prepare_workdir(args.out)
+    summary = generate(args.users, args.debts, args.groups, args.seed)
+    print(json.dumps({"workdir": str(workdir), **summary}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
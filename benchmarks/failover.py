@@ -0,0 +1,153 @@
+"""Uji failover leader election dengan beberapa proses bot di satu direktori data.
+
+Setiap proses menjalankan LeaderElection.renew() seperti bot asli dan
+melaporkan holds_lease() setiap 50 ms. Leader dimatikan paksa (SIGKILL,
+seperti crash) lalu dihentikan normal (melepas lease). Skrip mengukur
+waktu sampai leader baru muncul dan memastikan tidak pernah ada dua leader
+pada saat yang sama.
+
+    python benchmarks/failover.py --instances 3 --ttl 2
+"""
+import os
+import sys
+import time
+import queue
+import signal
+import argparse
+import tempfile
+import multiprocessing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_INTERVAL = 0.05
+
+
+def instance(workdir: str, ttl: float, events, stop):
+    """Satu instance bot: hanya bagian leader election yang dijalankan"""
+    os.chdir(workdir)
+    os.environ.update({"TOKEN": "123:bench", "OWNER_ID": "1", "LEADER_LEASE_TTL": str(ttl)})
+    sys.path.insert(0, ROOT)
+    import run
+
+    next_renew = 0.0
+    while not stop.is_set():
+        now = time.monotonic()
+        if now >= next_renew:
+            try:
+                run.LeaderElection.renew()
+            except Exception as e:
+                print(f"[{os.getpid()}] renew gagal: {e}", file=sys.stderr)
+            next_renew = now + ttl / 3
+        events.put((os.getpid(), time.time(), run.LeaderElection.holds_lease()))
+        time.sleep(SAMPLE_INTERVAL)
+    run.LeaderElection.resign()
+
+
+def leader_intervals(samples):
+    """Rentang waktu (awal, akhir) saat setiap proses melaporkan dirinya leader"""
+    intervals = []
+    for pid, points in samples.items():
+        start = last = None
+        for t, leader in sorted(points):
+            if leader:
+                start = t if start is None else start
+                last = t
+            elif start is not None:
+                intervals.append((pid, start, last))
+                start = None
+        if start is not None:
+            intervals.append((pid, start, last))
+    return intervals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--instances", type=int, default=3)
+    parser.add_argument("--ttl", type=float, default=2.0, help="LEADER_LEASE_TTL untuk uji (detik)")
+    args = parser.parse_args()
+    if args.instances < 3:
+        parser.error("minimal 3 instance (dua leader dimatikan)")
+
+    ctx = multiprocessing.get_context("spawn")
+    workdir = tempfile.mkdtemp(prefix="kapanbayar-failover-")
+    events = ctx.Queue()
+    processes = {}
+    for _ in range(args.instances):
+        stop = ctx.Event()
+        process = ctx.Process(target=instance, args=(workdir, args.ttl, events, stop), daemon=True)
+        process.start()
+        processes[process.pid] = (process, stop)
+
+    samples = {pid: [] for pid in processes}
+    current = {}
+
+    def drain(until: float):
+        while time.time() < until:
+            try:
+                pid, t, leader = events.get(timeout=SAMPLE_INTERVAL)
+            except queue.Empty:
+                continue
+            samples[pid].append((t, leader))
+            current[pid] = leader
+
+    def wait_for_leader(exclude, timeout: float):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            drain(time.time() + SAMPLE_INTERVAL)
+            leaders = [pid for pid, leader in current.items() if leader and pid not in exclude]
+            if leaders:
+                return leaders[0], time.time()
+        return None, None
+
+    bound = args.ttl + args.ttl / 3 + 1.0
+    leader, _ = wait_for_leader(set(), timeout=10 + bound)
+    if leader is None:
+        print("❌ Tidak ada leader setelah start")
+        return 1
+    print(f"{args.instances} instance, TTL {args.ttl:g} s, leader awal: {leader}")
+
+    failed = False
+    dead = set()
+    for mode in ("crash", "graceful"):
+        drain(time.time() + args.ttl)  # beri waktu lease diperpanjang beberapa kali
+        process, stop = processes[leader]
+        killed_at = time.time()
+        if mode == "crash":
+            os.kill(leader, signal.SIGKILL)
+        else:
+            stop.set()
+        process.join()
+        dead.add(leader)
+        current.pop(leader, None)
+
+        new_leader, found_at = wait_for_leader(dead, timeout=bound * 2)
+        if new_leader is None:
+            print(f"❌ {mode}: tidak ada leader baru")
+            failed = True
+            break
+        elapsed = found_at - killed_at
+        status = "ok" if elapsed <= bound else f"lebih lambat dari batas {bound:.1f} s"
+        print(f"{mode:<9} {leader} -> {new_leader}: leader baru setelah {elapsed:.2f} s ({status})")
+        failed = failed or elapsed > bound
+        leader = new_leader
+
+    drain(time.time() + 0.5)
+    for pid, (process, stop) in processes.items():
+        if pid not in dead:
+            stop.set()
+            process.join()
+
+    intervals = sorted(leader_intervals(samples), key=lambda item: item[1])
+    overlaps = [
+        (a, b) for a, b in zip(intervals, intervals[1:])
+        if a[0] != b[0] and b[1] <= a[2]
+    ]
+    if overlaps:
+        print(f"❌ {len(overlaps)} kali dua leader bersamaan: {overlaps}")
+        failed = True
+    else:
+        print(f"✅ Tidak ada dua leader bersamaan ({sum(len(points) for points in samples.values())} sampel)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
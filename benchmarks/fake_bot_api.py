@@ -0,0 +1,230 @@
+"""Server tiruan Telegram Bot API untuk uji beban.
+
+Mencatat setiap pemanggilan method, menambahkan latensi buatan, dan bisa
+membalas 429 (retry_after) sesuai permintaan. Jalankan bot dengan
+BOT_API_URL=http://127.0.0.1:<port> agar semua request diarahkan ke sini.
+
+Server berjalan di proses sendiri agar tidak berebut CPU dengan bot yang
+diuji. Endpoint kontrol:
+    GET  /_stats    hitungan pemanggilan per method, 429, latensi
+    POST /_control  ubah konfigurasi (JSON), {"reset": true} untuk nol-kan hitungan
+
+    python benchmarks/fake_bot_api.py --port 8081 --latency-ms 50
+"""
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import multiprocessing
+from collections import Counter
+
+import httpx
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+from tornado.web import Application, RequestHandler
+
+BOT_USER = {"id": 424242, "is_bot": True, "first_name": "KapanBayar Bench", "username": "KapanBayarBot"}
+CONFIG_FIELDS = ("latency_ms", "jitter_ms", "rate_limit_ratio", "retry_after", "member_status")
+
+
+class FakeBotApi:
+    """State server: konfigurasi latensi/429 dan hitungan pemanggilan"""
+
+    def __init__(self, latency_ms: float = 30, jitter_ms: float = 10, rate_limit_ratio: float = 0.0,
+                 retry_after: int = 1, member_status: str = "member", seed: int = 1):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self.member_status = member_status
+        self.rng = random.Random(seed)
+        self.calls = Counter()
+        self.rate_limited = Counter()
+        self.latencies = []
+        self._message_id = 0
+
+    def configure(self, **config):
+        for key in CONFIG_FIELDS:
+            if key in config:
+                setattr(self, key, config[key])
+        if config.get("reset"):
+            self.calls.clear()
+            self.rate_limited.clear()
+            self.latencies.clear()
+
+    def snapshot(self) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            "calls": dict(self.calls),
+            "rate_limited": dict(self.rate_limited),
+            "total": sum(self.calls.values()),
+            "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+            "config": {key: getattr(self, key) for key in CONFIG_FIELDS}
+        }
+
+    def make_app(self) -> Application:
+        return Application([
+            (r"/_stats", StatsHandler, {"api": self}),
+            (r"/_control", ControlHandler, {"api": self}),
+            (r"/bot[^/]+/(\w+)", BotMethodHandler, {"api": self}),
+        ])
+
+    def next_message(self, chat_id, **fields) -> dict:
+        self._message_id += 1
+        return {
+            "message_id": self._message_id,
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id or 0), "type": "private"},
+            "from": BOT_USER,
+            **fields
+        }
+
+    def result_for(self, method: str, params: dict):
+        chat_id = params.get("chat_id")
+        if method == "getMe":
+            return BOT_USER
+        if method in ("sendMessage", "editMessageText"):
+            return self.next_message(chat_id, text=params.get("text", ""))
+        if method == "sendPhoto":
+            photo = [{"file_id": "bench-photo", "file_unique_id": "bench-photo-u", "width": 1, "height": 1}]
+            return self.next_message(chat_id, photo=photo, caption=params.get("caption"))
+        if method in ("sendDocument", "sendVideo"):
+            document = {"file_id": "bench-doc", "file_unique_id": "bench-doc-u"}
+            return self.next_message(chat_id, document=document)
+        if method == "copyMessage":
+            self._message_id += 1
+            return {"message_id": self._message_id}
+        if method == "forwardMessage":
+            return self.next_message(chat_id, text="forwarded")
+        if method == "getChatMember":
+            user_id = int(params.get("user_id", 0))
+            return {"status": self.member_status, "user": {"id": user_id, "is_bot": False, "first_name": "User"}}
+        return True
+
+
+class BotMethodHandler(RequestHandler):
+    def initialize(self, api: FakeBotApi):
+        self.api = api
+
+    def _params(self) -> dict:
+        content_type = self.request.headers.get("Content-Type", "")
+        if content_type.startswith("application/json") and self.request.body:
+            return json.loads(self.request.body)
+        return {key: values[-1].decode("utf-8", "replace") for key, values in self.request.body_arguments.items()}
+
+    async def post(self, method: str):
+        api = self.api
+        started = time.perf_counter()
+        api.calls[method] += 1
+        delay = max(0.0, api.latency_ms + api.rng.uniform(-api.jitter_ms, api.jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+
+        self.set_header("Content-Type", "application/json")
+        if method != "getMe" and api.rate_limit_ratio and api.rng.random() < api.rate_limit_ratio:
+            api.rate_limited[method] += 1
+            self.set_status(429)
+            self.write(json.dumps({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {api.retry_after}",
+                "parameters": {"retry_after": api.retry_after}
+            }))
+        else:
+            self.write(json.dumps({"ok": True, "result": api.result_for(method, self._params())}))
+        api.latencies.append(time.perf_counter() - started)
+
+    get = post
+
+
+class StatsHandler(RequestHandler):
+    def initialize(self, api: FakeBotApi):
+        self.api = api
+
+    def get(self):
+        self.write(self.api.snapshot())
+
+
+class ControlHandler(RequestHandler):
+    def initialize(self, api: FakeBotApi):
+        self.api = api
+
+    def post(self):
+        self.api.configure(**json.loads(self.request.body or b"{}"))
+        self.write(self.api.snapshot())
+
+
+def serve(port: int = 0, ready=None, **config):
+    """Menjalankan server sampai proses dihentikan; port yang dipakai dikirim lewat ready"""
+    # 429 yang disengaja tidak perlu dicetak sebagai warning akses
+    logging.getLogger("tornado.access").setLevel(logging.ERROR)
+
+    async def main():
+        api = FakeBotApi(**config)
+        sockets = bind_sockets(port, "127.0.0.1")
+        HTTPServer(api.make_app()).add_sockets(sockets)
+        bound = sockets[0].getsockname()[1]
+        if ready is not None:
+            ready.send(bound)
+        else:
+            print(f"Fake Bot API: http://127.0.0.1:{bound}")
+        await asyncio.Event().wait()
+    asyncio.run(main())
+
+
+class FakeBotApiProcess:
+    """Menjalankan FakeBotApi di proses terpisah dan mengontrolnya lewat HTTP"""
+
+    def __init__(self, **config):
+        self.config = config
+        self.process = None
+        self.url = None
+        self._client = None
+
+    def start(self) -> str:
+        parent, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=serve, kwargs={"ready": child, **self.config}, daemon=True)
+        self.process.start()
+        self.url = f"http://127.0.0.1:{parent.recv()}"
+        return self.url
+
+    def stop(self):
+        if self.process:
+            self.process.terminate()
+            self.process.join()
+
+    async def _request(self, method: str, path: str, payload: dict = None) -> dict:
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=self.url, timeout=30)
+        response = await self._client.request(method, path, json=payload)
+        response.raise_for_status()
+        return response.json()
+
+    async def configure(self, **config) -> dict:
+        return await self._request("POST", "/_control", config)
+
+    async def stats(self) -> dict:
+        return await self._request("GET", "/_stats")
+
+    async def close(self):
+        if self._client:
+            await self._client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=30)
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+    serve(
+        args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        rate_limit_ratio=args.rate_limit_ratio, retry_after=args.retry_after
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""Uji beban: replay Update sintetis lewat Application asli ke Bot API tiruan.
+
+Setiap skenario (menu, tambah utang, broadcast saat ramai, user belum join)
+dijalankan lewat handler yang sama dengan bot produksi. Hasil: throughput,
+persentil latensi per update dan jumlah pemanggilan API per method.
+
+    python benchmarks/loadtest.py --users 200 --updates 3000
+    python benchmarks/loadtest.py --scenarios menu,broadcast --rate-limit-ratio 0.05
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+from datetime import datetime
+
+import datagen
+from fake_bot_api import FakeBotApiProcess, BOT_USER
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+OWNER_ID = 1
+SCENARIOS = ["menu", "debt_add", "broadcast", "gated"]
+
+
+class UpdateFactory:
+    """Membuat payload Update (format JSON Bot API)"""
+
+    def __init__(self):
+        self.update_id = 0
+
+    def _user(self, user_id: int) -> dict:
+        return {"id": user_id, "is_bot": False, "first_name": "User", "username": f"user{user_id}"}
+
+    def _message(self, user_id: int, text: str, **extra) -> dict:
+        self.update_id += 1
+        message = {
+            "message_id": self.update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": self._user(user_id),
+            "text": text,
+            **extra
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return message
+
+    def message(self, user_id: int, text: str, **extra) -> dict:
+        message = self._message(user_id, text, **extra)
+        return {"update_id": self.update_id, "message": message}
+
+    def callback(self, user_id: int, data: str) -> dict:
+        self.update_id += 1
+        bot_message = {
+            "message_id": self.update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": BOT_USER,
+            "text": "Daftar utang"
+        }
+        return {
+            "update_id": self.update_id,
+            "callback_query": {
+                "id": str(self.update_id),
+                "from": self._user(user_id),
+                "chat_instance": str(user_id),
+                "data": data,
+                "message": bot_message
+            }
+        }
+
+
+def interleave(sequences, rng: random.Random, total: int):
+    """Gabungkan urutan per user secara acak, urutan dalam satu user tetap terjaga"""
+    cursors = {user_id: 0 for user_id in sequences}
+    result = []
+    user_ids = list(sequences)
+    while len(result) < total:
+        user_id = rng.choice(user_ids)
+        steps = sequences[user_id]
+        result.append(steps[cursors[user_id] % len(steps)](user_id))
+        cursors[user_id] += 1
+    return result
+
+
+def menu_updates(factory, user_ids, total, rng):
+    steps = [
+        lambda uid: factory.message(uid, "📋 Daftar Utang"),
+        lambda uid: factory.callback(uid, "page_list_1"),
+        lambda uid: factory.message(uid, "👥 Per Penghutang"),
+        lambda uid: factory.message(uid, "⬅️ Kembali ke Menu"),
+    ]
+    return interleave({uid: steps for uid in user_ids}, rng, total)
+
+
+def debt_add_updates(factory, user_ids, total, rng):
+    steps = [
+        lambda uid: factory.message(uid, "➕ Tambah Utang"),
+        lambda uid: factory.message(uid, f"Beban {rng.randint(1, 999)} | {rng.randint(1, 500)}k | 2030/01/01 | 09:00 | load test"),
+    ]
+    return interleave({uid: steps for uid in user_ids}, rng, total)
+
+
+async def replay(run, app, payloads, rate: float) -> dict:
+    """Mengirim update seperti Application.start: satu task per update lewat update processor"""
+    from telegram import Update
+
+    updates = [Update.de_json(payload, app.bot) for payload in payloads]
+    latencies = []
+
+    async def handle(update, enqueued):
+        await app.update_processor.process_update(update, app.process_update(update))
+        latencies.append(time.perf_counter() - enqueued)
+
+    tasks = []
+    started = time.perf_counter()
+    for index, update in enumerate(updates):
+        if rate:
+            delay = started + index / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(handle(update, time.perf_counter())))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    pick = lambda pct: ordered[min(len(ordered) - 1, int(len(ordered) * pct))] * 1000
+    return {
+        "updates": len(ordered),
+        "elapsed_s": elapsed,
+        "throughput_per_s": len(ordered) / elapsed if elapsed else 0.0,
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": ordered[-1] * 1000 if ordered else 0.0
+    }
+
+
+async def run_scenario(name, run, app, api, args, rng, counters) -> dict:
+    factory = UpdateFactory()
+    user_ids = [100000 + i for i in range(args.users)]
+    await api.configure(reset=True)
+    counters["errors"] = 0
+    drops_before = sum(run.FloodLimiter._drops.values())
+    extra = {}
+
+    if name == "menu":
+        payloads = menu_updates(factory, user_ids, args.updates, rng)
+    elif name == "debt_add":
+        payloads = debt_add_updates(factory, user_ids, args.updates, rng)
+    elif name == "broadcast":
+        # Owner membalas pesan dengan /broadcast, di tengah beban menu
+        original = factory._message(OWNER_ID, "📢 Pengumuman uji beban")
+        broadcast = factory.message(OWNER_ID, "/broadcast", reply_to_message=original)
+        payloads = [broadcast] + menu_updates(factory, user_ids, args.updates, rng)
+        extra["broadcast_recipients"] = run.UserManager.get_total_users()
+    elif name == "gated":
+        # Group wajib join baru, semua user dianggap belum join
+        run.JoinGroupManager.add_group("grup_wajib_bench")
+        await api.configure(member_status="left")
+        payloads = menu_updates(factory, user_ids, args.updates, rng)
+    else:
+        raise ValueError(name)
+
+    try:
+        result = await replay(run, app, payloads, args.rate)
+    finally:
+        if name == "gated":
+            groups = run.JoinGroupManager.get_all_groups()
+            run.JoinGroupManager.remove_group(groups.index("grup_wajib_bench"))
+            await api.configure(member_status="member")
+
+    api_stats = await api.stats()
+    result.update(extra)
+    result.update({
+        "api_calls": api_stats["calls"],
+        "api_calls_total": api_stats["total"],
+        "api_calls_per_update": api_stats["total"] / max(1, result["updates"]),
+        "api_rate_limited": api_stats["rate_limited"],
+        "api_p50_ms": api_stats["p50_ms"],
+        "handler_errors": counters["errors"],
+        "flood_drops": sum(run.FloodLimiter._drops.values()) - drops_before
+    })
+    return result
+
+
+async def main_async(args, api) -> dict:
+    # Konfigurasi harus ada sebelum run.py di-import
+    os.environ["BOT_API_URL"] = api.url
+    os.environ["OWNER_ID"] = str(OWNER_ID)
+    os.environ["FLOOD_RATE"] = str(args.flood_rate)
+    os.environ["FLOOD_BURST"] = str(args.flood_burst)
+    workdir = datagen.prepare_workdir(args.data)
+    dataset = datagen.generate(args.users, args.debts, groups=0, seed=args.seed)
+
+    import run
+    run.setup_logging()
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+    if not args.notifier:
+        # Tanpa thread pengingat agar hitungan API per skenario tidak tercampur
+        run.NotificationManager._instance = object.__new__(run.NotificationManager)
+        run.NotificationManager._instance._thread = None
+
+    app = run.build_application(webhook=True)
+    counters = {"errors": 0}
+
+    async def count_errors(update, context):
+        counters["errors"] += 1
+    app.add_error_handler(count_errors)
+
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    await app.start()
+
+    rng = random.Random(args.seed)
+    results = {}
+    try:
+        for name in args.scenarios:
+            results[name] = await run_scenario(name, run, app, api, args, rng, counters)
+            stats = results[name]
+            print(
+                f"{name:<10}{stats['updates']:>7}{stats['throughput_per_s']:>10.0f}"
+                f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}"
+                f"{stats['api_calls_total']:>8}{stats['handler_errors']:>7}{stats['flood_drops']:>7}"
+            )
+    finally:
+        await app.stop()
+        if app.post_stop:
+            await app.post_stop(app)
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+        await api.close()
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "workdir": str(workdir),
+            "dataset": dataset,
+            "latency_ms": args.latency_ms,
+            "rate_limit_ratio": args.rate_limit_ratio,
+            "rate": args.rate,
+            "max_concurrent_updates": run.MAX_CONCURRENT_UPDATES,
+            "startup_ms": {name: elapsed * 1000 for name, elapsed in run.Startup.timings.items()},
+            "time_to_first_response_s": run.Startup.first_response[0] if run.Startup.first_response else None
+        },
+        "results": results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--debts", type=int, default=10, help="rata-rata utang per user")
+    parser.add_argument("--updates", type=int, default=2000, help="jumlah update per skenario")
+    parser.add_argument("--rate", type=float, default=0, help="update per detik (0 = secepat mungkin)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--latency-ms", type=float, default=30)
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="porsi request yang dibalas 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--flood-rate", type=float, default=1000, help="FLOOD_RATE saat uji (default longgar)")
+    parser.add_argument("--flood-burst", type=int, default=1000)
+    parser.add_argument("--notifier", action="store_true", help="jalankan juga thread pengingat")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--data", help="direktori kerja (default: direktori sementara)")
+    parser.add_argument("--output", help="file hasil JSON (default: benchmarks/results/loadtest-<waktu>.json)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"skenario tidak dikenal: {', '.join(sorted(unknown))}")
+
+    output = os.path.abspath(args.output) if args.output else os.path.join(
+        RESULTS_DIR, f"loadtest-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    print(f"{'scenario':<10}{'upd':>7}{'upd/s':>10}{'p50':>9}{'p95':>9}{'p99':>9}{'api':>8}{'err':>7}{'drop':>7}")
+    api = FakeBotApiProcess(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        rate_limit_ratio=args.rate_limit_ratio, retry_after=args.retry_after, seed=args.seed
+    )
+    api.start()
+    try:
+        report = asyncio.run(main_async(args, api))
+    finally:
+        api.stop()
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nHasil ditulis ke {output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,12 +6,45 @@ Bot untuk mencatat dan mengingatkan utang dengan fitur lengkap
 """
 
 import os
+import io
+import sys
+import queue
+import atexit
+import csv
+import gzip
 import json
+import re
+import hmac
+import signal
+import hashlib
+import socket
+import sqlite3
+import bisect
+import asyncio
 import logging
+import tarfile
+import tempfile
+import weakref
 import threading
 import time
+import calendar
+import functools
+import contextlib
+import contextvars
+import cProfile
+import pstats
+import marshal
+from array import array
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows: lock antar proses tidak tersedia, hanya lock antar thread
+from collections import Counter, OrderedDict, deque
+from decimal import Decimal, InvalidOperation
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -27,13 +60,25 @@ from telegram import (
 )
 from telegram.ext import (
     Application, 
+    BasePersistence,
+    PersistenceInput,
     CommandHandler, 
     CallbackQueryHandler, 
     MessageHandler, 
     ContextTypes,
+    BaseUpdateProcessor,
+    TypeHandler,
+    ApplicationHandlerStop,
     filters
 )
 from telegram.constants import ParseMode
+from telegram.error import BadRequest
+from telegram.request import HTTPXRequest
+from tornado.httpserver import HTTPServer
+from tornado.web import Application as TornadoApplication, RequestHandler
+
+# Titik awal pengukuran waktu startup
+IMPORTED_AT = time.perf_counter()
 
 # Load environment variables
 load_dotenv()
@@ -43,16 +88,175 @@ TOKEN = os.getenv('TOKEN')
 OWNER_ID = int(os.getenv('OWNER_ID', 0))
 BOT_USERNAME = "KapanBayarBot"
 
-# Setup logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+# Mode server: polling (default) atau webhook
+BOT_MODE = os.getenv('BOT_MODE', 'polling').lower()
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')  # URL publik, contoh: https://bot.example.com
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', 8443))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'webhook')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv('WEBHOOK_DRAIN_TIMEOUT', 30))
+
+# Alamat Bot API (opsional), untuk server Bot API lokal atau pengujian beban
+BOT_API_URL = os.getenv('BOT_API_URL', '').rstrip('/')
+
+# Jumlah update yang diproses bersamaan (update dari user yang sama tetap berurutan)
+MAX_CONCURRENT_UPDATES = int(os.getenv('MAX_CONCURRENT_UPDATES', 64))
+
+# Anti-flood per user (token bucket): isi ulang FLOOD_RATE token/detik, maksimal FLOOD_BURST
+FLOOD_RATE = float(os.getenv('FLOOD_RATE', 1))
+FLOOD_BURST = int(os.getenv('FLOOD_BURST', 5))
+FLOOD_MAX_BUCKETS = 10000  # bucket user aktif yang disimpan di memori (LRU)
+FLOOD_WARN_INTERVAL = 10  # detik, jeda minimal antar pesan "pelan-pelan" per user
+
+# Endpoint metrik Prometheus lokal (0 = nonaktif)
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+METRICS_LISTEN = os.getenv('METRICS_LISTEN', '127.0.0.1')
+
+# Thread pool untuk operasi disk, agar event loop tidak pernah menunggu disk
+IO_WORKERS = int(os.getenv('IO_WORKERS', 4))
+# Interval (detik) penulisan data user/join yang dilayani dari memori
+STORE_FLUSH_INTERVAL = float(os.getenv('STORE_FLUSH_INTERVAL', 5))
+
+# Logging: LOG_FORMAT text atau json
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+LOG_RATE_WINDOW = 60  # detik
+LOG_RATE_BURST = 5  # warning/error maksimal per baris kode per window, sisanya ditekan
+LOG_QUEUE_SIZE = 10000  # record yang menunggu ditulis; jika penuh record dibuang, handler tidak menunggu
+
+# Startup: snapshot cache hangat opsional, startup lebih lama dari STARTUP_BUDGET detik dicatat sebagai warning
+WARM_CACHE = os.getenv('WARM_CACHE', '0').lower() in ('1', 'true', 'yes')
+STARTUP_BUDGET = float(os.getenv('STARTUP_BUDGET', 5))
+
+# Multi-instance: hanya leader (pemegang lease di SQLite bersama) yang menjalankan pengingat & job terjadwal
+LEADER_ELECTION = os.getenv('LEADER_ELECTION', '1').lower() in ('1', 'true', 'yes')
+LEADER_LEASE_FILE = Path(os.getenv('LEADER_LEASE_FILE', 'leader.sqlite3'))
+LEADER_LEASE_TTL = float(os.getenv('LEADER_LEASE_TTL', 30))  # detik, leader yang mati diganti setelah lease habis
+INSTANCE_ID = os.getenv('INSTANCE_ID') or f"{socket.gethostname()}-{os.getpid()}"
+BROADCAST_LEASE_TTL = 6 * 60 * 60  # klaim broadcast selama berjalan
+BROADCAST_DONE_TTL = 7 * 24 * 60 * 60  # penanda broadcast selesai, menolak update yang dikirim ulang
+
+# Backup data: BACKUP_INTERVAL jam sekali (0 = hanya lewat /backup)
+BACKUP_DIR = Path(os.getenv('BACKUP_DIR', 'backups'))
+BACKUP_INTERVAL = float(os.getenv('BACKUP_INTERVAL', 0))
+BACKUP_FULL_EVERY = int(os.getenv('BACKUP_FULL_EVERY', 7))  # backup terjadwal: 1 full lalu incremental
+BACKUP_KEEP = int(os.getenv('BACKUP_KEEP', 4))  # jumlah rantai full+incremental yang disimpan
+BACKUP_MANIFEST_FILE = BACKUP_DIR / "manifest.json"
+BACKUP_SEND_LIMIT = 50 * 1024 * 1024  # batas upload dokumen Bot API
+
+# Retensi data: utang lunas lama dan user tidak aktif dipindah ke arsip terkompresi
+ARCHIVE_DIR = Path(os.getenv('ARCHIVE_DIR', 'archive'))
+RETENTION_INTERVAL = float(os.getenv('RETENTION_INTERVAL', 24))  # jam, 0 = hanya lewat /retention
+RETENTION_INACTIVE_DAYS = int(os.getenv('RETENTION_INACTIVE_DAYS', 180))  # 0 = user tidak pernah diarsipkan
+RETENTION_SETTLED_DAYS = int(os.getenv('RETENTION_SETTLED_DAYS', 30))  # 0 = utang lunas tetap di file user
+
+# Snapshot analitik untuk /stats, dibangun ulang oleh leader (menit, 0 = hanya saat belum ada)
+ANALYTICS_INTERVAL = float(os.getenv('ANALYTICS_INTERVAL', 60))
+
+# Setup logging: handler hanya memasukkan record ke antrean, penulisan dilakukan thread listener
+CORRELATION_ID = contextvars.ContextVar("correlation_id", default="-")
+
+# Menambahkan correlation id (update/pengingat yang sedang diproses) ke setiap record
+class CorrelationFilter(logging.Filter):
+    def filter(self, record):
+        record.correlation_id = CORRELATION_ID.get()
+        return True
+
+# Membatasi warning/error dari baris kode yang sama: LOG_RATE_BURST per LOG_RATE_WINDOW detik
+class LogRateLimiter(logging.Filter):
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        # (file, baris, level) -> [awal window, jumlah di window ini, jumlah yang ditekan]
+        self._sites = {}
+    
+    def filter(self, record):
+        if record.levelno < logging.WARNING:
+            return True
+        key = (record.pathname, record.lineno, record.levelno)
+        now = record.created
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= LOG_RATE_WINDOW:
+                suppressed = site[2] if site else 0
+                self._sites[key] = [now, 1, 0]
+            elif site[1] < LOG_RATE_BURST:
+                site[1] += 1
+                suppressed = 0
+            else:
+                site[2] += 1
+                Metrics.inc("kapanbayar_log_suppressed_total")
+                return False
+        
+        if suppressed:
+            record.suppressed = suppressed
+            record.msg = f"{record.msg} [+{suppressed} pesan serupa ditekan]"
+        return True
+
+# QueueHandler yang tidak pernah memblokir: pesan dirangkai di thread pemanggil, traceback diformat di listener
+class LogQueueHandler(QueueHandler):
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+    
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            Metrics.inc("kapanbayar_log_dropped_total")
+
+# Format JSON satu baris per record
+class JsonLogFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "correlation_id": getattr(record, "correlation_id", "-"),
+            "thread": record.threadName
+        }
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+def setup_logging() -> QueueListener:
+    """Memasang pipeline logging lewat antrean (dipanggil sekali saat bot dijalankan)"""
+    if LOG_FORMAT == "json":
+        formatter = JsonLogFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(correlation_id)s - %(message)s')
+    output = logging.StreamHandler()
+    output.setFormatter(formatter)
+    
+    handler = LogQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    handler.addFilter(CorrelationFilter())
+    handler.addFilter(LogRateLimiter())
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+    # Log per request httpx terlalu ramai untuk level INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    
+    listener = QueueListener(handler.queue, output, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
 logger = logging.getLogger(__name__)
 
-# Direktori database
+# Direktori database (dibuat saat startup, bukan saat import)
 DATABASE_DIR = Path("database")
-DATABASE_DIR.mkdir(exist_ok=True)
+# Direktori state percakapan (subfolder, tidak ikut di-scan notifikasi)
+STATE_DIR = DATABASE_DIR / "state"
+# File lock per user untuk dokumen utang (antar instance)
+LOCK_DIR = DATABASE_DIR / "locks"
 
 # File users.json
 USERS_FILE = Path("users.json")
@@ -60,62 +264,1022 @@ USERS_FILE = Path("users.json")
 JOIN_FILE = Path("join_groups.json")
 # File join users tracking
 JOIN_USERS_FILE = Path("join_users.json")
+# File counter join per group
+JOIN_STATS_FILE = Path("join_stats.json")
+# File cache file_id media
+MEDIA_CACHE_FILE = Path("media_cache.json")
+
+# Snapshot cache hangat (opsional): data user/join dan jadwal pengingat dalam satu file
+WARM_CACHE_FILE = Path("warm_cache.json")
+
+# Snapshot kolom semua utang untuk analitik owner (header JSON lalu array biner)
+ANALYTICS_FILE = Path("analytics_snapshot.bin")
+
+# Jumlah dokumen utang yang disimpan di cache memori
+DEBT_CACHE_SIZE = 1000
+
+# Bucket histogram durasi (detik)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Class untuk metrik internal (format teks Prometheus, tanpa dependency tambahan)
+class Metrics:
+    _lock = threading.Lock()
+    _counters = {}
+    _gauges = {}
+    # (nama, label) -> [jumlah per bucket, total durasi, jumlah observasi]
+    _histograms = {}
+    started_at = time.time()
+    
+    HELP = {
+        "kapanbayar_handler_seconds": ("histogram", "Durasi handler Telegram"),
+        "kapanbayar_route_seconds": ("histogram", "Durasi route menu/state di handle_message"),
+        "kapanbayar_handler_errors_total": ("counter", "Error yang sampai ke error_handler"),
+        "kapanbayar_storage_ops_total": ("counter", "Operasi baca/tulis file data"),
+        "kapanbayar_storage_bytes_total": ("counter", "Byte yang dibaca/ditulis ke file data"),
+        "kapanbayar_storage_seconds": ("histogram", "Durasi operasi baca/tulis file data"),
+        "kapanbayar_telegram_api_seconds": ("histogram", "Durasi panggilan Bot API"),
+        "kapanbayar_telegram_api_requests_total": ("counter", "Panggilan Bot API per method dan kode HTTP"),
+        "kapanbayar_telegram_api_errors_total": ("counter", "Panggilan Bot API yang gagal"),
+        "kapanbayar_notification_tick_seconds": ("histogram", "Durasi satu putaran scan notifikasi"),
+        "kapanbayar_notification_users_scanned": ("gauge", "Jumlah user pada scan notifikasi terakhir"),
+        "kapanbayar_reminders_total": ("counter", "Pengingat yang dikirim"),
+        "kapanbayar_broadcast_messages_total": ("counter", "Pesan broadcast yang dikirim"),
+        "kapanbayar_broadcast_last_rate": ("gauge", "Throughput broadcast terakhir (pesan/detik)"),
+        "kapanbayar_broadcast_last_duration_seconds": ("gauge", "Durasi broadcast terakhir"),
+        "kapanbayar_flood_drops_total": ("counter", "Update yang dibuang anti-flood"),
+        "kapanbayar_backup_last_success_timestamp": ("gauge", "Waktu backup terakhir yang berhasil (unix)"),
+        "kapanbayar_startup_seconds": ("gauge", "Durasi fase startup"),
+        "kapanbayar_time_to_first_response_seconds": ("gauge", "Waktu dari start sampai update pertama selesai"),
+        "kapanbayar_notification_users_skipped": ("gauge", "User yang dilewati scan terakhir karena belum waktunya"),
+        "kapanbayar_log_suppressed_total": ("counter", "Log warning/error yang ditekan rate limit"),
+        "kapanbayar_log_dropped_total": ("counter", "Log yang dibuang karena antrean penuh"),
+        "kapanbayar_leader": ("gauge", "1 jika instance ini memegang lease leader"),
+        "kapanbayar_retention_archived_total": ("counter", "User dan utang lunas yang dipindah ke arsip"),
+        "kapanbayar_retention_restored_total": ("counter", "User yang dipulihkan dari arsip saat kembali"),
+        "kapanbayar_retention_last_success_timestamp": ("gauge", "Waktu retensi terakhir yang berhasil (unix)"),
+        "kapanbayar_uptime_seconds": ("gauge", "Lama bot berjalan"),
+    }
+    
+    @staticmethod
+    def _key(name: str, labels: Optional[Dict]) -> Tuple:
+        return (name, tuple(sorted(labels.items())) if labels else ())
+    
+    @staticmethod
+    def inc(name: str, labels: Optional[Dict] = None, value: float = 1):
+        """Menambah counter"""
+        key = Metrics._key(name, labels)
+        with Metrics._lock:
+            Metrics._counters[key] = Metrics._counters.get(key, 0) + value
+    
+    @staticmethod
+    def set_gauge(name: str, value: float, labels: Optional[Dict] = None):
+        """Mengatur nilai gauge"""
+        with Metrics._lock:
+            Metrics._gauges[Metrics._key(name, labels)] = value
+    
+    @staticmethod
+    def observe(name: str, value: float, labels: Optional[Dict] = None):
+        """Mencatat satu observasi histogram"""
+        key = Metrics._key(name, labels)
+        index = bisect.bisect_left(LATENCY_BUCKETS, value)
+        with Metrics._lock:
+            histogram = Metrics._histograms.get(key)
+            if histogram is None:
+                histogram = Metrics._histograms[key] = [[0] * (len(LATENCY_BUCKETS) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+    
+    @staticmethod
+    def record_io(store: str, op: str, nbytes: int, elapsed: float):
+        """Mencatat satu operasi baca/tulis file"""
+        labels = {"store": store, "op": op}
+        Metrics.inc("kapanbayar_storage_ops_total", labels)
+        Metrics.inc("kapanbayar_storage_bytes_total", labels, nbytes)
+        Metrics.observe("kapanbayar_storage_seconds", elapsed, labels)
+    
+    @staticmethod
+    def _format_labels(labels: Tuple, extra: str = "") -> str:
+        parts = []
+        for key, value in labels:
+            escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+            parts.append(f'{key}="{escaped}"')
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+    
+    @staticmethod
+    def render() -> str:
+        """Semua metrik dalam format teks Prometheus"""
+        Metrics.set_gauge("kapanbayar_uptime_seconds", time.time() - Metrics.started_at)
+        with Metrics._lock:
+            counters = dict(Metrics._counters)
+            gauges = dict(Metrics._gauges)
+            histograms = {key: (list(h[0]), h[1], h[2]) for key, h in Metrics._histograms.items()}
+        
+        lines = []
+        for name, (metric_type, help_text) in Metrics.HELP.items():
+            source = {"counter": counters, "gauge": gauges, "histogram": histograms}[metric_type]
+            series = sorted((key, value) for key, value in source.items() if key[0] == name)
+            if not series:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for (_, labels), value in series:
+                if metric_type != "histogram":
+                    lines.append(f"{name}{Metrics._format_labels(labels)} {value:g}")
+                    continue
+                buckets, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip(LATENCY_BUCKETS + (float("inf"),), buckets):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    bucket_labels = Metrics._format_labels(labels, f'le="{le}"')
+                    lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{name}_sum{Metrics._format_labels(labels)} {total:g}")
+                lines.append(f"{name}_count{Metrics._format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+    
+    @staticmethod
+    def histogram_summary(name: str) -> Dict[Tuple, Dict]:
+        """Ringkasan histogram per label: jumlah, rata-rata, p50 dan p95 (perkiraan dari bucket)"""
+        with Metrics._lock:
+            items = [(key[1], list(h[0]), h[1], h[2]) for key, h in Metrics._histograms.items() if key[0] == name]
+        
+        result = {}
+        for labels, buckets, total, count in items:
+            def quantile(q):
+                target = q * count
+                cumulative = 0
+                lower = 0.0
+                for bound, bucket_count in zip(LATENCY_BUCKETS + (LATENCY_BUCKETS[-1],), buckets):
+                    if bucket_count and cumulative + bucket_count >= target:
+                        return lower + (bound - lower) * (target - cumulative) / bucket_count
+                    cumulative += bucket_count
+                    lower = bound
+                return LATENCY_BUCKETS[-1]
+            result[labels] = {"count": count, "avg": total / count, "p50": quantile(0.5), "p95": quantile(0.95)}
+        return result
+    
+    @staticmethod
+    def counter_values(name: str) -> Dict[Tuple, float]:
+        """Nilai counter per label"""
+        with Metrics._lock:
+            return {key[1]: value for key, value in Metrics._counters.items() if key[0] == name}
+    
+    @staticmethod
+    def gauge_value(name: str, default: float = 0.0) -> float:
+        with Metrics._lock:
+            return Metrics._gauges.get((name, ()), default)
+    
+    @staticmethod
+    def format_bytes(size: float) -> str:
+        for unit in ("B", "KB", "MB", "GB"):
+            if size < 1024 or unit == "GB":
+                return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+            size /= 1024
+
+def instrument(name: str, callback):
+    """Membungkus handler agar durasinya tercatat di metrik"""
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        start = time.perf_counter()
+        try:
+            return await callback(update, context)
+        finally:
+            Metrics.observe("kapanbayar_handler_seconds", time.perf_counter() - start, {"handler": name})
+    return wrapper
+
+# Request Bot API yang mencatat latensi dan error setiap panggilan
+class InstrumentedRequest(HTTPXRequest):
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        start = time.perf_counter()
+        try:
+            code, payload = await super().do_request(url, method, *args, **kwargs)
+        except Exception as e:
+            Metrics.inc("kapanbayar_telegram_api_errors_total", {"method": api_method, "error": type(e).__name__})
+            raise
+        finally:
+            Metrics.observe("kapanbayar_telegram_api_seconds", time.perf_counter() - start, {"method": api_method})
+        
+        Metrics.inc("kapanbayar_telegram_api_requests_total", {"method": api_method, "code": str(code)})
+        if code >= 400:
+            Metrics.inc("kapanbayar_telegram_api_errors_total", {"method": api_method, "error": str(code)})
+        return code, payload
+
+# Profiling on-demand oleh owner
+PROFILE_MAX_SECONDS = 600  # batas durasi satu sesi (juga untuk mode N update)
+PROFILE_MAX_UPDATES = 10000
+PROFILE_TOP_N = 30  # jumlah fungsi teratas di laporan
+PROFILE_SAMPLE_INTERVAL = 0.005  # detik, interval pengambilan sampel stack
+
+# Class untuk sesi profiling (cProfile atau sampling) yang dikendalikan owner
+class Profiler:
+    # Satu-satunya pengecekan di jalur panas saat profiling mati
+    active = False
+    # True dari start() sampai watch() selesai mengirim laporan dan membersihkan data
+    busy = False
+    mode = None
+    chat_id = None
+    seconds = 0.0
+    remaining_updates = 0
+    updates_seen = 0
+    started_at = 0.0
+    origin_update_id = None
+    _lock = threading.Lock()
+    _done = None
+    _loop_thread = None
+    _loop_profile = None
+    # cProfile dari thread lain (notifikasi, I/O), satu per pemanggilan
+    _thread_profiles = []
+    # Mode sampling: (nama thread, frame...) -> jumlah sampel
+    _stacks = Counter()
+    _samples = 0
+    _sampler = None
+    
+    @staticmethod
+    def start(mode: str, seconds: float, updates: int, chat_id: int, origin_update_id: Optional[int] = None):
+        """Memulai sesi profiling, dipanggil dari thread event loop"""
+        Profiler.busy = True
+        Profiler.mode = mode
+        Profiler.chat_id = chat_id
+        Profiler.seconds = seconds
+        Profiler.remaining_updates = updates
+        Profiler.updates_seen = 0
+        Profiler.origin_update_id = origin_update_id
+        Profiler.started_at = time.perf_counter()
+        Profiler._done = asyncio.Event()
+        Profiler._loop_thread = threading.get_ident()
+        Profiler._loop_profile = None
+        Profiler._thread_profiles = []
+        Profiler._stacks = Counter()
+        Profiler._samples = 0
+        Profiler._sampler = None
+        
+        if mode == "sample":
+            Profiler.active = True
+            Profiler._sampler = threading.Thread(target=Profiler._sample_loop, name="profiler", daemon=True)
+            Profiler._sampler.start()
+        else:
+            Profiler._loop_profile = cProfile.Profile()
+            Profiler.active = True
+            Profiler._loop_profile.enable()
+    
+    @staticmethod
+    def run_profiled(func, *args, **kwargs):
+        """Menjalankan fungsi di thread notifikasi/I/O dengan cProfile milik thread itu"""
+        if Profiler.mode != "cprofile" or threading.get_ident() == Profiler._loop_thread:
+            return func(*args, **kwargs)
+        
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            with Profiler._lock:
+                if Profiler.active:
+                    Profiler._thread_profiles.append(profile)
+    
+    @staticmethod
+    def update_done(update):
+        """Dipanggil setelah setiap update selesai diproses selama sesi aktif"""
+        if getattr(update, "update_id", None) == Profiler.origin_update_id:
+            return
+        Profiler.updates_seen += 1
+        if Profiler.remaining_updates:
+            Profiler.remaining_updates -= 1
+            if not Profiler.remaining_updates:
+                Profiler._done.set()
+    
+    @staticmethod
+    def request_stop():
+        """Mengakhiri sesi lebih awal"""
+        if Profiler._done:
+            Profiler._done.set()
+    
+    @staticmethod
+    def _sample_loop():
+        """Thread sampler: mengambil stack semua thread setiap PROFILE_SAMPLE_INTERVAL"""
+        own_ident = threading.get_ident()
+        names = {}
+        while Profiler.active:
+            frames = sys._current_frames()
+            if frames.keys() - names.keys():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in frames.items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                Profiler._stacks[tuple(reversed(stack))] += 1
+            Profiler._samples += 1
+            time.sleep(PROFILE_SAMPLE_INTERVAL)
+    
+    @staticmethod
+    def stop():
+        """Menghentikan pengambilan data, dipanggil dari thread event loop"""
+        with Profiler._lock:
+            Profiler.active = False
+        if Profiler._loop_profile:
+            Profiler._loop_profile.disable()
+        if Profiler._sampler:
+            Profiler._sampler.join()
+    
+    @staticmethod
+    def _frame_label(frame: Tuple) -> str:
+        filename, lineno, name = frame
+        return f"{name} ({os.path.basename(filename)}:{lineno})"
+    
+    @staticmethod
+    def build_report() -> Tuple[str, List[Tuple[str, bytes]]]:
+        """Menyusun laporan teks dan lampiran (pstats atau stack terlipat) dari sesi terakhir"""
+        elapsed = time.perf_counter() - Profiler.started_at
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        header = (
+            f"Profil KapanBayar ({Profiler.mode})\n"
+            f"Durasi: {elapsed:.1f} detik, update diproses: {Profiler.updates_seen}\n"
+        )
+        
+        if Profiler.mode == "sample":
+            inclusive = Counter()
+            exclusive = Counter()
+            folded = []
+            for stack, count in Profiler._stacks.items():
+                thread_name, frames = stack[0], stack[1:]
+                if frames:
+                    exclusive[frames[-1]] += count
+                for frame in set(frames):
+                    inclusive[frame] += count
+                folded.append(";".join([thread_name] + [Profiler._frame_label(frame) for frame in frames]) + f" {count}")
+            
+            # Perkiraan waktu = jumlah sampel x interval, dijumlah dari semua thread (termasuk idle)
+            report = header + f"Sampel: {Profiler._samples} x {PROFILE_SAMPLE_INTERVAL * 1000:.0f} ms, semua thread termasuk idle\n\n"
+            report += f"Top {PROFILE_TOP_N} kumulatif (sampel, perkiraan detik)\n"
+            for frame, count in inclusive.most_common(PROFILE_TOP_N):
+                report += f"{count:>8} {count * PROFILE_SAMPLE_INTERVAL:>9.3f}  {Profiler._frame_label(frame)}\n"
+            report += f"\nTop {PROFILE_TOP_N} self (sampel, perkiraan detik)\n"
+            for frame, count in exclusive.most_common(PROFILE_TOP_N):
+                report += f"{count:>8} {count * PROFILE_SAMPLE_INTERVAL:>9.3f}  {Profiler._frame_label(frame)}\n"
+            return report, [(f"profile_{stamp}.folded", "\n".join(folded).encode("utf-8"))]
+        
+        stream = io.StringIO()
+        stats = pstats.Stats(Profiler._loop_profile, stream=stream)
+        for profile in Profiler._thread_profiles:
+            stats.add(profile)
+        dump = marshal.dumps(stats.stats)
+        
+        stream.write(header + f"Thread lain yang terprofil: {len(Profiler._thread_profiles)} pemanggilan (notifikasi/I/O)\n")
+        stats.strip_dirs()
+        stats.sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+        stats.sort_stats("tottime").print_stats(PROFILE_TOP_N)
+        return stream.getvalue(), [(f"profile_{stamp}.pstats", dump)]
+    
+    @staticmethod
+    async def watch(application: Application):
+        """Menunggu sesi selesai (waktu habis, N update, atau stop) lalu mengirim hasilnya ke owner"""
+        try:
+            await asyncio.wait_for(Profiler._done.wait(), timeout=Profiler.seconds)
+        except asyncio.TimeoutError:
+            pass
+        Profiler.stop()
+        
+        try:
+            report, attachments = await run_io(Profiler.build_report)
+            stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            await application.bot.send_document(
+                chat_id=Profiler.chat_id,
+                document=report.encode("utf-8"),
+                filename=f"profile_{stamp}.txt",
+                caption=f"🔬 Profil selesai ({Profiler.mode}, {Profiler.updates_seen} update)"
+            )
+            for filename, content in attachments:
+                await application.bot.send_document(chat_id=Profiler.chat_id, document=content, filename=filename)
+        except Exception as e:
+            logger.error(f"Error sending profile report: {e}")
+        finally:
+            # Lepaskan data profil dari memori
+            Profiler._loop_profile = None
+            Profiler._thread_profiles = []
+            Profiler._stacks = Counter()
+            Profiler._done = None
+            Profiler.busy = False
+
+IO_EXECUTOR = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+
+async def run_io(func, *args, **kwargs):
+    """Menjalankan fungsi blocking (baca/tulis disk) di thread pool I/O"""
+    loop = asyncio.get_running_loop()
+    # Context disalin agar log dari thread I/O tetap membawa correlation id update
+    context_run = contextvars.copy_context().run
+    if Profiler.active:
+        return await loop.run_in_executor(IO_EXECUTOR, functools.partial(context_run, Profiler.run_profiled, func, *args, **kwargs))
+    return await loop.run_in_executor(IO_EXECUTOR, functools.partial(context_run, func, *args, **kwargs))
+
+@contextlib.contextmanager
+def file_lock(path: Path):
+    """Lock eksklusif antar proses (flock) pada file lock terpisah"""
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)  # Melepas flock
+
+# Class untuk file JSON yang dilayani dari memori dan ditulis di background
+class JsonFileStore:
+    instances = []
+    
+    def __init__(self, path: Path, default: Dict, lock: Optional[threading.RLock] = None):
+        self.path = path
+        self.default = default
+        self.lock = lock or threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._data = None
+        self._dirty = False
+        # Perubahan sejak flush terakhir: section -> set key (None = seluruh section), None = seluruh file
+        self._changes = {}
+        # Penambahan counter sejak flush terakhir: (section, key) -> delta
+        self._deltas = {}
+        # Signature file saat terakhir dibaca/ditulis proses ini, untuk mendeteksi tulisan instance lain
+        self._signature = None
+        JsonFileStore.instances.append(self)
+    
+    @property
+    def data(self) -> Dict:
+        """Data di memori, dimuat dari disk saat pertama kali diakses"""
+        with self.lock:
+            if self._data is None:
+                loaded = self._read()
+                self._data = loaded[0] if loaded else json.loads(json.dumps(self.default))
+                self._signature = loaded[1] if loaded else None
+            return self._data
+    
+    def _read(self) -> Optional[Tuple[Dict, Tuple]]:
+        """Membaca file beserta signature-nya, None jika file belum ada"""
+        signature = DebtManager._file_signature(self.path)
+        if signature is None:
+            return None
+        start = time.perf_counter()
+        with open(self.path, 'r', encoding='utf-8') as f:
+            raw = f.read()
+        Metrics.record_io(self.path.stem, "read", len(raw), time.perf_counter() - start)
+        return json.loads(raw), signature
+    
+    def set(self, data: Dict, section: Optional[str] = None, key: Optional[str] = None):
+        """Menandai data berubah, ditulis ke disk pada flush berikutnya.
+        
+        section/key menandai bagian yang diubah agar flush bisa digabung dengan tulisan instance lain;
+        tanpa section seluruh file dianggap milik instance ini.
+        """
+        with self.lock:
+            if section is None:
+                self._data = data
+                self._changes = None
+            elif self._changes is not None:
+                if data is not self._data:
+                    # Referensi lama (data sudah digabung ulang oleh flush): salin bagian yang diubah saja
+                    target = self.data.setdefault(section, {})
+                    if key is None:
+                        self._data[section] = data.get(section)
+                    elif key in data.get(section, {}):
+                        target[key] = data[section][key]
+                    else:
+                        target.pop(key, None)
+                if key is None:
+                    self._changes[section] = None
+                elif self._changes.get(section, ()) is not None:
+                    self._changes.setdefault(section, set()).add(key)
+            self._dirty = True
+    
+    def increment(self, section: str, key: str, delta: int):
+        """Menambah counter; delta (bukan nilai akhir) yang digabung dengan tulisan instance lain"""
+        with self.lock:
+            values = self.data.setdefault(section, {})
+            values[key] = max(0, values.get(key, 0) + delta)
+            self._deltas[(section, key)] = self._deltas.get((section, key), 0) + delta
+            self._dirty = True
+    
+    def _merge(self, disk: Dict):
+        """Menggabungkan isi file terbaru ke data di memori (in-place); bagian yang diubah proses ini tetap dipakai"""
+        if self._changes is None:
+            return
+        for section in set(disk) | set(self._data):
+            keys = self._changes.get(section, ())
+            if keys is None:
+                continue
+            ours, theirs = self._data.get(section), disk.get(section)
+            if isinstance(ours, dict) and isinstance(theirs, dict):
+                kept = {key: ours[key] for key in keys if key in ours}
+                ours.clear()
+                ours.update(theirs)
+                ours.update(kept)
+                for key in keys:
+                    if key not in kept:
+                        ours.pop(key, None)
+            elif keys or any(item[0] == section for item in self._deltas):
+                continue  # Bentuk section berbeda di disk, bagian milik proses ini dipertahankan
+            elif section in disk:
+                self._data[section] = theirs
+            else:
+                self._data.pop(section, None)
+        for (section, key), delta in self._deltas.items():
+            if self._changes.get(section, ()) is not None:
+                values = self._data.setdefault(section, {})
+                values[key] = max(0, values.get(key, 0) + delta)
+    
+    def flush(self) -> bool:
+        """Menulis perubahan ke disk (file sementara lalu rename), digabung dengan tulisan instance lain.
+        
+        Dipanggil juga tanpa perubahan lokal agar data dari instance lain ikut termuat.
+        """
+        with self._flush_lock, file_lock(self.path.with_name(self.path.name + ".lock")):
+            with self.lock:
+                if self._data is None:
+                    return False
+                if DebtManager._file_signature(self.path) != self._signature:
+                    loaded = self._read()
+                    if loaded:
+                        self._merge(loaded[0])
+                        self._signature = loaded[1]
+                if not self._dirty:
+                    return False
+                # Serialisasi di bawah lock, tulis ke disk di luar lock (masih di bawah lock file)
+                payload = json.dumps(self._data, ensure_ascii=False, indent=2)
+                changes, deltas = self._changes, self._deltas
+                self._dirty = False
+                self._changes = {}
+                self._deltas = {}
+            
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            start = time.perf_counter()
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(payload)
+                os.replace(tmp_path, self.path)
+                Metrics.record_io(self.path.stem, "write", len(payload), time.perf_counter() - start)
+                self._signature = DebtManager._file_signature(self.path)
+            except Exception:
+                with self.lock:
+                    self._dirty = True
+                    self._restore_changes(changes, deltas)
+                raise
+            return True
+    
+    def _restore_changes(self, changes: Optional[Dict], deltas: Dict):
+        """Mengembalikan catatan perubahan setelah flush gagal agar ikut flush berikutnya"""
+        if changes is None or self._changes is None:
+            self._changes = None
+        else:
+            for section, keys in changes.items():
+                current = self._changes.get(section, set())
+                self._changes[section] = None if keys is None or current is None else current | keys
+        for item, delta in deltas.items():
+            self._deltas[item] = self._deltas.get(item, 0) + delta
+    
+    @staticmethod
+    def load_all():
+        """Memuat semua store ke memori (dipanggil dari thread pool saat startup)"""
+        for store in JsonFileStore.instances:
+            store.data
+    
+    @staticmethod
+    def flush_all():
+        """Menulis semua store yang berubah"""
+        for store in JsonFileStore.instances:
+            try:
+                store.flush()
+            except Exception as e:
+                logger.error(f"Error flushing {store.path}: {e}")
 
-# Inisialisasi file join
-if not JOIN_FILE.exists():
-    with open(JOIN_FILE, 'w', encoding='utf-8') as f:
-        json.dump({"groups": []}, f, indent=2)
+# Lock dokumen utang satu user: RLock antar thread + flock antar instance (hanya di level terluar)
+class UserDocumentLock:
+    def __init__(self, path: Path):
+        self.path = path
+        self._rlock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+    
+    def __enter__(self):
+        self._rlock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            try:
+                # os.open langsung (tanpa objek file Python), dipanggil di setiap operasi utang
+                try:
+                    self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                except FileNotFoundError:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            except BaseException:
+                if self._fd is not None:
+                    os.close(self._fd)
+                    self._fd = None
+                self._rlock.release()
+                raise
+        self._depth += 1
+        return self
+    
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            os.close(self._fd)  # Melepas flock
+            self._fd = None
+        self._rlock.release()
 
-if not JOIN_USERS_FILE.exists():
-    with open(JOIN_USERS_FILE, 'w', encoding='utf-8') as f:
-        json.dump({"users": {}}, f, indent=2)
+async def persist_stores(application: Application):
+    """Menulis data user/join dari memori ke disk secara berkala"""
+    while True:
+        await asyncio.sleep(STORE_FLUSH_INTERVAL)
+        await run_io(JsonFileStore.flush_all)
 
 # Class untuk mengelola utang
 class DebtManager:
+    # Cache dokumen per user: user_id -> (signature file, data)
+    _cache = OrderedDict()
+    # Versi data per user, naik setiap kali data dimuat ulang atau disimpan
+    _versions = {}
+    # Lock per user untuk baca-ubah-tulis dokumen (termasuk I/O disk, juga antar instance), dibuang otomatis jika tidak dipakai
+    _user_locks = weakref.WeakValueDictionary()
+    # Lock global hanya untuk struktur bersama (cache LRU, versi, lock per user); tidak pernah menunggu disk
+    _lock = threading.Lock()
+    
     @staticmethod
     def get_user_file(user_id: int) -> Path:
         """Mendapatkan file JSON untuk user tertentu"""
         return DATABASE_DIR / f"{user_id}.json"
     
+    @staticmethod
+    def _file_signature(user_file: Path) -> Optional[Tuple[int, int, int]]:
+        """Signature file (mtime, size, inode) untuk validasi cache; inode berganti setiap tulis (rename)"""
+        try:
+            stat = user_file.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+    
+    @staticmethod
+    def user_lock(user_id: int) -> UserDocumentLock:
+        """Lock dokumen utang satu user; user berbeda bisa dibaca/ditulis paralel"""
+        with DebtManager._lock:
+            lock = DebtManager._user_locks.get(user_id)
+            if lock is None:
+                lock = DebtManager._user_locks[user_id] = UserDocumentLock(LOCK_DIR / f"{user_id}.lock")
+            return lock
+    
+    @staticmethod
+    def _cached(user_id: int, signature, touch: bool = True) -> Optional[Dict]:
+        """Dokumen dari cache jika signature file masih sama"""
+        with DebtManager._lock:
+            cached = DebtManager._cache.get(user_id)
+            if cached and cached[0] == signature:
+                if touch:
+                    DebtManager._cache.move_to_end(user_id)
+                return cached[1]
+            return None
+    
+    @staticmethod
+    def _remember(user_id: int, signature, data: Dict):
+        """Menyimpan dokumen ke cache dan menaikkan versi data"""
+        with DebtManager._lock:
+            DebtManager._cache[user_id] = (signature, data)
+            DebtManager._cache.move_to_end(user_id)
+            while len(DebtManager._cache) > DEBT_CACHE_SIZE:
+                DebtManager._cache.popitem(last=False)
+            DebtManager._versions[user_id] = DebtManager._versions.get(user_id, 0) + 1
+    
     @staticmethod
     def load_user_debts(user_id: int) -> Dict:
         """Memuat data utang user"""
-        user_file = DebtManager.get_user_file(user_id)
-        if user_file.exists():
-            with open(user_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {"debts": [], "notification_interval": 5, "is_notification_paused": False}
+        with DebtManager.user_lock(user_id):
+            user_file = DebtManager.get_user_file(user_id)
+            signature = DebtManager._file_signature(user_file)
+            cached = DebtManager._cached(user_id, signature)
+            if cached is not None:
+                return cached
+            
+            if signature is None and RetentionManager.restore_user(user_id):
+                # User kembali setelah diarsipkan
+                signature = DebtManager._file_signature(user_file)
+                cached = DebtManager._cached(user_id, signature)
+                if cached is not None:
+                    return cached
+            
+            if signature is not None:
+                start = time.perf_counter()
+                with open(user_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                Metrics.record_io("debts", "read", signature[1], time.perf_counter() - start)
+            else:
+                data = {"debts": [], "notification_interval": 5, "is_notification_paused": False}
+            DebtManager._remember(user_id, signature, data)
+            return data
     
     @staticmethod
     def save_user_debts(user_id: int, data: Dict):
         """Menyimpan data utang user"""
-        user_file = DebtManager.get_user_file(user_id)
-        with open(user_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        with DebtManager.user_lock(user_id):
+            user_file = DebtManager.get_user_file(user_id)
+            # File sementara lalu rename: pembaca tanpa lock (scan, instance lain) tidak melihat file setengah jadi
+            tmp_path = user_file.with_name(user_file.name + ".tmp")
+            start = time.perf_counter()
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, user_file)
+            signature = DebtManager._file_signature(user_file)
+            Metrics.record_io("debts", "write", signature[1] if signature else 0, time.perf_counter() - start)
+            DebtManager._remember(user_id, signature, data)
+    
+    @staticmethod
+    def peek_user_debts(user_id: int) -> Dict:
+        """Memuat data utang tanpa mengisi cache (untuk job background atas semua user)"""
+        with DebtManager.user_lock(user_id):
+            user_file = DebtManager.get_user_file(user_id)
+            signature = DebtManager._file_signature(user_file)
+            cached = DebtManager._cached(user_id, signature, touch=False)
+            if cached is not None:
+                return cached
+            if signature is None:
+                return {"debts": [], "notification_interval": 5, "is_notification_paused": False}
+            start = time.perf_counter()
+            with open(user_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            Metrics.record_io("debts", "read", signature[1], time.perf_counter() - start)
+            return data
+    
+    @staticmethod
+    def forget_user(user_id: int):
+        """Membuang semua cache milik user (user dipindah ke arsip)"""
+        with DebtManager.user_lock(user_id), DebtManager._lock:
+            DebtManager._cache.pop(user_id, None)
+            DebtManager._versions.pop(user_id, None)
+            DebtIndex._indexes.pop(user_id, None)
+            for mode in ("list", "delete"):
+                DebtListView._pages.pop((user_id, mode), None)
+            NotificationManager._schedule.pop(user_id, None)
+    
+    @staticmethod
+    def get_data_version(user_id: int) -> int:
+        """Mendapatkan versi data utang user (untuk invalidasi cache tampilan)"""
+        with DebtManager.user_lock(user_id):
+            DebtManager.load_user_debts(user_id)
+            with DebtManager._lock:
+                return DebtManager._versions[user_id]
+    
+    @staticmethod
+    def parse_amount(amount) -> float:
+        """Mengubah string jumlah (contoh: 100k, 1.5k, 50.000, Rp 25000) menjadi angka, 0 jika tidak valid"""
+        match = AMOUNT_PATTERN.fullmatch(str(amount).strip().lower().replace(" ", ""))
+        if not match:
+            return 0.0
+        number, suffix = match.group(1).strip(".,"), match.group(2)
+        # Titik/koma yang diikuti tepat 3 digit adalah pemisah ribuan (50.000, 1.500.000), selain itu desimal (1,5k)
+        separator = THOUSANDS_PATTERN.fullmatch(number)
+        number = number.replace(separator.group(1), "") if separator else number.replace(",", ".")
+        try:
+            # Akhiran k dikalikan setelah angka diparse: 1.5k = 1500, bukan 1.5000
+            return float(Decimal(number) * 1000 ** len(suffix))
+        except InvalidOperation:
+            return 0.0
+    
+    @staticmethod
+    def normalize_name(name) -> str:
+        """Normalisasi nama penghutang untuk pengelompokan"""
+        return " ".join(str(name or "").casefold().split())
+    
+    @staticmethod
+    def _due_key(payment_date: Optional[str]):
+        """Kunci urut tanggal jatuh tempo (None jika kosong/tidak valid)"""
+        if not payment_date:
+            return None
+        try:
+            return datetime.strptime(payment_date, "%Y/%m/%d").date()
+        except ValueError:
+            return None
+    
+    @staticmethod
+    def _summary_add(data: Dict, debt: Dict):
+        """Menambahkan satu utang ke ringkasan per penghutang"""
+        key = DebtManager.normalize_name(debt.get("debtor_name"))
+        entry = data["debtor_summary"].setdefault(
+            key, {"name": debt.get("debtor_name"), "count": 0, "total": 0.0, "earliest_due": None}
+        )
+        entry["count"] += 1
+        entry["total"] += DebtManager.get_remaining(debt)
+        
+        due = DebtManager._due_key(debt.get("payment_date"))
+        earliest = DebtManager._due_key(entry["earliest_due"])
+        if due and (earliest is None or due < earliest):
+            entry["earliest_due"] = debt["payment_date"]
+    
+    @staticmethod
+    def _summary_remove(data: Dict, debt: Dict):
+        """Mengurangi satu utang dari ringkasan per penghutang"""
+        key = DebtManager.normalize_name(debt.get("debtor_name"))
+        entry = data["debtor_summary"].get(key)
+        if not entry:
+            return
+        entry["count"] -= 1
+        if entry["count"] <= 0:
+            del data["debtor_summary"][key]
+            return
+        entry["total"] = max(0.0, entry["total"] - DebtManager.get_remaining(debt))
+        
+        # Hitung ulang tanggal terawal hanya untuk penghutang ini
+        if debt.get("payment_date") and debt.get("payment_date") == entry["earliest_due"]:
+            dues = [
+                (DebtManager._due_key(d.get("payment_date")), d.get("payment_date"))
+                for d in data["debts"]
+                if DebtManager.normalize_name(d.get("debtor_name")) == key
+            ]
+            dues = [item for item in dues if item[0]]
+            entry["earliest_due"] = min(dues)[1] if dues else None
+    
+    @staticmethod
+    def _ensure_summary(data: Dict):
+        """Membangun ringkasan per penghutang jika belum ada (data lama)"""
+        if "debtor_summary" not in data:
+            data["debtor_summary"] = {}
+            for debt in data["debts"]:
+                DebtManager._summary_add(data, debt)
+    
+    @staticmethod
+    def get_debtor_summary(user_id: int) -> Dict:
+        """Mendapatkan ringkasan utang per penghutang"""
+        with DebtManager.user_lock(user_id):
+            data = DebtManager.load_user_debts(user_id)
+            if "debtor_summary" not in data:
+                DebtManager._ensure_summary(data)
+                if data["debts"]:
+                    DebtManager.save_user_debts(user_id, data)
+            return data["debtor_summary"]
+    
+    @staticmethod
+    def _new_debt_id(data: Dict) -> int:
+        """ID utang berikutnya; ID tidak pernah dipakai ulang agar tombol di pesan lama tetap menunjuk utang yang sama"""
+        if "next_id" not in data:
+            # Data lama tanpa counter: mulai setelah ID terbesar (termasuk arsip lunas)
+            data["next_id"] = max((debt["id"] for debt in data["debts"] + data.get("archive", [])), default=0) + 1
+        debt_id = data["next_id"]
+        data["next_id"] += 1
+        return debt_id
     
     @staticmethod
     def add_debt(user_id: int, debt_data: Dict):
         """Menambahkan utang baru"""
-        data = DebtManager.load_user_debts(user_id)
-        debt_data["id"] = len(data["debts"]) + 1
-        debt_data["created_at"] = datetime.now().isoformat()
-        data["debts"].append(debt_data)
-        DebtManager.save_user_debts(user_id, data)
-        return debt_data["id"]
+        with DebtManager.user_lock(user_id):
+            data = DebtManager.load_user_debts(user_id)
+            DebtManager._ensure_summary(data)
+            debt_data["id"] = DebtManager._new_debt_id(data)
+            debt_data["created_at"] = datetime.now().isoformat()
+            data["debts"].append(debt_data)
+            DebtManager._summary_add(data, debt_data)
+            DebtManager.save_user_debts(user_id, data)
+            return debt_data["id"]
+    
+    @staticmethod
+    def add_debts(user_id: int, debts: List[Dict]) -> List[int]:
+        """Menambahkan banyak utang sekaligus dengan satu kali simpan"""
+        with DebtManager.user_lock(user_id):
+            data = DebtManager.load_user_debts(user_id)
+            DebtManager._ensure_summary(data)
+            created_at = datetime.now().isoformat()
+            debt_ids = []
+            for debt_data in debts:
+                debt_data["id"] = DebtManager._new_debt_id(data)
+                debt_data["created_at"] = created_at
+                data["debts"].append(debt_data)
+                DebtManager._summary_add(data, debt_data)
+                debt_ids.append(debt_data["id"])
+            DebtManager.save_user_debts(user_id, data)
+            return debt_ids
     
     @staticmethod
     def delete_debt(user_id: int, debt_id: int) -> bool:
         """Menghapus utang berdasarkan ID"""
-        data = DebtManager.load_user_debts(user_id)
-        original_length = len(data["debts"])
-        data["debts"] = [d for d in data["debts"] if d["id"] != debt_id]
+        with DebtManager.user_lock(user_id):
+            data = DebtManager.load_user_debts(user_id)
+            DebtManager._ensure_summary(data)
+            original_length = len(data["debts"])
+            removed = [d for d in data["debts"] if d["id"] == debt_id]
+            data["debts"] = [d for d in data["debts"] if d["id"] != debt_id]
+            for debt in removed:
+                DebtManager._summary_remove(data, debt)
+            
+            DebtManager.save_user_debts(user_id, data)
+            return len(data["debts"]) != original_length
+    
+    @staticmethod
+    def add_months(date_value, months: int):
+        """Menambah bulan pada tanggal (tanggal disesuaikan ke akhir bulan jika perlu)"""
+        year, month = divmod(date_value.month - 1 + months, 12)
+        year += date_value.year
+        day = min(date_value.day, calendar.monthrange(year, month + 1)[1])
+        return date_value.replace(year=year, month=month + 1, day=day)
+    
+    @staticmethod
+    def iter_occurrences(debt: Dict) -> Iterator:
+        """Generator jadwal jatuh tempo utang berulang, mulai dari cicilan yang belum dibayar"""
+        recurrence = debt.get("recurrence")
+        if not recurrence:
+            due = DebtManager._due_key(debt.get("payment_date"))
+            if due:
+                yield due
+            return
         
-        # Update ID setelah penghapusan
-        for i, debt in enumerate(data["debts"], 1):
-            debt["id"] = i
+        anchor = datetime.strptime(recurrence["anchor"], "%Y/%m/%d").date()
+        index = recurrence.get("index", 0)
+        count = recurrence.get("count")
+        while count is None or index < count:
+            if recurrence["freq"] == "weekly":
+                yield anchor + timedelta(weeks=index)
+            else:
+                yield DebtManager.add_months(anchor, index)
+            index += 1
+    
+    @staticmethod
+    def next_occurrence(debt: Dict):
+        """Jatuh tempo berikutnya (hanya satu instance yang dihitung)"""
+        return next(DebtManager.iter_occurrences(debt), None)
+    
+    @staticmethod
+    def _advance_recurrence(debt: Dict) -> bool:
+        """Pindah ke cicilan berikutnya, False jika semua cicilan sudah selesai"""
+        recurrence = debt.get("recurrence")
+        if not recurrence:
+            return False
+        recurrence["index"] = recurrence.get("index", 0) + 1
+        next_due = DebtManager.next_occurrence(debt)
+        if next_due is None:
+            return False
         
-        DebtManager.save_user_debts(user_id, data)
-        return len(data["debts"]) != original_length
+        debt["payment_date"] = next_due.strftime("%Y/%m/%d")
+        debt["remaining"] = int(DebtManager.parse_amount(debt.get("amount", "0")))
+        debt.pop("last_notified", None)
+        debt.pop("snoozed_until", None)
+        return True
+    
+    @staticmethod
+    def _refresh_summary_entry(data: Dict, key: str):
+        """Menghitung ulang ringkasan untuk satu penghutang saja"""
+        data["debtor_summary"].pop(key, None)
+        for debt in data["debts"]:
+            if DebtManager.normalize_name(debt.get("debtor_name")) == key:
+                DebtManager._summary_add(data, debt)
+    
+    @staticmethod
+    def get_remaining(debt: Dict) -> int:
+        """Sisa utang (O(1), tanpa memutar ulang riwayat pembayaran)"""
+        if "remaining" in debt:
+            return debt["remaining"]
+        return int(DebtManager.parse_amount(debt.get("amount", "0")))
+    
+    @staticmethod
+    def record_payment(user_id: int, debt_id: int, amount: Optional[int] = None) -> Optional[Dict]:
+        """Mencatat pembayaran (sebagian atau lunas), utang lunas dipindah ke arsip"""
+        with DebtManager.user_lock(user_id):
+            data = DebtManager.load_user_debts(user_id)
+            DebtManager._ensure_summary(data)
+            debt = next((d for d in data["debts"] if d["id"] == debt_id), None)
+            if debt is None:
+                return None
+            
+            remaining = DebtManager.get_remaining(debt)
+            paid = remaining if amount is None else min(amount, remaining)
+            
+            # Riwayat disimpan ringkas sebagai pasangan [timestamp, jumlah]
+            debt.setdefault("payments", []).append([int(time.time()), paid])
+            debt["remaining"] = remaining - paid
+            
+            entry = data["debtor_summary"].get(DebtManager.normalize_name(debt.get("debtor_name")))
+            if entry:
+                entry["total"] = max(0.0, entry["total"] - paid)
+            
+            settled = debt["remaining"] <= 0
+            if settled and DebtManager._advance_recurrence(debt):
+                # Utang berulang: lanjut ke cicilan berikutnya, bukan diarsipkan
+                settled = False
+                DebtManager._refresh_summary_entry(data, DebtManager.normalize_name(debt.get("debtor_name")))
+                DebtManager.save_user_debts(user_id, data)
+                return {"paid": paid, "remaining": debt["remaining"], "settled": False, "next_due": debt["payment_date"]}
+            
+            if settled:
+                # Keluarkan dari daftar dulu agar tanggal terawal dihitung tanpa utang ini
+                data["debts"].remove(debt)
+                DebtManager._summary_remove(data, debt)
+                debt["settled_at"] = datetime.now().isoformat()
+                data.setdefault("archive", []).append(debt)
+            
+            DebtManager.save_user_debts(user_id, data)
+            return {"paid": paid, "remaining": debt["remaining"], "settled": settled}
     
     @staticmethod
     def get_debt(user_id: int, debt_id: int) -> Optional[Dict]:
@@ -132,71 +1296,427 @@ class DebtManager:
         data = DebtManager.load_user_debts(user_id)
         return data["debts"]
     
+    @staticmethod
+    def iter_debts(user_id: int) -> Iterator[Dict]:
+        """Iterasi utang user satu per satu"""
+        data = DebtManager.load_user_debts(user_id)
+        yield from list(data["debts"])
+    
     @staticmethod
     def get_total_debt_amount(user_id: int) -> float:
         """Menghitung total jumlah utang"""
-        debts = DebtManager.get_all_debts(user_id)
-        total = 0
-        for debt in debts:
+        summary = DebtManager.get_debtor_summary(user_id)
+        return sum(entry["total"] for entry in summary.values())
+    
+    @staticmethod
+    def get_global_stats() -> Tuple[int, float, int]:
+        """Total utang, total nilai, dan jumlah file dari semua user (full scan disk)"""
+        total_debts = 0
+        total_amount = 0
+        user_files = list(DATABASE_DIR.glob("*.json"))
+        
+        for user_file in user_files:
             try:
-                # Remove currency symbols and convert to float
-                amount_str = str(debt["amount"]).replace('k', '000').replace('K', '000')
-                amount_str = ''.join(c for c in amount_str if c.isdigit() or c == '.')
-                total += float(amount_str)
+                start = time.perf_counter()
+                with open(user_file, 'r', encoding='utf-8') as f:
+                    raw = f.read()
+                    Metrics.record_io("debts", "read", len(raw), time.perf_counter() - start)
+                    data = json.loads(raw)
+                    total_debts += len(data.get("debts", []))
+                    
+                    # Hitung total amount
+                    if "debtor_summary" in data:
+                        total_amount += sum(entry["total"] for entry in data["debtor_summary"].values())
+                    else:
+                        for debt in data.get("debts", []):
+                            total_amount += DebtManager.parse_amount(debt.get("amount", "0"))
             except:
                 continue
-        return total
+        return total_debts, total_amount, len(user_files)
     
     @staticmethod
     def update_notification_interval(user_id: int, interval: int):
         """Memperbarui interval notifikasi"""
-        data = DebtManager.load_user_debts(user_id)
-        data["notification_interval"] = interval
-        DebtManager.save_user_debts(user_id, data)
+        with DebtManager.user_lock(user_id):
+            data = DebtManager.load_user_debts(user_id)
+            data["notification_interval"] = interval
+            DebtManager.save_user_debts(user_id, data)
+    
+    @staticmethod
+    def snooze_debt(user_id: int, debt_id: int, minutes: int = 60) -> Optional[datetime]:
+        """Menunda pengingat utang"""
+        with DebtManager.user_lock(user_id):
+            data = DebtManager.load_user_debts(user_id)
+            for debt in data["debts"]:
+                if debt["id"] == debt_id:
+                    until = datetime.now() + timedelta(minutes=minutes)
+                    debt["snoozed_until"] = until.isoformat()
+                    DebtManager.save_user_debts(user_id, data)
+                    return until
+            return None
     
     @staticmethod
     def toggle_notification_pause(user_id: int, pause: bool):
         """Mengaktifkan/menonaktifkan notifikasi"""
-        data = DebtManager.load_user_debts(user_id)
-        data["is_notification_paused"] = pause
-        DebtManager.save_user_debts(user_id, data)
+        with DebtManager.user_lock(user_id):
+            data = DebtManager.load_user_debts(user_id)
+            data["is_notification_paused"] = pause
+            DebtManager.save_user_debts(user_id, data)
 
-# Class untuk mengelola user
-class UserManager:
+# Batas import utang massal
+MAX_IMPORT_ROWS = 5000
+MAX_IMPORT_FILE_SIZE = 5 * 1024 * 1024  # 5 MB
+
+# Format jumlah: opsional "Rp", angka dengan pemisah ribuan/desimal, akhiran k (ribu)
+AMOUNT_PATTERN = re.compile(r"(?:rp\.?)?([\d.,]+)(k*)(?:,-|-)?")
+THOUSANDS_PATTERN = re.compile(r"\d{1,3}([.,])\d{3}(?:\1\d{3})*")
+
+# Pesan singkat untuk laporan error import
+IMPORT_ERRORS = {
+    "format": "format salah (minimal Nama | Jumlah)",
+    "amount": "jumlah tidak valid (contoh: 100k, 50.000)",
+    "date": "format tanggal salah (YYYY/MM/DD)",
+    "time": "format waktu salah (HH:MM)",
+    "limit": f"melebihi batas {MAX_IMPORT_ROWS} baris",
+    "recurrence": "format ulang salah (bulanan/mingguan, opsional x12, butuh tanggal)"
+}
+
+# Kata kunci frekuensi utang berulang
+RECURRENCE_FREQS = {
+    "bulanan": "monthly",
+    "monthly": "monthly",
+    "mingguan": "weekly",
+    "weekly": "weekly"
+}
+
+# Class untuk import utang massal (teks multi-baris, CSV, XLSX)
+class DebtImporter:
     @staticmethod
-    def load_users() -> Dict:
-        """Memuat data semua user"""
-        if USERS_FILE.exists():
-            with open(USERS_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {"users": {}}
+    def parse_parts(parts: List) -> Dict:
+        """Validasi satu baris data utang, raise ValueError(kode error) jika salah"""
+        parts = ["" if part is None else part for part in parts]
+        
+        # Sel tanggal/jam dari XLSX bisa berupa objek datetime
+        if len(parts) > 2 and isinstance(parts[2], datetime):
+            parts[2] = parts[2].strftime("%Y/%m/%d")
+        if len(parts) > 3 and hasattr(parts[3], "strftime"):
+            parts[3] = parts[3].strftime("%H:%M")
+        parts = [str(part).strip() for part in parts]
+        
+        if len(parts) < 2 or not parts[0] or not parts[1]:
+            raise ValueError("format")
+        
+        if DebtManager.parse_amount(parts[1]) < 1:
+            raise ValueError("amount")
+        
+        payment_date = parts[2] if len(parts) > 2 and parts[2] else None
+        notification_time = parts[3] if len(parts) > 3 and parts[3] else None
+        
+        if payment_date:
+            try:
+                datetime.strptime(payment_date, "%Y/%m/%d")
+            except ValueError:
+                raise ValueError("date")
+        
+        if notification_time:
+            try:
+                datetime.strptime(notification_time, "%H:%M")
+            except ValueError:
+                raise ValueError("time")
+        
+        debt_data = {
+            "debtor_name": parts[0],
+            "amount": parts[1],
+            "payment_date": payment_date,
+            "notification_time": notification_time,
+            "notes": parts[4] if len(parts) > 4 else ""
+        }
+        
+        if len(parts) > 5 and parts[5]:
+            debt_data["recurrence"] = DebtImporter.parse_recurrence(parts[5], payment_date)
+        return debt_data
     
     @staticmethod
-    def save_users(data: Dict):
-        """Menyimpan data user"""
-        with open(USERS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+    def parse_recurrence(text: str, payment_date: Optional[str]) -> Dict:
+        """Parse aturan ulang, contoh: `bulanan`, `mingguan x4`, `bulanan 12x`"""
+        words = text.casefold().split()
+        if not payment_date or not words or words[0] not in RECURRENCE_FREQS or len(words) > 2:
+            raise ValueError("recurrence")
+        
+        count = None
+        if len(words) == 2:
+            count_str = words[1].strip("x")
+            if not count_str.isdigit() or int(count_str) < 1:
+                raise ValueError("recurrence")
+            count = int(count_str)
+        
+        return {"freq": RECURRENCE_FREQS[words[0]], "count": count, "anchor": payment_date, "index": 0}
     
     @staticmethod
-    def add_user(user_id: int, username: str, first_name: str):
-        """Menambahkan user baru"""
-        data = UserManager.load_users()
-        if str(user_id) not in data["users"]:
-            data["users"][str(user_id)] = {
-                "username": username,
-                "first_name": first_name,
-                "joined_at": datetime.now().isoformat(),
-                "last_active": datetime.now().isoformat()
-            }
-            UserManager.save_users(data)
+    def parse_line(line: str) -> Dict:
+        """Validasi satu baris teks format `Nama | Jumlah | ...`"""
+        return DebtImporter.parse_parts(line.split('|'))
     
     @staticmethod
-    def update_last_active(user_id: int):
+    def iter_text_rows(text: str) -> Iterator[List[str]]:
+        """Baris dari pesan teks multi-baris"""
+        for line in text.splitlines():
+            yield line.split('|')
+    
+    @staticmethod
+    def iter_csv_rows(binary_file) -> Iterator[List[str]]:
+        """Baris dari file CSV (dibaca streaming, delimiter , ; atau |)"""
+        text = io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+        sample = text.read(4096)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;|")
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(text, dialect)
+    
+    @staticmethod
+    def iter_xlsx_rows(binary_file) -> Iterator[List]:
+        """Baris dari sheet pertama file XLSX (butuh openpyxl)"""
+        from openpyxl import load_workbook
+        
+        workbook = load_workbook(binary_file, read_only=True, data_only=True)
+        try:
+            for row in workbook.worksheets[0].iter_rows(values_only=True):
+                yield list(row)
+        finally:
+            workbook.close()
+    
+    @staticmethod
+    def parse_rows(rows: Iterable[List]) -> Tuple[List[Dict], List[Tuple[int, str]]]:
+        """Validasi semua baris, mengembalikan utang valid dan laporan error per baris"""
+        debts = []
+        errors = []
+        for line_no, row in enumerate(rows, 1):
+            # Lewati baris kosong dan header
+            if not any(str(cell).strip() for cell in row if cell is not None):
+                continue
+            if str(row[0]).strip().lower() in ("nama", "name", "debtor_name"):
+                continue
+            
+            if len(debts) >= MAX_IMPORT_ROWS:
+                errors.append((line_no, "limit"))
+                break
+            
+            try:
+                debts.append(DebtImporter.parse_parts(list(row)))
+            except ValueError as e:
+                errors.append((line_no, str(e)))
+        return debts, errors
+    
+    @staticmethod
+    def format_report(debt_ids: List[int], errors: List[Tuple[int, str]]) -> str:
+        """Membuat laporan hasil import"""
+        report = (
+            f"📥 **Import Utang Selesai**\n\n"
+            f"✅ Berhasil: {len(debt_ids)} utang\n"
+            f"❌ Gagal: {len(errors)} baris\n"
+        )
+        if debt_ids:
+            report += f"📌 ID: {debt_ids[0]} - {debt_ids[-1]}\n"
+        if errors:
+            report += "\n⚠️ **Baris yang gagal:**\n"
+            for line_no, code in errors[:20]:
+                report += f"• Baris {line_no}: {IMPORT_ERRORS.get(code, code)}\n"
+            if len(errors) > 20:
+                report += f"• ... dan {len(errors) - 20} baris lainnya\n"
+        return report
+
+# Pengaturan export utang
+EXPORT_FIELDS = ["id", "debtor_name", "amount", "remaining", "payment_date", "notification_time", "notes", "created_at"]
+EXPORT_GZIP_THRESHOLD = 500  # Export otomatis dikompres jika jumlah utang melebihi ini
+
+# Class untuk export utang user ke CSV/JSON
+class DebtExporter:
+    @staticmethod
+    def write_csv(debts: Iterable[Dict], text):
+        """Menulis utang ke CSV baris per baris"""
+        writer = csv.DictWriter(text, fieldnames=EXPORT_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for debt in debts:
+            writer.writerow(dict(debt, remaining=DebtManager.get_remaining(debt)))
+    
+    @staticmethod
+    def write_json(debts: Iterable[Dict], text):
+        """Menulis utang ke array JSON item per item"""
+        text.write("[\n")
+        for i, debt in enumerate(debts):
+            if i:
+                text.write(",\n")
+            row = dict(debt, remaining=DebtManager.get_remaining(debt))
+            text.write(json.dumps({field: row.get(field) for field in EXPORT_FIELDS}, ensure_ascii=False))
+        text.write("\n]\n")
+    
+    @staticmethod
+    def export(user_id: int, fmt: str = "csv", compress: Optional[bool] = None):
+        """Export utang user ke buffer (spooled), mengembalikan (buffer, nama file)"""
+        if compress is None:
+            compress = len(DebtManager.get_all_debts(user_id)) > EXPORT_GZIP_THRESHOLD
+        
+        filename = f"utang_{user_id}_{datetime.now().strftime('%Y%m%d')}.{fmt}"
+        buffer = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        raw = gzip.GzipFile(fileobj=buffer, mode='wb') if compress else buffer
+        
+        text = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+        if fmt == "json":
+            DebtExporter.write_json(DebtManager.iter_debts(user_id), text)
+        else:
+            DebtExporter.write_csv(DebtManager.iter_debts(user_id), text)
+        text.flush()
+        text.detach()
+        
+        if compress:
+            raw.close()
+            filename += ".gz"
+        buffer.seek(0)
+        return buffer, filename
+
+INDEX_CACHE_SIZE = 1000
+
+# Class untuk index pencarian utang per user (dibangun lazy, invalidasi via versi data)
+class DebtIndex:
+    # Cache index: user_id -> (versi data, index)
+    _indexes = OrderedDict()
+    
+    @staticmethod
+    def build_index(user_id: int) -> Dict:
+        """Membangun index nama (prefix) dan index jatuh tempo"""
+        names = []
+        due = []
+        for debt in DebtManager.get_all_debts(user_id):
+            name = str(debt.get("debtor_name") or "").casefold()
+            # Index nama lengkap dan setiap kata agar "doe" menemukan "John Doe"
+            for key in {name, *name.split()}:
+                if key:
+                    names.append((key, debt["id"], debt))
+            
+            if debt.get("payment_date"):
+                try:
+                    due_date = datetime.strptime(debt["payment_date"], "%Y/%m/%d").date()
+                except ValueError:
+                    continue
+                due.append((due_date, debt["id"], debt))
+        
+        names.sort(key=lambda item: (item[0], item[1]))
+        due.sort(key=lambda item: (item[0], item[1]))
+        return {
+            "name_keys": [item[0] for item in names],
+            "name_debts": [item[2] for item in names],
+            "due_dates": [item[0] for item in due],
+            "due_debts": [item[2] for item in due]
+        }
+    
+    @staticmethod
+    def get_index(user_id: int) -> Dict:
+        """Mendapatkan index dari cache, bangun ulang jika data berubah"""
+        with DebtManager.user_lock(user_id):
+            version = DebtManager.get_data_version(user_id)
+            with DebtManager._lock:
+                cached = DebtIndex._indexes.get(user_id)
+                if cached and cached[0] == version:
+                    DebtIndex._indexes.move_to_end(user_id)
+                    return cached[1]
+            
+            index = DebtIndex.build_index(user_id)
+            with DebtManager._lock:
+                DebtIndex._indexes[user_id] = (version, index)
+                while len(DebtIndex._indexes) > INDEX_CACHE_SIZE:
+                    DebtIndex._indexes.popitem(last=False)
+            return index
+    
+    @staticmethod
+    def search_by_name(user_id: int, query: str) -> List[Dict]:
+        """Mencari utang berdasarkan awalan nama penghutang"""
+        prefix = query.strip().casefold()
+        if not prefix:
+            return []
+        index = DebtIndex.get_index(user_id)
+        keys = index["name_keys"]
+        start = bisect.bisect_left(keys, prefix)
+        
+        results = {}
+        for i in range(start, len(keys)):
+            if not keys[i].startswith(prefix):
+                break
+            debt = index["name_debts"][i]
+            results[debt["id"]] = debt
+        return [results[debt_id] for debt_id in sorted(results)]
+    
+    @staticmethod
+    def due_between(user_id: int, start=None, end=None) -> List[Dict]:
+        """Utang dengan jatuh tempo di rentang [start, end) (tanggal)"""
+        index = DebtIndex.get_index(user_id)
+        dates = index["due_dates"]
+        lo = bisect.bisect_left(dates, start) if start else 0
+        hi = bisect.bisect_left(dates, end) if end else len(dates)
+        return index["due_debts"][lo:hi]
+    
+    @staticmethod
+    def overdue(user_id: int) -> List[Dict]:
+        """Utang yang sudah lewat jatuh tempo"""
+        return DebtIndex.due_between(user_id, end=datetime.now().date())
+    
+    @staticmethod
+    def due_this_week(user_id: int) -> List[Dict]:
+        """Utang yang jatuh tempo mulai hari ini sampai akhir minggu (Minggu)"""
+        today = datetime.now().date()
+        end = today + timedelta(days=7 - today.weekday())
+        return DebtIndex.due_between(user_id, today, end)
+
+# Class untuk mengelola user
+class UserManager:
+    # users.json dilayani dari memori, ditulis berkala oleh persist_stores
+    _store = JsonFileStore(USERS_FILE, {"users": {}})
+    
+    @staticmethod
+    def load_users() -> Dict:
+        """Memuat data semua user"""
+        return UserManager._store.data
+    
+    @staticmethod
+    def save_users(data: Dict, user_id: Optional[int] = None):
+        """Menyimpan data user (user_id: user yang berubah, None = seluruh file)"""
+        if user_id is None:
+            UserManager._store.set(data)
+        else:
+            UserManager._store.set(data, "users", str(user_id))
+    
+    @staticmethod
+    def add_user(user_id: int, username: str, first_name: str):
+        """Menambahkan user baru"""
+        with UserManager._store.lock:
+            if str(user_id) in UserManager.load_users()["users"]:
+                return
+        # User lama yang diarsipkan dipulihkan, bukan didaftarkan ulang
+        if RetentionManager.restore_user(user_id):
+            return
+        with UserManager._store.lock:
+            data = UserManager.load_users()
+            if str(user_id) not in data["users"]:
+                data["users"][str(user_id)] = {
+                    "username": username,
+                    "first_name": first_name,
+                    "joined_at": datetime.now().isoformat(),
+                    "last_active": datetime.now().isoformat()
+                }
+                UserManager.save_users(data, user_id)
+    
+    @staticmethod
+    def update_last_active(user_id: int):
         """Memperbarui waktu aktif terakhir user"""
-        data = UserManager.load_users()
-        if str(user_id) in data["users"]:
-            data["users"][str(user_id)]["last_active"] = datetime.now().isoformat()
-            UserManager.save_users(data)
+        with UserManager._store.lock:
+            data = UserManager.load_users()
+            if str(user_id) in data["users"]:
+                data["users"][str(user_id)]["last_active"] = datetime.now().isoformat()
+                UserManager.save_users(data, user_id)
+                return
+        # Tidak ada di users.json: mungkin sudah diarsipkan (last_active diisi saat dipulihkan)
+        RetentionManager.restore_user(user_id)
     
     @staticmethod
     def get_total_users() -> int:
@@ -207,55 +1727,62 @@ class UserManager:
     @staticmethod
     def get_all_user_ids() -> List[int]:
         """Mendapatkan semua ID user"""
-        data = UserManager.load_users()
-        return [int(user_id) for user_id in data["users"].keys()]
+        with UserManager._store.lock:
+            data = UserManager.load_users()
+            return [int(user_id) for user_id in data["users"].keys()]
 
 # Class untuk mengelola join groups
 class JoinGroupManager:
+    # Dilayani dari memori, ditulis berkala oleh persist_stores (satu lock untuk ketiganya)
+    _lock = threading.RLock()
+    _groups_store = JsonFileStore(JOIN_FILE, {"groups": []}, _lock)
+    _users_store = JsonFileStore(JOIN_USERS_FILE, {"users": {}}, _lock)
+    _stats_store = JsonFileStore(JOIN_STATS_FILE, {}, _lock)
+    
     @staticmethod
     def load_groups() -> Dict:
         """Memuat data groups yang wajib diikuti"""
-        if JOIN_FILE.exists():
-            with open(JOIN_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {"groups": []}
+        return JoinGroupManager._groups_store.data
     
     @staticmethod
     def save_groups(data: Dict):
         """Menyimpan data groups"""
-        with open(JOIN_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        JoinGroupManager._groups_store.set(data, "groups")
     
     @staticmethod
     def add_group(group_username: str):
         """Menambahkan group baru"""
-        data = JoinGroupManager.load_groups()
-        
-        # Hapus @ jika ada
-        if group_username.startswith('@'):
-            group_username = group_username[1:]
-        
-        if group_username not in data["groups"]:
-            data["groups"].append(group_username)
-            JoinGroupManager.save_groups(data)
-            return True
-        return False
+        with JoinGroupManager._lock:
+            data = JoinGroupManager.load_groups()
+            
+            # Hapus @ jika ada
+            if group_username.startswith('@'):
+                group_username = group_username[1:]
+            
+            if group_username not in data["groups"]:
+                data["groups"].append(group_username)
+                JoinGroupManager.save_groups(data)
+                JoinGroupManager.rebuild_join_stats()
+                return True
+            return False
     
     @staticmethod
     def remove_group(index: int) -> bool:
         """Menghapus group berdasarkan index"""
-        data = JoinGroupManager.load_groups()
-        if 0 <= index < len(data["groups"]):
-            removed = data["groups"].pop(index)
-            JoinGroupManager.save_groups(data)
-            return removed
-        return False
+        with JoinGroupManager._lock:
+            data = JoinGroupManager.load_groups()
+            if 0 <= index < len(data["groups"]):
+                removed = data["groups"].pop(index)
+                JoinGroupManager.save_groups(data)
+                JoinGroupManager.rebuild_join_stats()
+                return removed
+            return False
     
     @staticmethod
     def get_all_groups() -> List[str]:
         """Mendapatkan semua groups"""
         data = JoinGroupManager.load_groups()
-        return data["groups"]
+        return list(data["groups"])
     
     @staticmethod
     def get_groups_count() -> int:
@@ -266,26 +1793,56 @@ class JoinGroupManager:
     @staticmethod
     def load_join_users() -> Dict:
         """Memuat data user yang sudah join"""
-        if JOIN_USERS_FILE.exists():
-            with open(JOIN_USERS_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {"users": {}}
+        return JoinGroupManager._users_store.data
     
     @staticmethod
-    def save_join_users(data: Dict):
-        """Menyimpan data user yang sudah join"""
-        with open(JOIN_USERS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+    def save_join_users(data: Dict, user_id: Optional[int] = None):
+        """Menyimpan data user yang sudah join (user_id: user yang berubah, None = seluruh file)"""
+        if user_id is None:
+            JoinGroupManager._users_store.set(data)
+        else:
+            JoinGroupManager._users_store.set(data, "users", str(user_id))
     
     @staticmethod
     def update_user_join_status(user_id: int, groups_status: Dict):
         """Memperbarui status join user"""
-        data = JoinGroupManager.load_join_users()
-        data["users"][str(user_id)] = {
-            "groups_status": groups_status,
-            "last_checked": datetime.now().isoformat()
-        }
-        JoinGroupManager.save_join_users(data)
+        with JoinGroupManager._lock:
+            # Counter dimuat (atau dibangun untuk data lama) sebelum status baru ditulis,
+            # agar perubahan ini tidak terhitung dua kali
+            stats = JoinGroupManager.load_join_stats()
+            data = JoinGroupManager.load_join_users()
+            old_status = data["users"].get(str(user_id), {}).get("groups_status", {})
+            data["users"][str(user_id)] = {
+                "groups_status": groups_status,
+                "last_checked": datetime.now().isoformat()
+            }
+            JoinGroupManager.save_join_users(data, user_id)
+            
+            # Update counter hanya untuk group yang statusnya berubah
+            changed = {
+                group: (1 if groups_status.get(group, False) else -1)
+                for group in set(old_status) | set(groups_status)
+                if bool(old_status.get(group, False)) != bool(groups_status.get(group, False))
+            }
+            for group, delta in changed.items():
+                if group in stats["counters"]:
+                    JoinGroupManager.increment_join_counter(group, delta)
+    
+    @staticmethod
+    def remove_user(user_id: int):
+        """Menghapus status join user (user diarsipkan), counter per group ikut dikurangi"""
+        with JoinGroupManager._lock:
+            # Counter dimuat (atau dibangun untuk data lama) sebelum user dihapus dari join_users
+            stats = JoinGroupManager.load_join_stats()
+            data = JoinGroupManager.load_join_users()
+            entry = data["users"].pop(str(user_id), None)
+            if entry is None:
+                return
+            JoinGroupManager.save_join_users(data, user_id)
+            
+            for group, joined in entry.get("groups_status", {}).items():
+                if joined and group in stats["counters"]:
+                    JoinGroupManager.increment_join_counter(group, -1)
     
     @staticmethod
     def get_user_join_status(user_id: int) -> Dict:
@@ -296,180 +1853,1305 @@ class JoinGroupManager:
     @staticmethod
     def check_all_users_joined() -> Dict:
         """Memeriksa semua user yang sudah join"""
-        groups = JoinGroupManager.get_all_groups()
-        user_data = JoinGroupManager.load_join_users()
-        
-        result = {}
-        for group in groups:
-            result[group] = []
-        
-        for user_id_str, user_info in user_data["users"].items():
-            user_id = int(user_id_str)
-            user_status = user_info.get("groups_status", {})
+        with JoinGroupManager._lock:
+            groups = JoinGroupManager.get_all_groups()
+            user_data = JoinGroupManager.load_join_users()
             
+            result = {}
             for group in groups:
-                if user_status.get(group, False):
-                    result[group].append(user_id)
+                result[group] = []
+            
+            for user_id_str, user_info in user_data["users"].items():
+                user_id = int(user_id_str)
+                user_status = user_info.get("groups_status", {})
+                
+                for group in groups:
+                    if user_status.get(group, False):
+                        result[group].append(user_id)
+            
+            return result
+    
+    @staticmethod
+    def load_join_stats() -> Dict:
+        """Memuat counter user yang sudah join per group"""
+        data = JoinGroupManager._stats_store.data
+        if "counters" not in data:
+            # Belum ada counter (data lama), bangun sekali dari join_users.json
+            return JoinGroupManager.rebuild_join_stats()
+        return data
+    
+    @staticmethod
+    def save_join_stats(data: Dict):
+        """Menyimpan counter join per group"""
+        data["updated_at"] = datetime.now().isoformat()
+        JoinGroupManager._stats_store.set(data)
+    
+    @staticmethod
+    def increment_join_counter(group: str, delta: int):
+        """Mengubah counter satu group; digabung sebagai delta dengan instance lain"""
+        with JoinGroupManager._lock:
+            JoinGroupManager._stats_store.increment("counters", group, delta)
+            data = JoinGroupManager._stats_store.data
+            data["updated_at"] = datetime.now().isoformat()
+            JoinGroupManager._stats_store.set(data, "updated_at")
+    
+    @staticmethod
+    def rebuild_join_stats() -> Dict:
+        """Menghitung ulang counter join dari join_users.json (full scan)"""
+        with JoinGroupManager._lock:
+            join_stats = JoinGroupManager.check_all_users_joined()
+            data = {"counters": {group: len(user_ids) for group, user_ids in join_stats.items()}}
+            JoinGroupManager.save_join_stats(data)
+            return data
+    
+    @staticmethod
+    def get_join_counters() -> Dict[str, int]:
+        """Mendapatkan jumlah user yang sudah join untuk setiap group"""
+        counters = JoinGroupManager.load_join_stats()["counters"]
+        return {group: counters.get(group, 0) for group in JoinGroupManager.get_all_groups()}
+    
+    @staticmethod
+    def export_join_users_csv():
+        """Membuat export CSV (gzip) status join semua user secara streaming"""
+        groups = JoinGroupManager.get_all_groups()
+        with JoinGroupManager._lock:
+            user_items = list(JoinGroupManager.load_join_users()["users"].items())
         
-        return result
+        # Tulis langsung ke file sementara, pindah ke disk jika melebihi 1 MB
+        buffer = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        with gzip.GzipFile(fileobj=buffer, mode='wb') as gz:
+            with io.TextIOWrapper(gz, encoding='utf-8', newline='') as text:
+                writer = csv.writer(text)
+                writer.writerow(["user_id", "last_checked"] + groups)
+                for user_id_str, user_info in user_items:
+                    status = user_info.get("groups_status", {})
+                    writer.writerow(
+                        [user_id_str, user_info.get("last_checked", "")]
+                        + [1 if status.get(group, False) else 0 for group in groups]
+                    )
+        buffer.seek(0)
+        return buffer
 
-# Notifikasi Manager
-class NotificationManager:
-    _instance = None
-    _active_notifications = {}
+# Class untuk cache file_id media statis (icon.png, qris.jpeg)
+class MediaCache:
+    _store = JsonFileStore(MEDIA_CACHE_FILE, {"files": {}})
+    _hashes = {}
     
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._running = True
-            cls._instance._thread = threading.Thread(target=cls._instance._check_notifications, daemon=True)
-            cls._instance._thread.start()
-        return cls._instance
+    @staticmethod
+    def load_cache() -> Dict:
+        """Memuat cache file_id (sekali, lalu disimpan di memori)"""
+        return MediaCache._store.data
     
-    def _check_notifications(self):
-        """Thread untuk memeriksa dan mengirim notifikasi"""
-        while self._running:
-            try:
-                user_files = list(DATABASE_DIR.glob("*.json"))
-                
-                for user_file in user_files:
-                    try:
-                        user_id = int(user_file.stem)
-                        with open(user_file, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                        
-                        if data.get("is_notification_paused", False):
-                            continue
-                        
-                        notification_interval = data.get("notification_interval", 5)
-                        
-                        for debt in data.get("debts", []):
-                            if debt.get("payment_date") and debt.get("notification_time"):
-                                try:
-                                    payment_date_str = debt["payment_date"]
-                                    notification_time_str = debt["notification_time"]
-                                    
-                                    # Parse tanggal dan waktu
-                                    payment_date = datetime.strptime(payment_date_str, "%Y/%m/%d").date()
-                                    notification_time = datetime.strptime(notification_time_str, "%H:%M").time()
-                                    
-                                    # Buat datetime lengkap
-                                    notification_datetime = datetime.combine(payment_date, notification_time)
-                                    
-                                    # Jika sudah lewat waktu notifikasi hari ini
-                                    now = datetime.now()
-                                    if now >= notification_datetime:
-                                        # Periksa apakah sudah mengirim notifikasi hari ini
-                                        last_notified = debt.get("last_notified")
-                                        if last_notified:
-                                            last_notified_date = datetime.fromisoformat(last_notified).date()
-                                            if last_notified_date == now.date():
-                                                continue
-                                        
-                                        # Update last_notified
-                                        debt["last_notified"] = now.isoformat()
-                                        DebtManager.save_debts(user_id, data)
-                                        
-                                except Exception as e:
-                                    logger.error(f"Error processing notification: {e}")
-                                    continue
-                    
-                    except Exception as e:
-                        logger.error(f"Error checking notifications for {user_file}: {e}")
-                
-                time.sleep(60)  # Cek setiap menit
-            
-            except Exception as e:
-                logger.error(f"Error in notification thread: {e}")
-                time.sleep(60)
+    @staticmethod
+    def save_cache(data: Dict, file_hash: Optional[str] = None):
+        """Menyimpan cache file_id (file_hash: entri yang berubah, None = seluruh file)"""
+        if file_hash is None:
+            MediaCache._store.set(data)
+        else:
+            MediaCache._store.set(data, "files", file_hash)
     
-    def stop(self):
-        """Menghentikan thread notifikasi"""
-        self._running = False
-        if self._thread:
-            self._thread.join()
+    @staticmethod
+    def get_file_hash(path: str) -> str:
+        """Menghitung hash isi file, dihitung ulang hanya jika file berubah"""
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = MediaCache._hashes.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                sha.update(chunk)
+        file_hash = sha.hexdigest()
+        MediaCache._hashes[path] = (signature, file_hash)
+        return file_hash
+    
+    @staticmethod
+    async def reply_photo(message: Message, path: str, **kwargs) -> Message:
+        """Mengirim foto memakai file_id cache, upload hanya jika belum ada/berubah"""
+        file_hash = await run_io(MediaCache.get_file_hash, path)
+        cache = MediaCache.load_cache()
+        entry = cache["files"].get(file_hash)
+        
+        if entry:
+            try:
+                return await message.reply_photo(photo=entry["file_id"], **kwargs)
+            except BadRequest as e:
+                # file_id tidak berlaku lagi, upload ulang
+                logger.warning(f"Cached file_id for {path} rejected: {e}")
+        
+        photo = await run_io(Path(path).read_bytes)
+        sent = await message.reply_photo(photo=photo, filename=os.path.basename(path), **kwargs)
+        
+        with MediaCache._store.lock:
+            cache["files"][file_hash] = {
+                "file_id": sent.photo[-1].file_id,
+                "filename": os.path.basename(path),
+                "uploaded_at": datetime.now().isoformat()
+            }
+            MediaCache.save_cache(cache, file_hash)
+        return sent
 
-# Fungsi untuk mengecek apakah user sudah join semua group
-async def check_user_joined_all_groups(user_id: int, context: ContextTypes.DEFAULT_TYPE) -> bool:
-    """Mengecek apakah user sudah join semua group yang diwajibkan"""
-    groups = JoinGroupManager.get_all_groups()
+# Class untuk backup semua data (full/incremental) ke tar.gz secara streaming
+class BackupManager:
+    # Hanya satu backup yang berjalan pada satu waktu
+    _lock = threading.Lock()
     
-    if not groups:
-        return True  # Tidak ada group yang diwajibkan
+    @staticmethod
+    def load_manifest() -> Dict:
+        """Manifest backup terakhir: signature setiap file yang sudah tercakup"""
+        if BACKUP_MANIFEST_FILE.exists():
+            with open(BACKUP_MANIFEST_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {"backup": None, "files": {}, "since_full": 0}
     
-    user_status = JoinGroupManager.get_user_join_status(user_id)
-    groups_status = user_status.get("groups_status", {})
+    @staticmethod
+    def _save_manifest(manifest: Dict):
+        tmp_path = BACKUP_MANIFEST_FILE.with_name(BACKUP_MANIFEST_FILE.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, BACKUP_MANIFEST_FILE)
     
-    # Jika belum pernah dicek atau perlu dicek ulang
-    last_checked = user_status.get("last_checked")
-    if last_checked:
-        last_checked_time = datetime.fromisoformat(last_checked)
-        if (datetime.now() - last_checked_time).seconds < 300:  # Cache 5 menit
-            # Gunakan data cache
-            return all(groups_status.get(group, False) for group in groups)
+    @staticmethod
+    def _add_bytes(tar: tarfile.TarFile, arcname: str, payload: bytes, mtime: float):
+        info = tarfile.TarInfo(arcname)
+        info.size = len(payload)
+        info.mtime = int(mtime)
+        tar.addfile(info, io.BytesIO(payload))
     
-    # Cek status join untuk setiap group
-    new_status = {}
-    all_joined = True
+    @staticmethod
+    def _store_snapshots() -> Iterator[Tuple[str, bytes]]:
+        """Snapshot store di memori; store yang berbagi lock diserialisasi bersama agar konsisten"""
+        groups = OrderedDict()
+        for store in JsonFileStore.instances:
+            groups.setdefault(id(store.lock), []).append(store)
+        for stores in groups.values():
+            with stores[0].lock:
+                payloads = [
+                    (store.path.as_posix(), json.dumps(store.data, ensure_ascii=False, indent=2).encode("utf-8"))
+                    for store in stores
+                ]
+            yield from payloads
     
-    for group in groups:
-        try:
-            chat_member = await context.bot.get_chat_member(f"@{group}", user_id)
-            is_member = chat_member.status in [ChatMember.MEMBER, ChatMember.ADMINISTRATOR, ChatMember.OWNER]
-            new_status[group] = is_member
+    @staticmethod
+    def create_backup(incremental: bool = False) -> Dict:
+        """Membuat backup ke BACKUP_DIR (dijalankan di thread pool I/O), mengembalikan ringkasannya"""
+        with BackupManager._lock:
+            start = time.perf_counter()
+            BACKUP_DIR.mkdir(parents=True, exist_ok=True)
+            previous = BackupManager.load_manifest()
+            if not previous["backup"]:
+                incremental = False  # belum ada basis untuk incremental
+            base_files = previous["files"] if incremental else {}
             
-            if not is_member:
-                all_joined = False
-        except Exception as e:
-            logger.error(f"Error checking membership for {user_id} in @{group}: {e}")
-            new_status[group] = False
-            all_joined = False
+            kind = "incr" if incremental else "full"
+            now = datetime.now()
+            name = f"kapanbayar_{kind}_{now.strftime('%Y%m%d_%H%M%S')}.tar.gz"
+            path = BACKUP_DIR / name
+            tmp_path = path.with_name(name + ".tmp")
+            files = {}
+            added = 0
+            
+            with tarfile.open(tmp_path, "w:gz") as tar:
+                for arcname, payload in BackupManager._store_snapshots():
+                    files[arcname] = hashlib.sha256(payload).hexdigest()
+                    if base_files.get(arcname) != files[arcname]:
+                        BackupManager._add_bytes(tar, arcname, payload, now.timestamp())
+                        added += 1
+                
+                # File utang dibaca satu per satu di bawah lock user-nya (konsisten dengan baca-ubah-tulis handler)
+                for user_file in sorted(DATABASE_DIR.glob("*.json")):
+                    arcname = f"{DATABASE_DIR.as_posix()}/{user_file.name}"
+                    user_lock = DebtManager.user_lock(int(user_file.stem)) if user_file.stem.isdigit() else contextlib.nullcontext()
+                    with user_lock:
+                        try:
+                            stat = user_file.stat()
+                        except FileNotFoundError:
+                            continue
+                        files[arcname] = f"{stat.st_mtime_ns}:{stat.st_size}"
+                        if base_files.get(arcname) == files[arcname]:
+                            continue
+                        payload = user_file.read_bytes()
+                    BackupManager._add_bytes(tar, arcname, payload, stat.st_mtime)
+                    added += 1
+                
+                # Arsip retensi selalu ditulis atomic (rename), jadi dibaca tanpa lock
+                for archive_file in sorted(ARCHIVE_DIR.rglob("*.gz")):
+                    arcname = (Path(ARCHIVE_DIR.name) / archive_file.relative_to(ARCHIVE_DIR)).as_posix()
+                    try:
+                        stat = archive_file.stat()
+                        files[arcname] = f"{stat.st_mtime_ns}:{stat.st_size}"
+                        if base_files.get(arcname) == files[arcname]:
+                            continue
+                        payload = archive_file.read_bytes()
+                    except FileNotFoundError:
+                        files.pop(arcname, None)  # user dipulihkan saat backup berjalan
+                        continue
+                    BackupManager._add_bytes(tar, arcname, payload, stat.st_mtime)
+                    added += 1
+                
+                deleted = sorted(set(base_files) - set(files))
+                info = {
+                    "type": "incremental" if incremental else "full",
+                    "created_at": now.isoformat(),
+                    "base": previous["backup"] if incremental else None,
+                    "files": len(files),
+                    "added": added,
+                    "deleted": deleted
+                }
+                BackupManager._add_bytes(tar, "backup_manifest.json", json.dumps(info, indent=2).encode("utf-8"), now.timestamp())
+            
+            os.replace(tmp_path, path)
+            BackupManager._save_manifest({
+                "backup": name,
+                "created_at": now.isoformat(),
+                "files": files,
+                "since_full": previous.get("since_full", 0) + 1 if incremental else 0
+            })
+            BackupManager.prune()
+            
+            size = path.stat().st_size
+            elapsed = time.perf_counter() - start
+            Metrics.record_io("backup", "write", size, elapsed)
+            Metrics.set_gauge("kapanbayar_backup_last_success_timestamp", time.time())
+            logger.info(f"Backup {info['type']} {name}: {added}/{len(files)} file, {size} byte, {elapsed:.1f} detik")
+            return {**info, "path": path, "size": size, "elapsed": elapsed}
     
-    # Update status user
-    JoinGroupManager.update_user_join_status(user_id, new_status)
+    @staticmethod
+    def run_scheduled() -> Dict:
+        """Backup terjadwal: full setiap BACKUP_FULL_EVERY kali, sisanya incremental"""
+        since_full = BackupManager.load_manifest().get("since_full", 0)
+        return BackupManager.create_backup(incremental=since_full + 1 < BACKUP_FULL_EVERY)
     
-    return all_joined
+    @staticmethod
+    def list_backups() -> List[Path]:
+        """File backup di BACKUP_DIR, urut dari yang terlama"""
+        if not BACKUP_DIR.exists():
+            return []
+        return sorted(BACKUP_DIR.glob("kapanbayar_*.tar.gz"), key=lambda path: path.name.split("_", 2)[2])
+    
+    @staticmethod
+    def prune():
+        """Menyimpan BACKUP_KEEP rantai terakhir (full beserta incremental sesudahnya)"""
+        backups = BackupManager.list_backups()
+        fulls = [path for path in backups if path.name.startswith("kapanbayar_full_")]
+        if len(fulls) <= BACKUP_KEEP:
+            return
+        oldest_kept = backups.index(fulls[-BACKUP_KEEP])
+        for path in backups[:oldest_kept]:
+            path.unlink(missing_ok=True)
 
-# Fungsi untuk membuat keyboard utama
-def get_main_keyboard() -> ReplyKeyboardMarkup:
-    """Membuat keyboard utama"""
-    keyboard = [
-        [KeyboardButton("➕ Tambah Utang"), KeyboardButton("🗑️ Hapus Utang")],
-        [KeyboardButton("📋 Daftar Utang"), KeyboardButton("⏸️ Jeda Notifikasi")],
-        [KeyboardButton("❓ Panduan"), KeyboardButton("💝 Support Developer")],
-        [KeyboardButton("⬅️ Kembali ke Menu")]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
+async def scheduled_backups(application: Application):
+    """Menjalankan backup setiap BACKUP_INTERVAL jam"""
+    while True:
+        await asyncio.sleep(BACKUP_INTERVAL * 3600)
+        if not LeaderElection.holds_lease():
+            continue
+        try:
+            await run_io(BackupManager.run_scheduled)
+        except Exception as e:
+            logger.error(f"Scheduled backup failed: {e}")
 
-def get_join_keyboard(groups: List[str]) -> InlineKeyboardMarkup:
-    """Membuat keyboard untuk join group"""
-    keyboard = []
+# Class untuk memindahkan data dingin (utang lunas lama, user tidak aktif) ke arsip terkompresi
+class RetentionManager:
+    # Hanya satu putaran retensi yang berjalan pada satu waktu
+    _lock = threading.Lock()
     
-    for group in groups:
-        keyboard.append([
-            InlineKeyboardButton(f"🔗 Join @{group}", url=f"https://t.me/{group}")
-        ])
+    @staticmethod
+    def get_user_archive(user_id: int) -> Path:
+        """File arsip untuk user yang tidak aktif"""
+        return ARCHIVE_DIR / "users" / f"{user_id}.json.gz"
     
-    keyboard.append([
-        InlineKeyboardButton("✅ Sudah Join", callback_data="check_join")
-    ])
+    @staticmethod
+    def _last_seen(user: Dict) -> str:
+        """Waktu aktif terakhir user (ISO), joined_at untuk data lama tanpa last_active"""
+        return user.get("last_active") or user.get("joined_at") or ""
     
-    return InlineKeyboardMarkup(keyboard)
-
-# Command handlers
-async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handler untuk command /start"""
-    user = update.effective_user
-    user_id = user.id
+    @staticmethod
+    def archive_user(user_id: int, cutoff: datetime) -> bool:
+        """Memindahkan user yang tidak aktif sejak cutoff ke arsip, False jika user tetap di data panas"""
+        path = RetentionManager.get_user_archive(user_id)
+        with DebtManager.user_lock(user_id), UserManager._store.lock:
+            users = UserManager.load_users()
+            user = users["users"].get(str(user_id))
+            if user is None or RetentionManager._last_seen(user) >= cutoff.isoformat():
+                return False
+            
+            user_file = DebtManager.get_user_file(user_id)
+            # Arsip tanpa file utang: putaran sebelumnya berhenti sebelum users.json ditulis
+            if user_file.exists() or not path.exists():
+                data = DebtManager.peek_user_debts(user_id) if user_file.exists() else None
+                if data and data.get("debts"):
+                    return False  # Masih ada utang aktif (pengingat tetap jalan), user tetap di data panas
+                record = {"user_id": user_id, "user": user, "debts": data, "archived_at": datetime.now().isoformat()}
+                start = time.perf_counter()
+                payload = gzip.compress(json.dumps(record, ensure_ascii=False).encode("utf-8"))
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_name(path.name + ".tmp")
+                with open(tmp_path, 'wb') as f:
+                    f.write(payload)
+                os.replace(tmp_path, path)
+                Metrics.record_io("archive", "write", len(payload), time.perf_counter() - start)
+                user_file.unlink(missing_ok=True)
+            
+            del users["users"][str(user_id)]
+            UserManager.save_users(users, user_id)
+            DebtManager.forget_user(user_id)
+        # Status join tidak diarsipkan, dicek ulang ke Telegram saat user kembali
+        JoinGroupManager.remove_user(user_id)
+        return True
     
-    # Tambah user ke database
-    UserManager.add_user(user_id, user.username, user.first_name)
-    UserManager.update_last_active(user_id)
+    @staticmethod
+    def restore_user(user_id: int) -> bool:
+        """Mengembalikan user dari arsip saat user kembali, False jika user tidak diarsipkan"""
+        path = RetentionManager.get_user_archive(user_id)
+        if not path.exists():
+            return False
+        with DebtManager.user_lock(user_id), UserManager._store.lock:
+            if not path.exists():
+                return False  # Sudah dipulihkan oleh thread lain
+            start = time.perf_counter()
+            payload = path.read_bytes()
+            record = json.loads(gzip.decompress(payload))
+            Metrics.record_io("archive", "read", len(payload), time.perf_counter() - start)
+            
+            if record.get("debts") is not None and not DebtManager.get_user_file(user_id).exists():
+                DebtManager.save_user_debts(user_id, record["debts"])
+            users = UserManager.load_users()
+            user = users["users"].setdefault(str(user_id), record["user"])
+            user["last_active"] = datetime.now().isoformat()
+            UserManager.save_users(users, user_id)
+            path.unlink()
+        Metrics.inc("kapanbayar_retention_restored_total")
+        logger.info(f"User {user_id} restored from archive")
+        return True
     
-    # Cek apakah user harus join group
-    groups = JoinGroupManager.get_all_groups()
-    if groups:
-        all_joined = await check_user_joined_all_groups(user_id, context)
+    @staticmethod
+    def archive_settled(cutoff: datetime) -> int:
+        """Memindahkan utang lunas sebelum cutoff dari file user ke satu file arsip per putaran"""
+        cutoff_iso = cutoff.isoformat()
+        path = ARCHIVE_DIR / "settled" / f"settled_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl.gz"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        start = time.perf_counter()
+        user_ids = []
+        moved = 0
+        
+        # Tahap 1: tulis arsip sampai lengkap, file user belum diubah
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            for user_file in DATABASE_DIR.glob("*.json"):
+                try:
+                    user_id = int(user_file.stem)
+                except ValueError:
+                    continue
+                with DebtManager.user_lock(user_id):
+                    old = [
+                        debt for debt in DebtManager.peek_user_debts(user_id).get("archive", [])
+                        if debt.get("settled_at", "") < cutoff_iso
+                    ]
+                    for debt in old:
+                        f.write(json.dumps({"user_id": user_id, "debt": debt}, ensure_ascii=False) + "\n")
+                if old:
+                    user_ids.append(user_id)
+                    moved += len(old)
+        if not moved:
+            tmp_path.unlink()
+            return 0
+        os.replace(tmp_path, path)
+        Metrics.record_io("archive", "write", path.stat().st_size, time.perf_counter() - start)
+        
+        # Tahap 2: hapus dari file user; jika berhenti di tengah, putaran berikutnya mengarsip ulang sisanya
+        for user_id in user_ids:
+            with DebtManager.user_lock(user_id):
+                if not DebtManager.get_user_file(user_id).exists():
+                    continue
+                cached = user_id in DebtManager._cache
+                data = DebtManager.peek_user_debts(user_id)
+                data["archive"] = [debt for debt in data.get("archive", []) if debt.get("settled_at", "") >= cutoff_iso]
+                if not data["archive"]:
+                    del data["archive"]
+                DebtManager.save_user_debts(user_id, data)
+                if not cached:
+                    with DebtManager._lock:
+                        DebtManager._cache.pop(user_id, None)  # Job background tidak menggeser cache user aktif
+        return moved
+    
+    @staticmethod
+    def count_archived_users() -> int:
+        """Jumlah user di arsip"""
+        users_dir = ARCHIVE_DIR / "users"
+        if not users_dir.exists():
+            return 0
+        return sum(1 for _ in users_dir.glob("*.json.gz"))
+    
+    @staticmethod
+    def run() -> Dict:
+        """Satu putaran retensi (dijalankan di thread pool I/O), mengembalikan ringkasannya"""
+        with RetentionManager._lock:
+            start = time.perf_counter()
+            now = datetime.now()
+            users = settled = 0
+            
+            if RETENTION_INACTIVE_DAYS > 0:
+                cutoff = now - timedelta(days=RETENTION_INACTIVE_DAYS)
+                with UserManager._store.lock:
+                    candidates = [
+                        int(user_id) for user_id, user in UserManager.load_users()["users"].items()
+                        if RetentionManager._last_seen(user) < cutoff.isoformat()
+                    ]
+                for user_id in candidates:
+                    try:
+                        users += RetentionManager.archive_user(user_id, cutoff)
+                    except Exception as e:
+                        logger.error(f"Error archiving user {user_id}: {e}")
+            
+            if RETENTION_SETTLED_DAYS > 0:
+                settled = RetentionManager.archive_settled(now - timedelta(days=RETENTION_SETTLED_DAYS))
+            
+            # users.json dan data join ditulis sekarang agar sejalan dengan file yang sudah dipindah
+            JsonFileStore.flush_all()
+            elapsed = time.perf_counter() - start
+            Metrics.inc("kapanbayar_retention_archived_total", {"kind": "user"}, users)
+            Metrics.inc("kapanbayar_retention_archived_total", {"kind": "settled_debt"}, settled)
+            Metrics.set_gauge("kapanbayar_retention_last_success_timestamp", time.time())
+            logger.info(f"Retention: {users} user and {settled} settled debts archived in {elapsed:.1f}s")
+            return {
+                "users": users,
+                "settled": settled,
+                "active_users": UserManager.get_total_users(),
+                "archived_users": RetentionManager.count_archived_users(),
+                "elapsed": elapsed
+            }
+
+async def scheduled_retention(application: Application):
+    """Menjalankan retensi setiap RETENTION_INTERVAL jam"""
+    while True:
+        await asyncio.sleep(RETENTION_INTERVAL * 3600)
+        if not LeaderElection.holds_lease():
+            continue
+        try:
+            await run_io(RetentionManager.run)
+        except Exception as e:
+            logger.error(f"Scheduled retention failed: {e}")
+
+# Pengaturan analitik
+OVERDUE_BUCKETS = ((1, 7), (8, 30), (31, 90), (91, None))  # umur keterlambatan dalam hari
+ANALYTICS_DAYS = 14  # jumlah hari terakhir pada hitungan utang baru per hari
+
+# Class untuk snapshot kolom (array) semua utang; query owner tidak membaca file user sama sekali
+class Analytics:
+    # Kolom per utang (urutan sama di semua kolom) dan kode tipe array
+    COLUMNS = (("user_id", "q"), ("amount", "d"), ("remaining", "d"), ("due", "i"), ("created", "i"))
+    # Snapshot di memori: (signature file, data)
+    _snapshot = None
+    _lock = threading.Lock()
+    
+    @staticmethod
+    def _day(value) -> int:
+        """Tanggal ISO/YYYY/MM/DD menjadi nomor hari (ordinal), 0 jika kosong/tidak valid"""
+        try:
+            return datetime.fromisoformat(str(value)[:10].replace("/", "-")).toordinal()
+        except ValueError:
+            return 0
+    
+    @staticmethod
+    def build() -> Dict:
+        """Membangun snapshot dari semua file user dan menulisnya ke ANALYTICS_FILE (thread pool I/O)"""
+        start = time.perf_counter()
+        columns = {name: array(code) for name, code in Analytics.COLUMNS}
+        files = 0
+        for user_file in DATABASE_DIR.glob("*.json"):
+            try:
+                user_id = int(user_file.stem)
+                data = DebtManager.peek_user_debts(user_id)
+            except Exception as e:
+                logger.warning(f"Analytics skipped {user_file}: {e}")
+                continue
+            files += 1
+            for debt in data.get("debts", []):
+                try:
+                    next_due = DebtManager.next_occurrence(debt)
+                except (KeyError, ValueError):
+                    next_due = None
+                columns["user_id"].append(user_id)
+                columns["amount"].append(DebtManager.parse_amount(debt.get("amount", "0")))
+                columns["remaining"].append(DebtManager.get_remaining(debt))
+                columns["due"].append(next_due.toordinal() if next_due else 0)
+                columns["created"].append(Analytics._day(debt.get("created_at")))
+        
+        with UserManager._store.lock:
+            users = list(UserManager.load_users()["users"].values())
+        columns["last_active"] = array("i", (Analytics._day(RetentionManager._last_seen(user)) for user in users))
+        
+        header = {
+            "version": 1,
+            "built_at": datetime.now().isoformat(),
+            "byteorder": sys.byteorder,
+            "files": files,
+            "columns": [[name, column.typecode, len(column)] for name, column in columns.items()]
+        }
+        tmp_path = ANALYTICS_FILE.with_name(ANALYTICS_FILE.name + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(json.dumps(header).encode("utf-8") + b"\n")
+            for column in columns.values():
+                column.tofile(f)
+        os.replace(tmp_path, ANALYTICS_FILE)
+        
+        elapsed = time.perf_counter() - start
+        Metrics.record_io("analytics", "write", ANALYTICS_FILE.stat().st_size, elapsed)
+        logger.info(f"Analytics snapshot: {len(columns['user_id'])} debts, {len(users)} users in {elapsed:.1f}s")
+        return header
+    
+    @staticmethod
+    def load() -> Optional[Dict]:
+        """Snapshot di memori, dimuat ulang hanya jika file berubah (misalnya dibangun leader)"""
+        signature = DebtManager._file_signature(ANALYTICS_FILE)
+        if signature is None:
+            return None
+        with Analytics._lock:
+            if Analytics._snapshot and Analytics._snapshot[0] == signature:
+                return Analytics._snapshot[1]
+            
+            start = time.perf_counter()
+            columns = {}
+            with open(ANALYTICS_FILE, 'rb') as f:
+                header = json.loads(f.readline())
+                for name, typecode, length in header["columns"]:
+                    columns[name] = array(typecode)
+                    columns[name].fromfile(f, length)
+                    if header["byteorder"] != sys.byteorder:
+                        columns[name].byteswap()
+            Metrics.record_io("analytics", "read", signature[1], time.perf_counter() - start)
+            
+            # Kolom terurut dibuat sekali saat memuat, query cukup indeks dan bisect (kolom mentah tidak disimpan)
+            snapshot = {
+                "built_at": header["built_at"],
+                "files": header["files"],
+                "amount_sorted": array("d", sorted(columns["amount"])),
+                "due_sorted": array("i", sorted(day for day in columns["due"] if day)),
+                "created_sorted": array("i", sorted(columns["created"])),
+                "active_sorted": array("i", sorted(columns["last_active"])),
+                "users_with_debts": len(set(columns["user_id"])),
+                "total_remaining": sum(columns["remaining"])
+            }
+            Analytics._snapshot = (signature, snapshot)
+            return snapshot
+    
+    @staticmethod
+    def get() -> Dict:
+        """Snapshot terbaru, dibangun sekarang jika belum pernah ada"""
+        snapshot = Analytics.load()
+        if snapshot is None:
+            Analytics.build()
+            snapshot = Analytics.load()
+        return snapshot
+    
+    @staticmethod
+    def percentile(values: array, pct: float) -> float:
+        """Persentil (nearest-rank) dari array terurut"""
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, max(0, int(len(values) * pct / 100 + 0.5) - 1))]
+    
+    @staticmethod
+    def count_between(values: array, low: int, high: int) -> int:
+        """Jumlah nilai dalam rentang [low, high] pada array terurut"""
+        return bisect.bisect_right(values, high) - bisect.bisect_left(values, low)
+    
+    @staticmethod
+    def report(snapshot: Dict) -> Dict:
+        """Analitik dari snapshot: persentil jumlah, keterlambatan, user aktif, utang baru per hari"""
+        today = datetime.now().toordinal()
+        amounts = snapshot["amount_sorted"]
+        due = snapshot["due_sorted"]
+        overdue = {}
+        for low, high in OVERDUE_BUCKETS:
+            label = f"{low}-{high}" if high else f">{low - 1}"
+            overdue[label] = Analytics.count_between(due, today - high if high else 1, today - low)
+        active = snapshot["active_sorted"]
+        created = snapshot["created_sorted"]
+        return {
+            "built_at": snapshot["built_at"],
+            "files": snapshot["files"],
+            "debts": len(amounts),
+            "users_with_debts": snapshot["users_with_debts"],
+            "total_remaining": snapshot["total_remaining"],
+            "percentiles": {pct: Analytics.percentile(amounts, pct) for pct in (50, 90, 99)},
+            "overdue": overdue,
+            "active": {days: Analytics.count_between(active, today - days + 1, today) for days in (1, 7, 30)},
+            "created_per_day": [
+                (datetime.fromordinal(day).strftime("%m/%d"), Analytics.count_between(created, day, day))
+                for day in range(today - ANALYTICS_DAYS + 1, today + 1)
+            ]
+        }
+
+async def scheduled_analytics(application: Application):
+    """Membangun ulang snapshot analitik setiap ANALYTICS_INTERVAL menit"""
+    while True:
+        await asyncio.sleep(ANALYTICS_INTERVAL * 60)
+        try:
+            if LeaderElection.holds_lease():
+                await run_io(Analytics.build)
+            # Semua instance memuat snapshot terbaru lebih awal agar /stats tidak menunggu
+            await run_io(Analytics.load)
+        except Exception as e:
+            logger.error(f"Analytics snapshot failed: {e}")
+
+# Class untuk lease bernama di SQLite bersama (leader election dan klaim job antar instance)
+class Lease:
+    # Pemegang khusus untuk lease yang pekerjaannya sudah selesai
+    DONE = "done"
+    
+    @staticmethod
+    def _connect() -> sqlite3.Connection:
+        conn = sqlite3.connect(LEADER_LEASE_FILE, timeout=5, isolation_level=None)
+        conn.execute("CREATE TABLE IF NOT EXISTS lease (name TEXT PRIMARY KEY, holder TEXT NOT NULL, expires_at REAL NOT NULL)")
+        return conn
+    
+    @staticmethod
+    def try_acquire(name: str, ttl: float) -> Tuple[bool, str]:
+        """Mengambil atau memperpanjang lease; hasil (berhasil, pemegang lease saat ini)"""
+        conn = Lease._connect()
+        try:
+            # BEGIN IMMEDIATE mengunci database untuk tulis, jadi cek-lalu-tulis atomic antar proses
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT holder, expires_at FROM lease WHERE name = ?", (name,)).fetchone()
+            now = time.time()
+            if row is None or row[0] == INSTANCE_ID or row[1] < now:
+                conn.execute("INSERT OR REPLACE INTO lease VALUES (?, ?, ?)", (name, INSTANCE_ID, now + ttl))
+                conn.execute("COMMIT")
+                return True, INSTANCE_ID
+            conn.execute("COMMIT")
+            return False, row[0]
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def release(name: str):
+        """Melepas lease jika dipegang instance ini"""
+        conn = Lease._connect()
+        try:
+            conn.execute("DELETE FROM lease WHERE name = ? AND holder = ?", (name, INSTANCE_ID))
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def mark_done(name: str, ttl: float):
+        """Mengganti lease milik instance ini dengan penanda selesai yang berlaku selama ttl"""
+        conn = Lease._connect()
+        try:
+            conn.execute(
+                "UPDATE lease SET holder = ?, expires_at = ? WHERE name = ? AND holder = ?",
+                (Lease.DONE, time.time() + ttl, name, INSTANCE_ID)
+            )
+        finally:
+            conn.close()
+
+# Class untuk memilih satu instance yang menjalankan pengingat dan job terjadwal
+class LeaderElection:
+    LEASE_NAME = "scheduler"
+    is_leader = False
+    holder = None
+    # Batas (monotonic) lease terakhir yang berhasil diperpanjang
+    _valid_until = 0.0
+    
+    @staticmethod
+    def holds_lease() -> bool:
+        """True jika instance ini boleh menjalankan job leader saat ini"""
+        if not LEADER_ELECTION:
+            return True
+        return LeaderElection.is_leader and time.monotonic() < LeaderElection._valid_until
+    
+    @staticmethod
+    def renew() -> bool:
+        """Mengambil/memperpanjang lease leader (dijalankan di thread pool I/O)"""
+        # Waktu diambil sebelum menulis agar batas lokal tidak pernah melewati batas di database
+        started = time.monotonic()
+        acquired, holder = Lease.try_acquire(LeaderElection.LEASE_NAME, LEADER_LEASE_TTL)
+        if acquired:
+            LeaderElection._valid_until = started + LEADER_LEASE_TTL
+        if acquired != LeaderElection.is_leader:
+            logger.info(f"Instance {INSTANCE_ID} {'menjadi leader' if acquired else f'bukan leader lagi (leader: {holder})'}")
+        LeaderElection.is_leader = acquired
+        LeaderElection.holder = holder
+        Metrics.set_gauge("kapanbayar_leader", 1 if acquired else 0)
+        return acquired
+    
+    @staticmethod
+    def resign():
+        """Melepas lease saat shutdown agar instance lain bisa langsung mengambil alih"""
+        if LeaderElection.is_leader:
+            LeaderElection.is_leader = False
+            Lease.release(LeaderElection.LEASE_NAME)
+
+async def run_leader_election(application: Application):
+    """Memperpanjang lease leader (atau mencoba mengambil alih) setiap LEADER_LEASE_TTL / 3 detik"""
+    while True:
+        await asyncio.sleep(LEADER_LEASE_TTL / 3)
+        try:
+            await run_io(LeaderElection.renew)
+        except Exception as e:
+            # Lease lokal tetap berlaku sampai _valid_until, setelah itu job leader berhenti sendiri
+            logger.error(f"Leader lease renewal failed: {e}")
+
+# Pengaturan state percakapan
+STATE_FLUSH_INTERVAL = 10  # detik
+STATE_TTL = 24 * 60 * 60  # state yang ditinggalkan lebih dari 1 hari akan dihapus
+
+# Persistence untuk context.user_data (state percakapan) di folder database
+class JsonStatePersistence(BasePersistence):
+    def __init__(self):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=STATE_FLUSH_INTERVAL
+        )
+        # Snapshot terakhir yang ditulis ke disk dan waktu perubahan terakhir
+        self._user_data = {}
+        self._touched = {}
+    
+    @staticmethod
+    def get_state_file(user_id: int) -> Path:
+        """Mendapatkan file state untuk user tertentu"""
+        return STATE_DIR / f"{user_id}.json"
+    
+    def _is_expired(self, user_id: int) -> bool:
+        """Cek apakah state user sudah melewati TTL"""
+        touched = self._touched.get(user_id)
+        return touched is not None and time.time() - touched > STATE_TTL
+    
+    def expired_user_ids(self) -> List[int]:
+        """Daftar user yang state-nya sudah kedaluwarsa"""
+        return [user_id for user_id in list(self._touched) if self._is_expired(user_id)]
+    
+    async def get_user_data(self) -> Dict[int, Dict]:
+        """Memuat semua state user yang belum kedaluwarsa"""
+        with Startup.phase("conversation_state"):
+            return await run_io(self._load_states)
+    
+    def _load_states(self) -> Dict[int, Dict]:
+        """Membaca file state dari disk (dijalankan di thread pool I/O)"""
+        result = {}
+        if not STATE_DIR.exists():
+            return result
+        
+        for state_file in STATE_DIR.glob("*.json"):
+            try:
+                user_id = int(state_file.stem)
+                with open(state_file, 'r', encoding='utf-8') as f:
+                    stored = json.load(f)
+                
+                if time.time() - stored.get("updated_at", 0) > STATE_TTL:
+                    state_file.unlink()
+                    continue
+                
+                result[user_id] = stored.get("user_data", {})
+                self._user_data[user_id] = json.loads(json.dumps(result[user_id]))
+                self._touched[user_id] = stored.get("updated_at", time.time())
+            except Exception as e:
+                logger.error(f"Error loading state {state_file}: {e}")
+        return result
+    
+    async def update_user_data(self, user_id: int, data: Dict):
+        """Menulis state user, hanya jika berubah sejak flush terakhir"""
+        if self._user_data.get(user_id, {}) == data:
+            return
+        
+        self._user_data[user_id] = json.loads(json.dumps(data))
+        self._touched[user_id] = time.time()
+        
+        state_file = JsonStatePersistence.get_state_file(user_id)
+        if not data:
+            await run_io(state_file.unlink, missing_ok=True)
+            return
+        
+        payload = json.dumps({"updated_at": self._touched[user_id], "user_data": data}, ensure_ascii=False)
+        await run_io(JsonStatePersistence.write_state_file, state_file, payload)
+    
+    @staticmethod
+    def write_state_file(state_file: Path, payload: str):
+        """Menulis file state (dijalankan di thread pool I/O)"""
+        STATE_DIR.mkdir(parents=True, exist_ok=True)
+        start = time.perf_counter()
+        with open(state_file, 'w', encoding='utf-8') as f:
+            f.write(payload)
+        Metrics.record_io("state", "write", len(payload), time.perf_counter() - start)
+    
+    async def refresh_user_data(self, user_id: int, user_data: Dict):
+        """Hapus state yang sudah kedaluwarsa saat user kembali"""
+        if user_data and self._is_expired(user_id):
+            user_data.clear()
+    
+    async def drop_user_data(self, user_id: int):
+        """Menghapus state user"""
+        self._user_data.pop(user_id, None)
+        self._touched.pop(user_id, None)
+        await run_io(JsonStatePersistence.get_state_file(user_id).unlink, missing_ok=True)
+    
+    async def flush(self):
+        """Semua perubahan sudah ditulis per interval, tidak ada yang tertunda"""
+        logger.info(f"State persistence flushed ({len(self._user_data)} user)")
+    
+    # Data lain tidak disimpan
+    async def get_chat_data(self) -> Dict:
+        return {}
+    
+    async def get_bot_data(self) -> Dict:
+        return {}
+    
+    async def get_callback_data(self):
+        return None
+    
+    async def get_conversations(self, name: str) -> Dict:
+        return {}
+    
+    async def update_conversation(self, name: str, key, new_state):
+        pass
+    
+    async def update_chat_data(self, chat_id: int, data: Dict):
+        pass
+    
+    async def update_bot_data(self, data: Dict):
+        pass
+    
+    async def update_callback_data(self, data):
+        pass
+    
+    async def drop_chat_data(self, chat_id: int):
+        pass
+    
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict):
+        pass
+    
+    async def refresh_bot_data(self, bot_data: Dict):
+        pass
+
+async def expire_conversation_states(application: Application):
+    """Membersihkan state percakapan yang ditinggalkan dari memori"""
+    while True:
+        await asyncio.sleep(STATE_FLUSH_INTERVAL * 6)
+        try:
+            for user_id in application.persistence.expired_user_ids():
+                application.drop_user_data(user_id)
+        except Exception as e:
+            logger.error(f"Error expiring conversation states: {e}")
+
+# Notifikasi Manager
+class NotificationManager:
+    _instance = None
+    _active_notifications = {}
+    # Jadwal pengingat: user_id -> (signature file, waktu cek berikutnya atau None jika tidak ada)
+    _schedule = {}
+    
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._running = True
+            cls._instance._bot = None
+            cls._instance._loop = None
+            cls._instance._thread = threading.Thread(target=cls._instance._check_notifications, daemon=True)
+            cls._instance._thread.start()
+        return cls._instance
+    
+    def attach(self, bot, loop: asyncio.AbstractEventLoop):
+        """Menghubungkan bot dan event loop untuk mengirim pengingat"""
+        self._bot = bot
+        self._loop = loop
+    
+    def _check_notifications(self):
+        """Thread untuk memeriksa dan mengirim notifikasi"""
+        while self._running:
+            try:
+                # Pada deployment multi-instance hanya leader yang mengirim pengingat
+                if LeaderElection.holds_lease():
+                    if Profiler.active:
+                        Profiler.run_profiled(self.scan_once)
+                    else:
+                        self.scan_once()
+                time.sleep(60)  # Cek setiap menit
+            
+            except Exception as e:
+                logger.error(f"Error in notification thread: {e}")
+                time.sleep(60)
+    
+    def scan_once(self) -> int:
+        """Satu putaran pemeriksaan semua file user, mengembalikan jumlah user yang dicek"""
+        start = time.perf_counter()
+        now = time.time()
+        skipped = 0
+        user_files = list(DATABASE_DIR.glob("*.json"))
+        for user_file in user_files:
+            try:
+                if not LeaderElection.holds_lease():
+                    break  # Lease hilang di tengah scan
+                user_id = int(user_file.stem)
+                CORRELATION_ID.set(f"reminder-{user_id}")
+                # File yang tidak berubah dan belum waktunya tidak perlu dibaca
+                entry = NotificationManager._schedule.get(user_id)
+                if entry and (entry[1] is None or now < entry[1]) and entry[0] == DebtManager._file_signature(user_file):
+                    skipped += 1
+                    continue
+                self._check_user(user_id)
+            except Exception as e:
+                logger.error(f"Error checking notifications for {user_file}: {e}")
+        CORRELATION_ID.set("-")
+        Metrics.observe("kapanbayar_notification_tick_seconds", time.perf_counter() - start)
+        Metrics.set_gauge("kapanbayar_notification_users_scanned", len(user_files))
+        Metrics.set_gauge("kapanbayar_notification_users_skipped", skipped)
+        return len(user_files)
+    
+    @staticmethod
+    def _next_check(data: Dict) -> Optional[float]:
+        """Waktu (unix) pengingat berikutnya untuk dokumen user, None jika tidak ada"""
+        notification_interval = data.get("notification_interval", 5)
+        if data.get("is_notification_paused", False) or notification_interval <= 0:
+            return None
+        
+        earliest = None
+        for debt in data.get("debts", []):
+            if not debt.get("notification_time"):
+                continue
+            try:
+                next_due = DebtManager.next_occurrence(debt)
+                if next_due is None:
+                    continue
+                at = datetime.combine(next_due, datetime.strptime(debt["notification_time"], "%H:%M").time())
+                if debt.get("snoozed_until"):
+                    at = max(at, datetime.fromisoformat(debt["snoozed_until"]))
+                if debt.get("last_notified"):
+                    at = max(at, datetime.fromisoformat(debt["last_notified"]) + timedelta(minutes=notification_interval))
+            except Exception:
+                continue  # Utang dengan data rusak dicatat oleh _collect_due_debts
+            earliest = at if earliest is None else min(earliest, at)
+        return earliest.timestamp() if earliest else None
+    
+    @staticmethod
+    def dump_schedule() -> Dict:
+        """Jadwal pengingat dalam bentuk JSON (untuk snapshot cache hangat)"""
+        return {
+            str(user_id): [*signature, next_check]
+            for user_id, (signature, next_check) in list(NotificationManager._schedule.items())
+            if signature is not None
+        }
+    
+    @staticmethod
+    def load_schedule(schedule: Dict):
+        """Memuat jadwal dari snapshot; entri divalidasi ulang dengan signature file saat scan"""
+        for user_id, (*signature, next_check) in schedule.items():
+            NotificationManager._schedule.setdefault(int(user_id), (tuple(signature), next_check))
+    
+    def _check_user(self, user_id: int):
+        """Memeriksa utang satu user dan mengirim pengingat yang jatuh tempo"""
+        for debt in self._collect_due_debts(user_id):
+            self._send_reminder(user_id, debt)
+    
+    def _collect_due_debts(self, user_id: int) -> List[Dict]:
+        """Menandai dan mengembalikan utang yang perlu diingatkan (atomic terhadap handler)"""
+        with DebtManager.user_lock(user_id):
+            data = DebtManager.load_user_debts(user_id)
+            due_debts = self._mark_due_debts(data)
+            if due_debts:
+                DebtManager.save_user_debts(user_id, data)
+            NotificationManager._schedule[user_id] = (
+                DebtManager._file_signature(DebtManager.get_user_file(user_id)),
+                NotificationManager._next_check(data)
+            )
+            return due_debts
+    
+    def _mark_due_debts(self, data: Dict) -> List[Dict]:
+        """Menandai last_notified pada utang yang jatuh tempo dan mengembalikan salinannya"""
+        if data.get("is_notification_paused", False):
+            return []
+        
+        notification_interval = data.get("notification_interval", 5)
+        if notification_interval <= 0:
+            return []  # Notifikasi dinonaktifkan
+        
+        now = datetime.now()
+        due_debts = []
+        for debt in data.get("debts", []):
+            if not debt.get("notification_time"):
+                continue
+            try:
+                # Hanya jatuh tempo berikutnya yang dihitung (utang berulang tidak dijabarkan)
+                next_due = DebtManager.next_occurrence(debt)
+                if next_due is None:
+                    continue
+            
+                notification_time = datetime.strptime(debt["notification_time"], "%H:%M").time()
+                if now < datetime.combine(next_due, notification_time):
+                    continue
+            
+                snoozed_until = debt.get("snoozed_until")
+                if snoozed_until and now < datetime.fromisoformat(snoozed_until):
+                    continue
+            
+                # Kirim ulang hanya setelah interval notifikasi lewat
+                last_notified = debt.get("last_notified")
+                if last_notified and now - datetime.fromisoformat(last_notified) < timedelta(minutes=notification_interval):
+                    continue
+            
+                debt["last_notified"] = now.isoformat()
+                due_debts.append(dict(debt))
+            except Exception as e:
+                logger.error(f"Error processing notification: {e}")
+                continue
+        
+        return due_debts
+    
+    def _send_reminder(self, user_id: int, debt: Dict):
+        """Mengirim pesan pengingat ke user lewat event loop bot"""
+        if not self._bot or not self._loop:
+            return
+        
+        # ID utang stabil, jadi tombol di pengingat lama tidak mengenai utang lain
+        keyboard = InlineKeyboardMarkup([[
+            InlineKeyboardButton("✅ Sudah Dibayar", callback_data=f"paid_{debt['id']}"),
+            InlineKeyboardButton("⏸️ Tunda 1 Jam", callback_data=f"snooze_{debt['id']}")
+        ]])
+        text = (
+            f"🔔 **Pengingat Utang**\n\n"
+            f"👤 **Nama:** {debt.get('debtor_name', 'Tidak diketahui')}\n"
+            f"💰 **Sisa:** Rp {DebtManager.get_remaining(debt):,}\n"
+            f"📅 **Jatuh tempo:** {debt.get('payment_date')}\n"
+            f"📝 **Catatan:** {debt.get('notes') or 'Tidak ada'}"
+        )
+        future = asyncio.run_coroutine_threadsafe(
+            self._bot.send_message(
+                chat_id=user_id,
+                text=text,
+                parse_mode=ParseMode.MARKDOWN,
+                reply_markup=keyboard
+            ),
+            self._loop
+        )
+        try:
+            future.result(timeout=30)
+            Metrics.inc("kapanbayar_reminders_total", {"result": "sent"})
+        except Exception as e:
+            Metrics.inc("kapanbayar_reminders_total", {"result": "failed"})
+            logger.error(f"Failed to send reminder to {user_id}: {e}")
+    
+    def stop(self):
+        """Menghentikan thread notifikasi"""
+        self._running = False
+        if self._thread:
+            self._thread.join()
+
+# Fungsi untuk mengecek apakah user sudah join semua group
+async def check_user_joined_all_groups(user_id: int, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    """Mengecek apakah user sudah join semua group yang diwajibkan"""
+    groups = JoinGroupManager.get_all_groups()
+    
+    if not groups:
+        return True  # Tidak ada group yang diwajibkan
+    
+    user_status = JoinGroupManager.get_user_join_status(user_id)
+    groups_status = user_status.get("groups_status", {})
+    
+    # Jika belum pernah dicek atau perlu dicek ulang
+    last_checked = user_status.get("last_checked")
+    if last_checked:
+        last_checked_time = datetime.fromisoformat(last_checked)
+        if (datetime.now() - last_checked_time).seconds < 300:  # Cache 5 menit
+            # Gunakan data cache
+            return all(groups_status.get(group, False) for group in groups)
+    
+    # Cek status join untuk setiap group
+    new_status = {}
+    all_joined = True
+    
+    for group in groups:
+        try:
+            chat_member = await context.bot.get_chat_member(f"@{group}", user_id)
+            is_member = chat_member.status in [ChatMember.MEMBER, ChatMember.ADMINISTRATOR, ChatMember.OWNER]
+            new_status[group] = is_member
+            
+            if not is_member:
+                all_joined = False
+        except Exception as e:
+            logger.error(f"Error checking membership for {user_id} in @{group}: {e}")
+            new_status[group] = False
+            all_joined = False
+    
+    # Update status user
+    JoinGroupManager.update_user_join_status(user_id, new_status)
+    
+    return all_joined
+
+# Fungsi untuk membuat keyboard utama
+def get_main_keyboard() -> ReplyKeyboardMarkup:
+    """Membuat keyboard utama"""
+    keyboard = [
+        [KeyboardButton("➕ Tambah Utang"), KeyboardButton("🗑️ Hapus Utang")],
+        [KeyboardButton("📋 Daftar Utang"), KeyboardButton("⏸️ Jeda Notifikasi")],
+        [KeyboardButton("❓ Panduan"), KeyboardButton("💝 Support Developer")],
+        [KeyboardButton("👥 Per Penghutang"), KeyboardButton("⬅️ Kembali ke Menu")]
+    ]
+    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
+
+def get_join_keyboard(groups: List[str]) -> InlineKeyboardMarkup:
+    """Membuat keyboard untuk join group"""
+    keyboard = []
+    
+    for group in groups:
+        keyboard.append([
+            InlineKeyboardButton(f"🔗 Join @{group}", url=f"https://t.me/{group}")
+        ])
+    
+    keyboard.append([
+        InlineKeyboardButton("✅ Sudah Join", callback_data="check_join")
+    ])
+    
+    return InlineKeyboardMarkup(keyboard)
+
+# Pengaturan tampilan daftar utang
+DEBTS_PER_PAGE = 5
+PAGE_TEXT_LIMIT = 3500  # Batas aman di bawah limit 4096 karakter Telegram
+PAGE_CACHE_SIZE = 1000
+
+# Class untuk render daftar utang per halaman
+class DebtListView:
+    # Cache halaman: (user_id, mode) -> (versi data, daftar halaman)
+    _pages = OrderedDict()
+    
+    @staticmethod
+    def format_amount(total_amount: float) -> str:
+        """Format total jumlah utang"""
+        if total_amount >= 1000000:
+            return f"{total_amount/1000000:.1f}M"
+        elif total_amount >= 1000:
+            return f"{total_amount/1000:.0f}k"
+        return str(int(total_amount))
+    
+    @staticmethod
+    def format_debt(debt: Dict, mode: str) -> str:
+        """Format satu utang sesuai mode tampilan"""
+        if mode == "delete":
+            return (
+                f"{debt['id']}. **{debt.get('debtor_name', 'Tidak diketahui')}**\n"
+                f"   💰 {debt.get('amount', '0')}\n"
+                f"   📅 {debt.get('payment_date', 'Tidak ditentukan')}\n\n"
+            )
+        paid_line = ""
+        if debt.get("payments"):
+            paid_line = (
+                f"   💵 **Sisa:** Rp {DebtManager.get_remaining(debt):,} "
+                f"({len(debt['payments'])}x bayar)\n"
+            )
+        recurrence = debt.get("recurrence")
+        if recurrence:
+            label = "Bulanan" if recurrence["freq"] == "monthly" else "Mingguan"
+            if recurrence.get("count"):
+                label += f" (cicilan {recurrence.get('index', 0) + 1}/{recurrence['count']})"
+            paid_line += f"   🔁 **Ulang:** {label}\n"
+        return (
+            f"🔸 **{debt['id']}. {debt.get('debtor_name', 'Tidak diketahui')}**\n"
+            f"   💰 **Jumlah:** {debt.get('amount', '0')}\n"
+            f"{paid_line}"
+            f"   📅 **Jatuh tempo:** {debt.get('payment_date', 'Tidak ditentukan')}\n"
+            f"   ⏰ **Notif:** {debt.get('notification_time', 'Tidak diatur')}\n"
+            f"   📝 **Catatan:** {debt.get('notes', 'Tidak ada')}\n\n"
+        )
+    
+    @staticmethod
+    def build_pages(user_id: int, mode: str) -> List[Tuple[str, InlineKeyboardMarkup]]:
+        """Membuat semua halaman daftar utang (teks dan keyboard)"""
+        debts = DebtManager.get_all_debts(user_id)
+        if not debts:
+            return []
+        
+        # Kelompokkan utang per halaman berdasarkan jumlah dan panjang teks
+        chunks = []
+        current, current_len = [], 0
+        for debt in debts:
+            entry = DebtListView.format_debt(debt, mode)
+            if current and (len(current) >= DEBTS_PER_PAGE or current_len + len(entry) > PAGE_TEXT_LIMIT):
+                chunks.append(current)
+                current, current_len = [], 0
+            current.append((debt, entry[:PAGE_TEXT_LIMIT]))
+            current_len += len(entry)
+        chunks.append(current)
+        
+        if mode == "delete":
+            header = "📋 **Daftar Utang:**\n\n"
+            footer = "Pilih tombol atau ketik nomor utang yang ingin dihapus:"
+        else:
+            header = "📊 **Daftar Utang Anda:**\n\n"
+            total_str = DebtListView.format_amount(DebtManager.get_total_debt_amount(user_id))
+            footer = f"💰 **Total Utang:** Rp {total_str}"
+        
+        pages = []
+        total_pages = len(chunks)
+        for page, chunk in enumerate(chunks):
+            text = header + "".join(entry for _, entry in chunk) + footer
+            
+            keyboard = []
+            for debt, _ in chunk:
+                row = []
+                if mode != "delete":
+                    row.append(InlineKeyboardButton(f"✅ Lunas #{debt['id']}", callback_data=f"paid_{debt['id']}_{page}"))
+                    row.append(InlineKeyboardButton(f"💵 Bayar #{debt['id']}", callback_data=f"pay_{debt['id']}"))
+                row.append(InlineKeyboardButton(f"🗑️ Hapus #{debt['id']}", callback_data=f"del_{debt['id']}_{mode}_{page}"))
+                keyboard.append(row)
+            
+            if total_pages > 1:
+                nav = []
+                if page > 0:
+                    nav.append(InlineKeyboardButton("⬅️", callback_data=f"page_{mode}_{page - 1}"))
+                nav.append(InlineKeyboardButton(f"{page + 1}/{total_pages}", callback_data="noop"))
+                if page < total_pages - 1:
+                    nav.append(InlineKeyboardButton("➡️", callback_data=f"page_{mode}_{page + 1}"))
+                keyboard.append(nav)
+            
+            pages.append((text, InlineKeyboardMarkup(keyboard)))
+        return pages
+    
+    @staticmethod
+    def get_pages(user_id: int, mode: str) -> List[Tuple[str, InlineKeyboardMarkup]]:
+        """Mendapatkan halaman dari cache, render ulang hanya jika versi data berubah"""
+        key = (user_id, mode)
+        with DebtManager.user_lock(user_id):
+            version = DebtManager.get_data_version(user_id)
+            with DebtManager._lock:
+                cached = DebtListView._pages.get(key)
+                if cached and cached[0] == version:
+                    DebtListView._pages.move_to_end(key)
+                    return cached[1]
+            
+            pages = DebtListView.build_pages(user_id, mode)
+            with DebtManager._lock:
+                DebtListView._pages[key] = (version, pages)
+                while len(DebtListView._pages) > PAGE_CACHE_SIZE:
+                    DebtListView._pages.popitem(last=False)
+            return pages
+    
+    @staticmethod
+    def get_page(user_id: int, mode: str, page: int) -> Optional[Tuple[str, InlineKeyboardMarkup]]:
+        """Mendapatkan satu halaman (dibatasi ke halaman terakhir)"""
+        pages = DebtListView.get_pages(user_id, mode)
+        if not pages:
+            return None
+        return pages[max(0, min(page, len(pages) - 1))]
+
+# Command handlers
+async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /start"""
+    user = update.effective_user
+    user_id = user.id
+    
+    # Tambah user ke database (bisa memulihkan arsip dari disk, jadi lewat thread I/O)
+    await run_io(UserManager.add_user, user_id, user.username, user.first_name)
+    await run_io(UserManager.update_last_active, user_id)
+    
+    # Cek apakah user harus join group
+    groups = JoinGroupManager.get_all_groups()
+    if groups:
+        all_joined = await check_user_joined_all_groups(user_id, context)
         
         if not all_joined:
             # Tampilkan pesan untuk join group
@@ -488,22 +3170,22 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Kirim foto jika ada
     try:
         if os.path.exists("icon.png"):
-            with open("icon.png", 'rb') as photo:
-                await update.message.reply_photo(
-                    photo=photo,
-                    caption=f"✨ **Selamat datang di Kapan Bayar Bot!** ✨\n\n"
-                           f"Halo {user.first_name}! 👋\n\n"
-                           f"Saya adalah asisten pribadi Anda untuk mencatat dan mengingatkan utang. "
-                           f"Dengan saya, Anda tidak akan lupa menagih utang lagi! 💼\n\n"
-                           f"📊 **Fitur Utama:**\n"
-                           f"• ✅ Catat utang dengan detail lengkap\n"
-                           f"• 🔔 Pengingat otomatis\n"
-                           f"• 📋 Daftar utang terorganisir\n"
-                           f"• ⏸️ Kontrol notifikasi fleksibel\n\n"
-                           f"Gunakan tombol di bawah untuk mulai! 🚀",
-                    parse_mode=ParseMode.MARKDOWN,
-                    reply_markup=get_main_keyboard()
-                )
+            await MediaCache.reply_photo(
+                update.message,
+                "icon.png",
+                caption=f"✨ **Selamat datang di Kapan Bayar Bot!** ✨\n\n"
+                       f"Halo {user.first_name}! 👋\n\n"
+                       f"Saya adalah asisten pribadi Anda untuk mencatat dan mengingatkan utang. "
+                       f"Dengan saya, Anda tidak akan lupa menagih utang lagi! 💼\n\n"
+                       f"📊 **Fitur Utama:**\n"
+                       f"• ✅ Catat utang dengan detail lengkap\n"
+                       f"• 🔔 Pengingat otomatis\n"
+                       f"• 📋 Daftar utang terorganisir\n"
+                       f"• ⏸️ Kontrol notifikasi fleksibel\n\n"
+                       f"Gunakan tombol di bawah untuk mulai! 🚀",
+                parse_mode=ParseMode.MARKDOWN,
+                reply_markup=get_main_keyboard()
+            )
         else:
             await update.message.reply_text(
                 f"✨ **Selamat datang di Kapan Bayar Bot!** ✨\n\n"
@@ -536,7 +3218,8 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "2. 🗑️ **Hapus Utang** - Hapus utang yang sudah selesai\n"
         "3. 📋 **Daftar Utang** - Lihat semua utang yang tercatat\n"
         "4. ⏸️ **Jeda Notifikasi** - Atur interval pengingat\n"
-        "5. 💝 **Support Developer** - Dukung pengembangan bot\n\n"
+        "5. 👥 **Per Penghutang** - Ringkasan utang per orang\n"
+        "6. 💝 **Support Developer** - Dukung pengembangan bot\n\n"
         
         "📝 **Cara Mencatat Utang:**\n"
         "1. Klik '➕ Tambah Utang'\n"
@@ -552,89 +3235,805 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "💡 **Tips:**\n"
         "• Gunakan format yang benar untuk hasil terbaik\n"
         "• Update status utang setelah ditagih/dibayar\n"
-        "• Gunakan fitur jeda jika butuh waktu\n\n"
+        "• Gunakan fitur jeda jika butuh waktu\n"
+        "• Ketik /cari nama untuk mencari utang\n"
+        "• Ketik /jatuhtempo minggu atau /jatuhtempo lewat untuk filter jatuh tempo\n"
+        "• Ketik /export (atau /export json) untuk mengunduh data utang\n\n"
         "📞 **Butuh bantuan?** Hubungi developer melalui menu Support!"
     )
     
     await update.message.reply_text(
-        help_text,
+        help_text,
+        parse_mode=ParseMode.MARKDOWN,
+        reply_markup=get_main_keyboard()
+    )
+
+async def show_debt_page(query, user_id: int, mode: str, page: int, notice: str = ""):
+    """Menampilkan halaman daftar utang dengan mengedit pesan yang ada"""
+    page_data = await run_io(DebtListView.get_page, user_id, mode, page)
+    if not page_data:
+        await query.edit_message_text(
+            notice + "📭 **Tidak ada utang yang tercatat.**",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return
+    
+    page_text, page_markup = page_data
+    await query.edit_message_text(
+        notice + page_text,
+        parse_mode=ParseMode.MARKDOWN,
+        reply_markup=page_markup
+    )
+
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /export"""
+    user_id = update.effective_user.id
+    
+    if not await check_user_joined_all_groups(user_id, context):
+        await update.message.reply_text(
+            "⛔ **Akses Dibatasi**\n\nGunakan /start untuk verifikasi.",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return
+    
+    args = [arg.lower() for arg in (context.args or [])]
+    fmt = "json" if "json" in args else "csv"
+    compress = True if "gz" in args else None
+    
+    if not await run_io(DebtManager.get_all_debts, user_id):
+        await update.message.reply_text(
+            "📭 **Tidak ada utang yang tercatat.**",
+            parse_mode=ParseMode.MARKDOWN,
+            reply_markup=get_main_keyboard()
+        )
+        return
+    
+    buffer, filename = await run_io(DebtExporter.export, user_id, fmt, compress)
+    with buffer:
+        await update.message.reply_document(
+            document=buffer,
+            filename=filename,
+            caption=f"📁 Export utang Anda ({fmt.upper()})"
+        )
+
+async def send_debt_results(update: Update, title: str, debts: List[Dict]):
+    """Mengirim hasil pencarian/filter utang"""
+    if not debts:
+        await update.message.reply_text(
+            f"{title}\n\n📭 Tidak ada utang yang cocok.",
+            parse_mode=ParseMode.MARKDOWN,
+            reply_markup=get_main_keyboard()
+        )
+        return
+    
+    result_text = f"{title}\n\n"
+    for i, debt in enumerate(debts):
+        entry = DebtListView.format_debt(debt, "list")
+        if len(result_text) + len(entry) > PAGE_TEXT_LIMIT:
+            result_text += f"... dan {len(debts) - i} utang lainnya\n"
+            break
+        result_text += entry
+    result_text += f"📊 **Ditemukan:** {len(debts)} utang"
+    
+    await update.message.reply_text(
+        result_text,
+        parse_mode=ParseMode.MARKDOWN,
+        reply_markup=get_main_keyboard()
+    )
+
+async def cari_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /cari"""
+    user_id = update.effective_user.id
+    
+    if not await check_user_joined_all_groups(user_id, context):
+        await update.message.reply_text(
+            "⛔ **Akses Dibatasi**\n\nGunakan /start untuk verifikasi.",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return
+    
+    if not context.args:
+        await update.message.reply_text(
+            "❌ **Format salah!**\n"
+            "Gunakan: /cari nama\n"
+            "Contoh: /cari john",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return
+    
+    query = ' '.join(context.args)
+    await send_debt_results(
+        update,
+        f"🔍 **Hasil pencarian:** {query}",
+        await run_io(DebtIndex.search_by_name, user_id, query)
+    )
+
+async def jatuhtempo_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /jatuhtempo"""
+    user_id = update.effective_user.id
+    
+    if not await check_user_joined_all_groups(user_id, context):
+        await update.message.reply_text(
+            "⛔ **Akses Dibatasi**\n\nGunakan /start untuk verifikasi.",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return
+    
+    mode = context.args[0].lower() if context.args else "minggu"
+    if mode == "lewat":
+        await send_debt_results(update, "⚠️ **Utang Lewat Jatuh Tempo**", await run_io(DebtIndex.overdue, user_id))
+    elif mode == "minggu":
+        await send_debt_results(update, "📅 **Jatuh Tempo Minggu Ini**", await run_io(DebtIndex.due_this_week, user_id))
+    else:
+        await update.message.reply_text(
+            "❌ **Format salah!**\n"
+            "Gunakan: /jatuhtempo minggu atau /jatuhtempo lewat",
+            parse_mode=ParseMode.MARKDOWN
+        )
+
+# Handler untuk tombol
+async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk tombol inline"""
+    query = update.callback_query
+    await query.answer()
+    
+    user_id = query.from_user.id
+    data = query.data
+    
+    if data == "check_join":
+        # Cek apakah user sudah join semua group
+        groups = JoinGroupManager.get_all_groups()
+        all_joined = await check_user_joined_all_groups(user_id, context)
+        
+        if all_joined:
+            await query.edit_message_text(
+                "✅ **Verifikasi berhasil!**\n\n"
+                "Anda telah bergabung dengan semua group yang diwajibkan.\n\n"
+                "Sekarang Anda dapat menggunakan bot ini sepenuhnya!",
+                parse_mode=ParseMode.MARKDOWN
+            )
+            
+            # Kirim menu utama
+            await query.message.reply_text(
+                "🎉 **Selamat!** Anda sekarang dapat menggunakan semua fitur bot.\n"
+                "Pilih menu di bawah:",
+                reply_markup=get_main_keyboard()
+            )
+        else:
+            await query.edit_message_text(
+                "❌ **Anda belum bergabung dengan semua group!**\n\n"
+                "Silakan bergabung dengan semua group yang tertera di atas, "
+                "kemudian klik 'Sudah Join' lagi.",
+                parse_mode=ParseMode.MARKDOWN,
+                reply_markup=get_join_keyboard(groups)
+            )
+    
+    elif data.startswith("page_"):
+        _, mode, page = data.split("_")
+        await show_debt_page(query, user_id, mode, int(page))
+    
+    elif data.startswith("del_"):
+        _, debt_id, mode, page = data.split("_")
+        if await run_io(DebtManager.delete_debt, user_id, int(debt_id)):
+            notice = f"✅ **Utang #{debt_id} berhasil dihapus!**\n\n"
+        else:
+            notice = f"❌ **Utang #{debt_id} tidak ditemukan!**\n\n"
+        await show_debt_page(query, user_id, mode, int(page), notice)
+    
+    elif data.startswith("paid_"):
+        parts = data.split("_")
+        debt_id = int(parts[1])
+        if len(parts) > 2:
+            # Tombol dari daftar utang, tampilkan ulang halaman yang sama
+            result = await run_io(DebtManager.record_payment, user_id, debt_id)
+            if result and result.get("next_due"):
+                notice = f"✅ **Cicilan #{debt_id} dibayar!** Berikutnya: {result['next_due']}\n\n"
+            elif result:
+                notice = f"✅ **Utang #{debt_id} ditandai sudah dibayar!**\n\n"
+            else:
+                notice = f"❌ **Utang #{debt_id} tidak ditemukan!**\n\n"
+            await show_debt_page(query, user_id, "list", int(parts[2]), notice)
+        else:
+            result = await run_io(DebtManager.record_payment, user_id, debt_id)
+            if result is None:
+                # Pengingat lama: utangnya sudah lunas atau dihapus
+                await query.edit_message_text(
+                    f"❌ **Utang #{debt_id} sudah tidak ada.**\n"
+                    "Utang ini sudah lunas atau dihapus.",
+                    parse_mode=ParseMode.MARKDOWN
+                )
+            elif result.get("next_due"):
+                await query.edit_message_text(
+                    "✅ **Cicilan berhasil ditandai sebagai sudah dibayar!**\n"
+                    f"Cicilan berikutnya jatuh tempo {result['next_due']}.",
+                    parse_mode=ParseMode.MARKDOWN
+                )
+            else:
+                await query.edit_message_text(
+                    "✅ **Utang berhasil ditandai sebagai sudah dibayar!**\n"
+                    "Data telah dipindahkan ke arsip.",
+                    parse_mode=ParseMode.MARKDOWN
+                )
+    
+    elif data.startswith("pay_"):
+        debt_id = int(data.split("_")[1])
+        debt = await run_io(DebtManager.get_debt, user_id, debt_id)
+        if not debt:
+            await query.message.reply_text(f"❌ **Utang #{debt_id} tidak ditemukan!**", parse_mode=ParseMode.MARKDOWN)
+            return
+        
+        await query.message.reply_text(
+            f"💵 **Bayar Sebagian - {debt.get('debtor_name', 'Tidak diketahui')}**\n\n"
+            f"Sisa utang: Rp {DebtManager.get_remaining(debt):,}\n\n"
+            f"Kirim jumlah yang dibayar (contoh: `50k` atau `25000`):",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        set_state(context, "paying_debt")
+        context.user_data["paying_debt_id"] = debt_id
+    
+    elif data.startswith("snooze_"):
+        debt_id = int(data.split("_")[1])
+        until = await run_io(DebtManager.snooze_debt, user_id, debt_id, 60)
+        if until:
+            # Update notification time untuk 1 jam lagi
+            new_time = until.strftime("%H:%M")
+            await query.edit_message_text(
+                f"⏸️ **Notifikasi ditunda 1 jam.**\n"
+                f"Pengingat berikutnya: {new_time}",
+                parse_mode=ParseMode.MARKDOWN
+            )
+        else:
+            await query.edit_message_text(
+                f"❌ **Utang #{debt_id} sudah tidak ada.**\n"
+                "Utang ini sudah lunas atau dihapus.",
+                parse_mode=ParseMode.MARKDOWN
+            )
+
+# Handler untuk menu dan state percakapan
+async def menu_add_debt(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler menu ➕ Tambah Utang"""
+    await update.message.reply_text(
+        "📝 **Tambahkan Utang Baru**\n\n"
+        "Silakan kirim data utang dengan format:\n"
+        "`Nama | Jumlah | Tanggal Bayar | Jam Notif | Catatan`\n\n"
+        "🔸 **Contoh:**\n"
+        "`John | 100k | 2025/12/20 | 12:30 | Utang makan siang`\n\n"
+        "💡 **Catatan:**\n"
+        "• Tanggal format: YYYY/MM/DD\n"
+        "• Jam format: HH:MM (24 jam)\n"
+        "• Tanggal dan jam bisa dikosongkan\n"
+        "• Pisahkan dengan tanda pipe (|)\n\n"
+        "🔁 **Cicilan/berulang (kolom ke-6):**\n"
+        "`Motor | 500k | 2025/01/10 | 09:00 | Cicilan | bulanan x12`\n\n"
+        "📥 **Import banyak utang:**\n"
+        "Kirim beberapa baris sekaligus (satu utang per baris) "
+        "atau kirim file CSV/XLSX dengan kolom yang sama.",
+        parse_mode=ParseMode.MARKDOWN
+    )
+    set_state(context, "adding_debt")
+
+async def menu_delete_debt(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler menu 🗑️ Hapus Utang"""
+    user_id = update.effective_user.id
+    
+    first_page = await run_io(DebtListView.get_page, user_id, "delete", 0)
+    if not first_page:
+        await update.message.reply_text(
+            "📭 **Tidak ada utang yang tercatat.**\n"
+            "Tambahkan utang terlebih dahulu.",
+            parse_mode=ParseMode.MARKDOWN,
+            reply_markup=get_main_keyboard()
+        )
+        return
+    
+    page_text, page_markup = first_page
+    await update.message.reply_text(
+        page_text,
+        parse_mode=ParseMode.MARKDOWN,
+        reply_markup=page_markup
+    )
+    set_state(context, "deleting_debt")
+
+async def menu_list_debts(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler menu 📋 Daftar Utang"""
+    user_id = update.effective_user.id
+    
+    first_page = await run_io(DebtListView.get_page, user_id, "list", 0)
+    if not first_page:
+        await update.message.reply_text(
+            "📭 **Tidak ada utang yang tercatat.**\n"
+            "Tambahkan utang terlebih dahulu.",
+            parse_mode=ParseMode.MARKDOWN,
+            reply_markup=get_main_keyboard()
+        )
+        return
+    
+    page_text, page_markup = first_page
+    await update.message.reply_text(
+        page_text,
+        parse_mode=ParseMode.MARKDOWN,
+        reply_markup=page_markup
+    )
+
+async def menu_debtor_summary(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler menu 👥 Per Penghutang"""
+    user_id = update.effective_user.id
+    
+    summary = await run_io(DebtManager.get_debtor_summary, user_id)
+    if not summary:
+        await update.message.reply_text(
+            "📭 **Tidak ada utang yang tercatat.**\n"
+            "Tambahkan utang terlebih dahulu.",
+            parse_mode=ParseMode.MARKDOWN,
+            reply_markup=get_main_keyboard()
+        )
+        return
+    
+    entries = sorted(summary.values(), key=lambda entry: entry["total"], reverse=True)
+    summary_text = "👥 **Ringkasan per Penghutang:**\n\n"
+    for i, entry in enumerate(entries):
+        line = (
+            f"🔸 **{entry['name']}**\n"
+            f"   📝 {entry['count']} utang • 💰 Rp {DebtListView.format_amount(entry['total'])}\n"
+            f"   📅 Terdekat: {entry['earliest_due'] or 'Tidak ditentukan'}\n\n"
+        )
+        if len(summary_text) + len(line) > PAGE_TEXT_LIMIT:
+            summary_text += f"... dan {len(entries) - i} penghutang lainnya\n\n"
+            break
+        summary_text += line
+    
+    total_str = DebtListView.format_amount(sum(entry["total"] for entry in entries))
+    summary_text += f"💰 **Total Utang:** Rp {total_str}"
+    
+    await update.message.reply_text(
+        summary_text,
+        parse_mode=ParseMode.MARKDOWN,
+        reply_markup=get_main_keyboard()
+    )
+
+async def menu_notification_interval(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler menu ⏸️ Jeda Notifikasi"""
+    await update.message.reply_text(
+        "⏸️ **Atur Interval Notifikasi**\n\n"
+        "Kirim jumlah menit untuk interval notifikasi:\n"
+        "Contoh: `5` (untuk setiap 5 menit)\n"
+        "Contoh: `0` (untuk menonaktifkan)\n\n"
+        "💡 **Default:** 5 menit",
+        parse_mode=ParseMode.MARKDOWN
+    )
+    set_state(context, "setting_interval")
+
+async def menu_support(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler menu 💝 Support Developer"""
+    try:
+        if os.path.exists("qris.jpeg"):
+            await MediaCache.reply_photo(
+                update.message,
+                "qris.jpeg",
+                caption=(
+                    "💖 **Support Developer** 💖\n\n"
+                    "Dukung pengembangan bot ini agar terus berkembang!\n\n"
+                    "💳 **Donasi via QRIS:**\n"
+                    "Scan QR code di atas\n\n"
+                    "🌎 **Cryptocurrency:**\n"
+                    "• **BTC:** `bc1qxy2kgdygjrsqtzq2n0yrf2493p83kkfjhx0wlh`\n"
+                    "• **ETH/USDT (ERC20):** `0x742d35Cc6634C0532925a3b844Bc9e0F4Bf5aC32`\n\n"
+                    "💝 **Terima kasih atas supportnya!**\n"
+                    "Setiap donasi sangat berarti untuk pengembangan bot."
+                ),
+                parse_mode=ParseMode.MARKDOWN,
+                reply_markup=get_main_keyboard()
+            )
+        else:
+            await update.message.reply_text(
+                "💖 **Support Developer** 💖\n\n"
+                "Dukung pengembangan bot ini agar terus berkembang!\n\n"
+                "🌎 **Cryptocurrency:**\n"
+                "• **BTC:** `bc1qxy2kgdygjrsqtzq2n0yrf2493p83kkfjhx0wlh`\n"
+                "• **ETH/USDT (ERC20):** `0x742d35Cc6634C0532925a3b844Bc9e0F4Bf5aC32`\n\n"
+                "💝 **Terima kasih atas supportnya!**\n"
+                "Setiap donasi sangat berarti untuk pengembangan bot.",
+                parse_mode=ParseMode.MARKDOWN,
+                reply_markup=get_main_keyboard()
+            )
+    except Exception as e:
+        logger.error(f"Error sending support info: {e}")
+        await update.message.reply_text(
+            "💖 Terima kasih minat untuk support developer!",
+            reply_markup=get_main_keyboard()
+        )
+
+async def menu_back(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler menu ⬅️ Kembali ke Menu"""
+    await update.message.reply_text(
+        "🏠 **Kembali ke Menu Utama**\n"
+        "Pilih opsi di bawah:",
+        reply_markup=get_main_keyboard()
+    )
+
+async def state_adding_debt(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler state adding_debt"""
+    user_id = update.effective_user.id
+    text = update.message.text
+    
+    # Banyak baris sekaligus, import massal
+    if len([line for line in text.splitlines() if line.strip()]) > 1:
+        debts, errors = DebtImporter.parse_rows(DebtImporter.iter_text_rows(text))
+        debt_ids = await run_io(DebtManager.add_debts, user_id, debts) if debts else []
+        await update.message.reply_text(
+            DebtImporter.format_report(debt_ids, errors),
+            parse_mode=ParseMode.MARKDOWN,
+            reply_markup=get_main_keyboard()
+        )
+        set_state(context, None)
+        return
+    
+    # Parse debt data
+    try:
+        debt_data = DebtImporter.parse_line(text)
+    except ValueError as e:
+        if str(e) == "date":
+            error_text = (
+                "❌ **Format tanggal salah!**\n"
+                "Gunakan format: YYYY/MM/DD\n"
+                "Contoh: 2025/12/20"
+            )
+        elif str(e) == "recurrence":
+            error_text = (
+                "❌ **Format ulang salah!**\n"
+                "Gunakan: bulanan, mingguan, atau bulanan x12\n"
+                "Tanggal jatuh tempo pertama wajib diisi."
+            )
+        elif str(e) == "time":
+            error_text = (
+                "❌ **Format waktu salah!**\n"
+                "Gunakan format: HH:MM (24 jam)\n"
+                "Contoh: 14:30"
+            )
+        elif str(e) == "amount":
+            error_text = (
+                "❌ **Jumlah tidak valid!**\n"
+                "Contoh: `100k`, `1.5k` atau `50.000`"
+            )
+        else:
+            error_text = (
+                "❌ **Format salah!**\n"
+                "Minimal: Nama | Jumlah\n"
+                "Contoh: `John | 100k`"
+            )
+        await update.message.reply_text(error_text, parse_mode=ParseMode.MARKDOWN)
+        return
+    
+    debtor_name = debt_data["debtor_name"]
+    amount = debt_data["amount"]
+    payment_date = debt_data["payment_date"]
+    notification_time = debt_data["notification_time"]
+    notes = debt_data["notes"]
+    
+    # Save debt
+    debt_id = await run_io(DebtManager.add_debt, user_id, debt_data)
+    
+    await update.message.reply_text(
+        f"✅ **Utang berhasil ditambahkan!**\n\n"
+        f"📌 **ID:** {debt_id}\n"
+        f"👤 **Nama:** {debtor_name}\n"
+        f"💰 **Jumlah:** {amount}\n"
+        f"📅 **Tanggal:** {payment_date or 'Tidak ditentukan'}\n"
+        f"⏰ **Notif:** {notification_time or 'Tidak diatur'}\n"
+        f"📝 **Catatan:** {notes or 'Tidak ada'}\n\n"
+        f"💡 Bot akan mengingatkan saat jatuh tempo!",
+        parse_mode=ParseMode.MARKDOWN,
+        reply_markup=get_main_keyboard()
+    )
+    
+    set_state(context, None)
+
+async def state_paying_debt(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler state paying_debt"""
+    user_id = update.effective_user.id
+    text = update.message.text
+    
+    debt_id = context.user_data.get("paying_debt_id")
+    amount = int(DebtManager.parse_amount(text))
+    if amount <= 0:
+        await update.message.reply_text(
+            "❌ **Jumlah tidak valid!**\n"
+            "Contoh: `50k` atau `25000`",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return
+    
+    result = await run_io(DebtManager.record_payment, user_id, debt_id, amount) if debt_id else None
+    if result is None:
+        message = "❌ **Utang tidak ditemukan!**"
+    elif result["settled"]:
+        message = (
+            f"✅ **Pembayaran Rp {result['paid']:,} tercatat.**\n"
+            f"🎉 Utang sudah lunas dan dipindahkan ke arsip."
+        )
+    elif result.get("next_due"):
+        message = (
+            f"✅ **Pembayaran Rp {result['paid']:,} tercatat.**\n"
+            f"🔁 Cicilan berikutnya jatuh tempo {result['next_due']}."
+        )
+    else:
+        message = (
+            f"✅ **Pembayaran Rp {result['paid']:,} tercatat.**\n"
+            f"💰 Sisa utang: Rp {result['remaining']:,}"
+        )
+    
+    await update.message.reply_text(
+        message,
         parse_mode=ParseMode.MARKDOWN,
         reply_markup=get_main_keyboard()
     )
+    set_state(context, None)
+    context.user_data.pop("paying_debt_id", None)
 
-# Handler untuk tombol
-async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handler untuk tombol inline"""
-    query = update.callback_query
-    await query.answer()
-    
-    user_id = query.from_user.id
-    data = query.data
+async def state_deleting_debt(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler state deleting_debt"""
+    user_id = update.effective_user.id
+    text = update.message.text
     
-    if data == "check_join":
-        # Cek apakah user sudah join semua group
-        groups = JoinGroupManager.get_all_groups()
-        all_joined = await check_user_joined_all_groups(user_id, context)
-        
-        if all_joined:
-            await query.edit_message_text(
-                "✅ **Verifikasi berhasil!**\n\n"
-                "Anda telah bergabung dengan semua group yang diwajibkan.\n\n"
-                "Sekarang Anda dapat menggunakan bot ini sepenuhnya!",
-                parse_mode=ParseMode.MARKDOWN
-            )
-            
-            # Kirim menu utama
-            await query.message.reply_text(
-                "🎉 **Selamat!** Anda sekarang dapat menggunakan semua fitur bot.\n"
-                "Pilih menu di bawah:",
+    try:
+        debt_id = int(text)
+        if await run_io(DebtManager.delete_debt, user_id, debt_id):
+            await update.message.reply_text(
+                f"✅ **Utang #{debt_id} berhasil dihapus!**",
+                parse_mode=ParseMode.MARKDOWN,
                 reply_markup=get_main_keyboard()
             )
         else:
-            await query.edit_message_text(
-                "❌ **Anda belum bergabung dengan semua group!**\n\n"
-                "Silakan bergabung dengan semua group yang tertera di atas, "
-                "kemudian klik 'Sudah Join' lagi.",
+            await update.message.reply_text(
+                f"❌ **Utang #{debt_id} tidak ditemukan!**",
                 parse_mode=ParseMode.MARKDOWN,
-                reply_markup=get_join_keyboard(groups)
+                reply_markup=get_main_keyboard()
             )
+    except ValueError:
+        await update.message.reply_text(
+            "❌ **Input tidak valid!**\n"
+            "Ketik nomor utang yang ingin dihapus.",
+            parse_mode=ParseMode.MARKDOWN
+        )
     
-    elif data.startswith("paid_"):
-        debt_id = int(data.split("_")[1])
-        if DebtManager.delete_debt(user_id, debt_id):
-            await query.edit_message_text(
-                "✅ **Utang berhasil ditandai sebagai sudah dibayar!**\n"
-                "Data telah dihapus dari catatan.",
+    set_state(context, None)
+
+async def state_setting_interval(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler state setting_interval"""
+    user_id = update.effective_user.id
+    text = update.message.text
+    
+    try:
+        interval = int(text)
+        if interval < 0:
+            await update.message.reply_text(
+                "❌ **Interval tidak valid!**\n"
+                "Gunakan angka positif.",
                 parse_mode=ParseMode.MARKDOWN
             )
+            return
+    
+        await run_io(DebtManager.update_notification_interval, user_id, interval)
+    
+        if interval == 0:
+            message = "🔕 **Notifikasi dinonaktifkan.**"
         else:
-            await query.edit_message_text(
-                "❌ **Gagal menandai utang.**\n"
-                "Silakan coba lagi atau hubungi developer.",
+            message = f"⏰ **Interval notifikasi diatur ke {interval} menit.**"
+    
+        await update.message.reply_text(
+            message,
+            parse_mode=ParseMode.MARKDOWN,
+            reply_markup=get_main_keyboard()
+        )
+    except ValueError:
+        await update.message.reply_text(
+            "❌ **Input tidak valid!**\n"
+            "Gunakan angka (dalam menit).",
+            parse_mode=ParseMode.MARKDOWN
+        )
+    
+    set_state(context, None)
+
+async def state_deleting_group(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler state deleting_group"""
+    user_id = update.effective_user.id
+    text = update.message.text
+    
+    if user_id != OWNER_ID:
+        await default_reply(update, context)
+        return
+    
+    try:
+        index = int(text) - 1
+        removed = await run_io(JoinGroupManager.remove_group, index)
+        if removed:
+            await update.message.reply_text(
+                f"✅ **Group berhasil dihapus!**\n\n"
+                f"Group: {removed}\n"
+                f"📊 Sisa group: {JoinGroupManager.get_groups_count()}",
                 parse_mode=ParseMode.MARKDOWN
             )
-    
-    elif data.startswith("snooze_"):
-        debt_id = int(data.split("_")[1])
-        debt = DebtManager.get_debt(user_id, debt_id)
-        if debt:
-            # Update notification time untuk 1 jam lagi
-            new_time = (datetime.now() + timedelta(hours=1)).strftime("%H:%M")
-            await query.edit_message_text(
-                f"⏸️ **Notifikasi ditunda 1 jam.**\n"
-                f"Pengingat berikutnya: {new_time}",
+        else:
+            await update.message.reply_text(
+                f"❌ **Group #{index + 1} tidak ditemukan!**",
                 parse_mode=ParseMode.MARKDOWN
             )
+    except ValueError:
+        await update.message.reply_text(
+            "❌ **Input tidak valid!**\n"
+            "Ketik nomor group yang ingin dihapus.",
+            parse_mode=ParseMode.MARKDOWN
+        )
+    
+    set_state(context, None)
+
+async def default_reply(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Balasan default jika pesan tidak dikenali"""
+    await update.message.reply_text(
+        "🤖 **Kapan Bayar Bot**\n\n"
+        "Gunakan menu di bawah untuk mengelola utang Anda!",
+        reply_markup=get_main_keyboard()
+    )
+
+# Pengaturan router pesan
+STATE_TIMEOUT = 15 * 60  # detik, state tanpa aktivitas dianggap berakhir
+SLOW_ROUTE_THRESHOLD = 1.0  # detik, route lebih lambat dari ini dicatat di log
+
+# Tabel routing menu: label tombol -> handler
+MENU_ROUTES = {
+    "➕ Tambah Utang": menu_add_debt,
+    "🗑️ Hapus Utang": menu_delete_debt,
+    "📋 Daftar Utang": menu_list_debts,
+    "👥 Per Penghutang": menu_debtor_summary,
+    "⏸️ Jeda Notifikasi": menu_notification_interval,
+    "❓ Panduan": help_command,
+    "💝 Support Developer": menu_support,
+    "⬅️ Kembali ke Menu": menu_back
+}
+
+# Tabel routing state: state -> (handler, timeout dalam detik)
+STATE_ROUTES = {
+    "adding_debt": (state_adding_debt, STATE_TIMEOUT),
+    "paying_debt": (state_paying_debt, STATE_TIMEOUT),
+    "deleting_debt": (state_deleting_debt, STATE_TIMEOUT),
+    "setting_interval": (state_setting_interval, STATE_TIMEOUT),
+    "deleting_group": (state_deleting_group, STATE_TIMEOUT)
+}
+
+def set_state(context: ContextTypes.DEFAULT_TYPE, state: Optional[str]):
+    """Mengatur state percakapan user beserta waktu mulainya"""
+    if state:
+        context.user_data["state"] = state
+        context.user_data["state_at"] = time.time()
+    else:
+        # Dihapus (bukan None) agar user tanpa state tidak punya file state sama sekali
+        context.user_data.pop("state", None)
+        context.user_data.pop("state_at", None)
+
+async def expire_stale_state(update: Update, context: ContextTypes.DEFAULT_TYPE, timeout: float) -> bool:
+    """Mengakhiri state yang melewati timeout dan memberi tahu user, True jika state sudah berakhir"""
+    # State tanpa state_at (disimpan sebelum ada timeout) dianggap sudah berakhir
+    if time.time() - context.user_data.get("state_at", 0) <= timeout:
+        return False
+    set_state(context, None)
+    await update.message.reply_text(
+        "⌛ **Sesi sebelumnya sudah berakhir.**\n"
+        "Silakan pilih menu lagi.",
+        parse_mode=ParseMode.MARKDOWN,
+        reply_markup=get_main_keyboard()
+    )
+    return True
+
+# Class untuk statistik latency per route
+class RouteStats:
+    _stats = {}
+    
+    @staticmethod
+    def record(route: str, elapsed: float):
+        """Mencatat durasi satu eksekusi route"""
+        stats = RouteStats._stats.get(route)
+        if stats is None:
+            stats = RouteStats._stats[route] = {"count": 0, "total": 0.0, "max": 0.0, "samples": deque(maxlen=512)}
+        stats["count"] += 1
+        stats["total"] += elapsed
+        stats["max"] = max(stats["max"], elapsed)
+        stats["samples"].append(elapsed)
+        
+        if elapsed > SLOW_ROUTE_THRESHOLD:
+            logger.warning(f"Slow route {route}: {elapsed * 1000:.0f} ms")
+    
+    @staticmethod
+    def snapshot() -> Dict[str, Dict]:
+        """Ringkasan statistik semua route (dalam milidetik)"""
+        result = {}
+        for route, stats in RouteStats._stats.items():
+            samples = sorted(stats["samples"])
+            result[route] = {
+                "count": stats["count"],
+                "avg_ms": stats["total"] / stats["count"] * 1000,
+                "p50_ms": samples[len(samples) // 2] * 1000,
+                "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+                "max_ms": stats["max"] * 1000
+            }
+        return result
+
+async def run_route(route: str, handler, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Menjalankan handler route sambil mencatat latency-nya"""
+    start = time.perf_counter()
+    try:
+        await handler(update, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        RouteStats.record(route, elapsed)
+        Metrics.observe("kapanbayar_route_seconds", elapsed, {"route": route})
+
+# Class untuk membatasi user yang spam (token bucket per user)
+class FloodLimiter:
+    # user_id -> [token, waktu isi ulang terakhir, waktu peringatan terakhir]
+    _buckets = OrderedDict()
+    # user_id -> jumlah update yang dibuang (LRU, ukuran sama dengan bucket)
+    _drops = OrderedDict()
+    
+    @staticmethod
+    def hit(user_id: int) -> Tuple[bool, bool]:
+        """Mengambil satu token; hasil (diizinkan, perlu kirim peringatan)"""
+        now = time.monotonic()
+        bucket = FloodLimiter._buckets.get(user_id)
+        if bucket is None:
+            bucket = FloodLimiter._buckets[user_id] = [float(FLOOD_BURST), now, 0.0]
+            while len(FloodLimiter._buckets) > FLOOD_MAX_BUCKETS:
+                FloodLimiter._buckets.popitem(last=False)
+        else:
+            FloodLimiter._buckets.move_to_end(user_id)
+            bucket[0] = min(FLOOD_BURST, bucket[0] + (now - bucket[1]) * FLOOD_RATE)
+            bucket[1] = now
+        
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return True, False
+        
+        FloodLimiter._drops[user_id] = FloodLimiter._drops.get(user_id, 0) + 1
+        Metrics.inc("kapanbayar_flood_drops_total")
+        FloodLimiter._drops.move_to_end(user_id)
+        while len(FloodLimiter._drops) > FLOOD_MAX_BUCKETS:
+            FloodLimiter._drops.popitem(last=False)
+        
+        # Peringatkan sekali per interval, sisanya dibuang diam-diam
+        if now - bucket[2] >= FLOOD_WARN_INTERVAL:
+            bucket[2] = now
+            return False, True
+        return False, False
+    
+    @staticmethod
+    def top_offenders(limit: int = 10) -> List[Tuple[int, int]]:
+        """User dengan update terbuang terbanyak"""
+        return sorted(FloodLimiter._drops.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+async def flood_guard(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Dijalankan sebelum semua handler, buang update dari user yang spam"""
+    user = update.effective_user
+    if user is None or user.id == OWNER_ID:
+        return
+    
+    allowed, warn = FloodLimiter.hit(user.id)
+    if allowed:
+        return
+    
+    if update.callback_query:
+        # Callback tetap dijawab agar tombol tidak loading terus
+        await update.callback_query.answer("⏳ Pelan-pelan ya..." if warn else None)
+    elif warn and update.effective_message:
+        await update.effective_message.reply_text("⏳ **Terlalu cepat!** Tunggu sebentar lalu coba lagi.", parse_mode=ParseMode.MARKDOWN)
+    raise ApplicationHandlerStop
 
-# Handler untuk pesan teks
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler untuk pesan teks"""
     user = update.effective_user
     user_id = user.id
     text = update.message.text
     
-    # Update last active
-    UserManager.update_last_active(user_id)
+    # Update last active (bisa memulihkan arsip dari disk, jadi lewat thread I/O)
+    await run_io(UserManager.update_last_active, user_id)
     
     # Cek apakah user harus join group/channel
     groups = JoinGroupManager.get_all_groups()
@@ -672,297 +4071,97 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 )
                 return
     
-    # Handler untuk menu
-    if text == "➕ Tambah Utang":
-        await update.message.reply_text(
-            "📝 **Tambahkan Utang Baru**\n\n"
-            "Silakan kirim data utang dengan format:\n"
-            "`Nama | Jumlah | Tanggal Bayar | Jam Notif | Catatan`\n\n"
-            "🔸 **Contoh:**\n"
-            "`John | 100k | 2025/12/20 | 12:30 | Utang makan siang`\n\n"
-            "💡 **Catatan:**\n"
-            "• Tanggal format: YYYY/MM/DD\n"
-            "• Jam format: HH:MM (24 jam)\n"
-            "• Tanggal dan jam bisa dikosongkan\n"
-            "• Pisahkan dengan tanda pipe (|)",
-            parse_mode=ParseMode.MARKDOWN
-        )
-        context.user_data["state"] = "adding_debt"
+    # Route menu
+    menu_handler = MENU_ROUTES.get(text)
+    if menu_handler:
+        await run_route(text, menu_handler, update, context)
+        return
     
-    elif text == "🗑️ Hapus Utang":
-        debts = DebtManager.get_all_debts(user_id)
-        if not debts:
-            await update.message.reply_text(
-                "📭 **Tidak ada utang yang tercatat.**\n"
-                "Tambahkan utang terlebih dahulu.",
-                parse_mode=ParseMode.MARKDOWN,
-                reply_markup=get_main_keyboard()
-            )
+    # Route berdasarkan state percakapan
+    state = context.user_data.get("state")
+    state_route = STATE_ROUTES.get(state)
+    if state_route:
+        state_handler, timeout = state_route
+        if await expire_stale_state(update, context, timeout):
             return
-        
-        # Buat daftar utang
-        debt_list = "📋 **Daftar Utang:**\n\n"
-        for debt in debts:
-            debt_list += (
-                f"{debt['id']}. **{debt.get('debtor_name', 'Tidak diketahui')}**\n"
-                f"   💰 {debt.get('amount', '0')}\n"
-                f"   📅 {debt.get('payment_date', 'Tidak ditentukan')}\n\n"
-            )
-        
-        debt_list += "Ketik nomor utang yang ingin dihapus:"
-        
-        await update.message.reply_text(
-            debt_list,
-            parse_mode=ParseMode.MARKDOWN
-        )
-        context.user_data["state"] = "deleting_debt"
+        await run_route(f"state:{state}", state_handler, update, context)
+        return
     
-    elif text == "📋 Daftar Utang":
-        debts = DebtManager.get_all_debts(user_id)
-        if not debts:
-            await update.message.reply_text(
-                "📭 **Tidak ada utang yang tercatat.**\n"
-                "Tambahkan utang terlebih dahulu.",
-                parse_mode=ParseMode.MARKDOWN,
-                reply_markup=get_main_keyboard()
-            )
-            return
-        
-        # Buat daftar utang
-        debt_list = "📊 **Daftar Utang Anda:**\n\n"
-        total_amount = 0
-        
-        for debt in debts:
-            debt_list += (
-                f"🔸 **{debt.get('debtor_name', 'Tidak diketahui')}**\n"
-                f"   💰 **Jumlah:** {debt.get('amount', '0')}\n"
-                f"   📅 **Jatuh tempo:** {debt.get('payment_date', 'Tidak ditentukan')}\n"
-                f"   ⏰ **Notif:** {debt.get('notification_time', 'Tidak diatur')}\n"
-                f"   📝 **Catatan:** {debt.get('notes', 'Tidak ada')}\n\n"
-            )
-            
-            # Hitung total
-            try:
-                amount_str = str(debt.get('amount', '0')).replace('k', '000').replace('K', '000')
-                amount_str = ''.join(c for c in amount_str if c.isdigit() or c == '.')
-                total_amount += float(amount_str)
-            except:
-                continue
-        
-        # Format total amount
-        if total_amount >= 1000000:
-            total_str = f"{total_amount/1000000:.1f}M"
-        elif total_amount >= 1000:
-            total_str = f"{total_amount/1000:.0f}k"
-        else:
-            total_str = str(int(total_amount))
-        
-        debt_list += f"💰 **Total Utang:** Rp {total_str}"
-        
+    await run_route("default", default_reply, update, context)
+
+# Handler untuk dokumen (import CSV/XLSX)
+async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk file import utang"""
+    user_id = update.effective_user.id
+    document = update.message.document
+    
+    if context.user_data.get("state") != "adding_debt":
         await update.message.reply_text(
-            debt_list,
-            parse_mode=ParseMode.MARKDOWN,
+            "📥 Untuk import utang dari file, klik '➕ Tambah Utang' lalu kirim file CSV/XLSX.",
             reply_markup=get_main_keyboard()
         )
+        return
+    
+    # Timeout sama dengan pesan teks, file yang datang jauh setelah sesi tidak diimport
+    if await expire_stale_state(update, context, STATE_ROUTES["adding_debt"][1]):
+        return
     
-    elif text == "⏸️ Jeda Notifikasi":
+    if not await check_user_joined_all_groups(user_id, context):
         await update.message.reply_text(
-            "⏸️ **Atur Interval Notifikasi**\n\n"
-            "Kirim jumlah menit untuk interval notifikasi:\n"
-            "Contoh: `5` (untuk setiap 5 menit)\n"
-            "Contoh: `0` (untuk menonaktifkan)\n\n"
-            "💡 **Default:** 5 menit",
+            "⛔ **Akses Dibatasi**\n\nGunakan /start untuk verifikasi.",
             parse_mode=ParseMode.MARKDOWN
         )
-        context.user_data["state"] = "setting_interval"
-    
-    elif text == "❓ Panduan":
-        await help_command(update, context)
-    
-    elif text == "💝 Support Developer":
-        try:
-            if os.path.exists("qris.jpeg"):
-                with open("qris.jpeg", 'rb') as photo:
-                    await update.message.reply_photo(
-                        photo=photo,
-                        caption=(
-                            "💖 **Support Developer** 💖\n\n"
-                            "Dukung pengembangan bot ini agar terus berkembang!\n\n"
-                            "💳 **Donasi via QRIS:**\n"
-                            "Scan QR code di atas\n\n"
-                            "🌎 **Cryptocurrency:**\n"
-                            "• **BTC:** `bc1qxy2kgdygjrsqtzq2n0yrf2493p83kkfjhx0wlh`\n"
-                            "• **ETH/USDT (ERC20):** `0x742d35Cc6634C0532925a3b844Bc9e0F4Bf5aC32`\n\n"
-                            "💝 **Terima kasih atas supportnya!**\n"
-                            "Setiap donasi sangat berarti untuk pengembangan bot."
-                        ),
-                        parse_mode=ParseMode.MARKDOWN,
-                        reply_markup=get_main_keyboard()
-                    )
-            else:
-                await update.message.reply_text(
-                    "💖 **Support Developer** 💖\n\n"
-                    "Dukung pengembangan bot ini agar terus berkembang!\n\n"
-                    "🌎 **Cryptocurrency:**\n"
-                    "• **BTC:** `bc1qxy2kgdygjrsqtzq2n0yrf2493p83kkfjhx0wlh`\n"
-                    "• **ETH/USDT (ERC20):** `0x742d35Cc6634C0532925a3b844Bc9e0F4Bf5aC32`\n\n"
-                    "💝 **Terima kasih atas supportnya!**\n"
-                    "Setiap donasi sangat berarti untuk pengembangan bot.",
-                    parse_mode=ParseMode.MARKDOWN,
-                    reply_markup=get_main_keyboard()
-                )
-        except Exception as e:
-            logger.error(f"Error sending support info: {e}")
-            await update.message.reply_text(
-                "💖 Terima kasih minat untuk support developer!",
-                reply_markup=get_main_keyboard()
-            )
+        return
     
-    elif text == "⬅️ Kembali ke Menu":
+    filename = (document.file_name or "").lower()
+    if not filename.endswith((".csv", ".txt", ".xlsx")):
         await update.message.reply_text(
-            "🏠 **Kembali ke Menu Utama**\n"
-            "Pilih opsi di bawah:",
-            reply_markup=get_main_keyboard()
+            "❌ **Format file tidak didukung!**\n"
+            "Gunakan file .csv atau .xlsx",
+            parse_mode=ParseMode.MARKDOWN
         )
+        return
     
-    else:
-        # Handle state-based messages
-        state = context.user_data.get("state")
-        
-        if state == "adding_debt":
-            # Parse debt data
-            parts = [part.strip() for part in text.split('|')]
-            
-            if len(parts) < 2:
-                await update.message.reply_text(
-                    "❌ **Format salah!**\n"
-                    "Minimal: Nama | Jumlah\n"
-                    "Contoh: `John | 100k`",
-                    parse_mode=ParseMode.MARKDOWN
-                )
-                return
-            
-            debtor_name = parts[0]
-            amount = parts[1]
-            payment_date = parts[2] if len(parts) > 2 else None
-            notification_time = parts[3] if len(parts) > 3 else None
-            notes = parts[4] if len(parts) > 4 else ""
-            
-            # Validate date format
-            if payment_date:
-                try:
-                    datetime.strptime(payment_date, "%Y/%m/%d")
-                except ValueError:
-                    await update.message.reply_text(
-                        "❌ **Format tanggal salah!**\n"
-                        "Gunakan format: YYYY/MM/DD\n"
-                        "Contoh: 2025/12/20",
-                        parse_mode=ParseMode.MARKDOWN
-                    )
-                    return
-            
-            # Validate time format
-            if notification_time:
-                try:
-                    datetime.strptime(notification_time, "%H:%M")
-                except ValueError:
-                    await update.message.reply_text(
-                        "❌ **Format waktu salah!**\n"
-                        "Gunakan format: HH:MM (24 jam)\n"
-                        "Contoh: 14:30",
-                        parse_mode=ParseMode.MARKDOWN
-                    )
-                    return
-            
-            # Save debt
-            debt_data = {
-                "debtor_name": debtor_name,
-                "amount": amount,
-                "payment_date": payment_date,
-                "notification_time": notification_time,
-                "notes": notes
-            }
-            
-            debt_id = DebtManager.add_debt(user_id, debt_data)
-            
-            await update.message.reply_text(
-                f"✅ **Utang berhasil ditambahkan!**\n\n"
-                f"📌 **ID:** {debt_id}\n"
-                f"👤 **Nama:** {debtor_name}\n"
-                f"💰 **Jumlah:** {amount}\n"
-                f"📅 **Tanggal:** {payment_date or 'Tidak ditentukan'}\n"
-                f"⏰ **Notif:** {notification_time or 'Tidak diatur'}\n"
-                f"📝 **Catatan:** {notes or 'Tidak ada'}\n\n"
-                f"💡 Bot akan mengingatkan saat jatuh tempo!",
-                parse_mode=ParseMode.MARKDOWN,
-                reply_markup=get_main_keyboard()
-            )
-            
-            context.user_data["state"] = None
-        
-        elif state == "deleting_debt":
-            try:
-                debt_id = int(text)
-                if DebtManager.delete_debt(user_id, debt_id):
-                    await update.message.reply_text(
-                        f"✅ **Utang #{debt_id} berhasil dihapus!**",
-                        parse_mode=ParseMode.MARKDOWN,
-                        reply_markup=get_main_keyboard()
-                    )
-                else:
-                    await update.message.reply_text(
-                        f"❌ **Utang #{debt_id} tidak ditemukan!**",
-                        parse_mode=ParseMode.MARKDOWN,
-                        reply_markup=get_main_keyboard()
-                    )
-            except ValueError:
-                await update.message.reply_text(
-                    "❌ **Input tidak valid!**\n"
-                    "Ketik nomor utang yang ingin dihapus.",
-                    parse_mode=ParseMode.MARKDOWN
-                )
-            
-            context.user_data["state"] = None
-        
-        elif state == "setting_interval":
-            try:
-                interval = int(text)
-                if interval < 0:
-                    await update.message.reply_text(
-                        "❌ **Interval tidak valid!**\n"
-                        "Gunakan angka positif.",
-                        parse_mode=ParseMode.MARKDOWN
-                    )
-                    return
-                
-                DebtManager.update_notification_interval(user_id, interval)
-                
-                if interval == 0:
-                    message = "🔕 **Notifikasi dinonaktifkan.**"
-                else:
-                    message = f"⏰ **Interval notifikasi diatur ke {interval} menit.**"
-                
-                await update.message.reply_text(
-                    message,
-                    parse_mode=ParseMode.MARKDOWN,
-                    reply_markup=get_main_keyboard()
-                )
-            except ValueError:
-                await update.message.reply_text(
-                    "❌ **Input tidak valid!**\n"
-                    "Gunakan angka (dalam menit).",
-                    parse_mode=ParseMode.MARKDOWN
-                )
-            
-            context.user_data["state"] = None
+    if document.file_size and document.file_size > MAX_IMPORT_FILE_SIZE:
+        await update.message.reply_text("❌ **File terlalu besar!** Maksimal 5 MB.", parse_mode=ParseMode.MARKDOWN)
+        return
+    
+    buffer = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    try:
+        telegram_file = await document.get_file()
+        await telegram_file.download_to_memory(out=buffer)
+        buffer.seek(0)
         
+        if filename.endswith(".xlsx"):
+            rows = DebtImporter.iter_xlsx_rows(buffer)
         else:
-            # Default response
-            await update.message.reply_text(
-                "🤖 **Kapan Bayar Bot**\n\n"
-                "Gunakan menu di bawah untuk mengelola utang Anda!",
-                reply_markup=get_main_keyboard()
-            )
+            rows = DebtImporter.iter_csv_rows(buffer)
+        debts, errors = await run_io(DebtImporter.parse_rows, rows)
+    except ImportError:
+        await update.message.reply_text(
+            "❌ **Import XLSX belum tersedia di server ini.**\n"
+            "Simpan file sebagai CSV lalu kirim ulang.",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return
+    except Exception as e:
+        logger.error(f"Error reading import file from {user_id}: {e}")
+        await update.message.reply_text(
+            "❌ **Gagal membaca file!**\n"
+            "Pastikan file CSV/XLSX valid.",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return
+    finally:
+        buffer.close()
+    
+    debt_ids = await run_io(DebtManager.add_debts, user_id, debts) if debts else []
+    await update.message.reply_text(
+        DebtImporter.format_report(debt_ids, errors),
+        parse_mode=ParseMode.MARKDOWN,
+        reply_markup=get_main_keyboard()
+    )
+    set_state(context, None)
 
 # Owner commands
 async def owner_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -979,11 +4178,18 @@ async def owner_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "📊 **Stats & Management:**\n"
         "• /stats - Lihat statistik bot\n"
         "• /backupuser - Backup data user\n"
+        "• /backup [full|incr|list] - Backup semua data\n"
+        "• /retention - Arsipkan user tidak aktif & utang lunas lama\n"
         "• /broadcast - Kirim pesan ke semua user\n"
         "• /addjoin @group - Tambah group wajib join\n"
         "• /listjoin - List group wajib join\n"
         "• /deljoin - Hapus group wajib join\n"
-        "• /statsjoin - Statistik user join\n\n"
+        "• /statsjoin - Statistik user join\n"
+        "• /statsjoin csv - Export status join (CSV)\n"
+        "• /routestats - Latency per menu/state\n"
+        "• /floodstats - User yang terkena limit spam\n"
+        "• /metrics - Ringkasan metrik (latency, storage, API)\n"
+        "• /profile 30 - Profiling 30 detik (cProfile/sampling)\n\n"
         
         "📈 **Statistik:**\n"
         "• Total user aktif\n"
@@ -1013,28 +4219,16 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     total_users = UserManager.get_total_users()
+    archived_users = await run_io(RetentionManager.count_archived_users)
     
-    # Hitung total utang dari semua user
-    total_debts = 0
-    total_amount = 0
-    user_files = list(DATABASE_DIR.glob("*.json"))
-    
-    for user_file in user_files:
-        try:
-            with open(user_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                total_debts += len(data.get("debts", []))
-                
-                # Hitung total amount
-                for debt in data.get("debts", []):
-                    try:
-                        amount_str = str(debt.get("amount", "0")).replace('k', '000').replace('K', '000')
-                        amount_str = ''.join(c for c in amount_str if c.isdigit() or c == '.')
-                        total_amount += float(amount_str)
-                    except:
-                        continue
-        except:
-            continue
+    # Total dan analitik dari snapshot kolom, file user tidak dibaca saat /stats
+    try:
+        report = Analytics.report(await run_io(Analytics.get))
+        total_debts, total_amount, file_count = report["debts"], report["total_remaining"], report["files"]
+    except Exception as e:
+        logger.error(f"Analytics report failed: {e}")
+        report = None
+        total_debts, total_amount, file_count = await run_io(DebtManager.get_global_stats)
     
     # Format total amount
     if total_amount >= 1000000:
@@ -1047,13 +4241,27 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     stats_text = (
         f"📊 **Statistik Bot** 📊\n\n"
         f"👥 **Total User:** {total_users}\n"
+        f"🗄️ **User Diarsipkan:** {archived_users}\n"
         f"📝 **Total Utang:** {total_debts}\n"
         f"💰 **Total Nilai:** {amount_str}\n"
-        f"📁 **Database:** {len(user_files)} file\n"
+        f"📁 **Database:** {file_count} file\n"
         f"🔗 **Group Wajib Join:** {JoinGroupManager.get_groups_count()}\n\n"
         f"🔄 **Terakhir Update:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
     )
     
+    if report:
+        fmt = DebtListView.format_amount
+        stats_text += (
+            f"\n\n📈 **Analitik** (snapshot {report['built_at'][:16].replace('T', ' ')})\n"
+            f"👤 **User Aktif:** {report['active'][1]} hari ini • {report['active'][7]} 7 hari • {report['active'][30]} 30 hari\n"
+            f"💵 **Jumlah Utang:** p50 Rp {fmt(report['percentiles'][50])} • p90 Rp {fmt(report['percentiles'][90])} "
+            f"• p99 Rp {fmt(report['percentiles'][99])}\n"
+            f"⏰ **Lewat Jatuh Tempo:** "
+            + " • ".join(f"{label} hari: {count}" for label, count in report["overdue"].items())
+            + f"\n🆕 **Utang Baru per Hari ({ANALYTICS_DAYS} hari):**\n"
+            + "\n".join(f"{day}  {count}" for day, count in report["created_per_day"])
+        )
+    
     await update.message.reply_text(
         stats_text,
         parse_mode=ParseMode.MARKDOWN
@@ -1067,16 +4275,91 @@ async def backupuser_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await update.message.reply_text("❌ Akses ditolak!")
         return
     
+    # Tulis data user terbaru dari memori sebelum dikirim
+    await run_io(UserManager._store.flush)
     if USERS_FILE.exists():
-        with open(USERS_FILE, 'rb') as f:
-            await update.message.reply_document(
-                document=f,
-                filename="users_backup.json",
-                caption=f"📁 **Backup Data User**\nTotal User: {UserManager.get_total_users()}"
-            )
+        content = await run_io(USERS_FILE.read_bytes)
+        await update.message.reply_document(
+            document=content,
+            filename="users_backup.json",
+            caption=f"📁 **Backup Data User**\nTotal User: {UserManager.get_total_users()}"
+        )
     else:
         await update.message.reply_text("❌ File backup tidak ditemukan!")
 
+async def backup_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /backup"""
+    user_id = update.effective_user.id
+    
+    if user_id != OWNER_ID:
+        await update.message.reply_text("❌ Akses ditolak!")
+        return
+    
+    mode = context.args[0].lower() if context.args else "full"
+    if mode == "list":
+        backups = await run_io(BackupManager.list_backups)
+        if not backups:
+            await update.message.reply_text("📭 Belum ada backup.")
+            return
+        text = f"🗄️ Backup di {BACKUP_DIR}/\n\n"
+        for path in backups[-20:]:
+            text += f"{path.name} ({Metrics.format_bytes(path.stat().st_size)})\n"
+        if BACKUP_INTERVAL:
+            text += f"\nTerjadwal setiap {BACKUP_INTERVAL:g} jam, full setiap {BACKUP_FULL_EVERY}x"
+        await update.message.reply_text(text)
+        return
+    if mode not in ("full", "incr", "incremental"):
+        await update.message.reply_text("❌ Format: /backup [full|incr|list]")
+        return
+    
+    await update.message.reply_text("⏳ Membuat backup...")
+    try:
+        info = await run_io(BackupManager.create_backup, incremental=mode != "full")
+    except Exception as e:
+        logger.error(f"Backup failed: {e}")
+        await update.message.reply_text("❌ Backup gagal, cek log bot.")
+        return
+    
+    caption = (
+        f"🗄️ Backup {info['type']}\n"
+        f"File: {info['added']} dari {info['files']}"
+        + (f", {len(info['deleted'])} dihapus" if info['deleted'] else "")
+        + f"\nUkuran: {Metrics.format_bytes(info['size'])} • {info['elapsed']:.1f} detik"
+    )
+    if info["size"] > BACKUP_SEND_LIMIT:
+        await update.message.reply_text(f"{caption}\n\nTerlalu besar untuk dikirim, tersimpan di {info['path']}")
+        return
+    # File handle dikirim langsung agar arsip tidak dimuat utuh ke memori
+    backup_file = await run_io(open, info["path"], 'rb')
+    try:
+        await update.message.reply_document(document=backup_file, filename=info["path"].name, caption=caption)
+    finally:
+        backup_file.close()
+
+async def retention_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /retention"""
+    user_id = update.effective_user.id
+    
+    if user_id != OWNER_ID:
+        await update.message.reply_text("❌ Akses ditolak!")
+        return
+    
+    await update.message.reply_text("⏳ Memindahkan data tidak aktif ke arsip...")
+    try:
+        info = await run_io(RetentionManager.run)
+    except Exception as e:
+        logger.error(f"Retention failed: {e}")
+        await update.message.reply_text("❌ Retensi gagal, cek log bot.")
+        return
+    
+    await update.message.reply_text(
+        f"🗄️ Retensi selesai dalam {info['elapsed']:.1f} detik\n\n"
+        f"User diarsipkan: {info['users']} (tidak aktif > {RETENTION_INACTIVE_DAYS} hari)\n"
+        f"Utang lunas diarsipkan: {info['settled']} (lunas > {RETENTION_SETTLED_DAYS} hari)\n"
+        f"User aktif: {info['active_users']} • di arsip: {info['archived_users']}\n\n"
+        f"User di arsip dipulihkan otomatis saat memakai bot lagi."
+    )
+
 async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler untuk command /broadcast - PERBAIKAN ERROR"""
     user_id = update.effective_user.id
@@ -1095,67 +4378,96 @@ async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     message_to_forward = update.message.reply_to_message
-    user_ids = UserManager.get_all_user_ids()
-    
-    await update.message.reply_text(f"📢 **Mulai broadcast ke {len(user_ids)} user...**")
+    # Klaim broadcast agar pesan yang sama tidak dikirim dari dua instance (mis. update dikirim ulang)
+    lease_name = f"broadcast:{message_to_forward.chat_id}:{message_to_forward.message_id}"
+    if LEADER_ELECTION:
+        claimed, holder = await run_io(Lease.try_acquire, lease_name, BROADCAST_LEASE_TTL)
+        if not claimed:
+            if holder == Lease.DONE:
+                await update.message.reply_text("ℹ️ Pesan ini sudah pernah di-broadcast.")
+            else:
+                await update.message.reply_text(f"⏳ Broadcast pesan ini sedang berjalan di instance {holder}.")
+            return
     
+    completed = False
     success_count = 0
     fail_count = 0
-    
-    for uid in user_ids:
-        try:
-            # Kirim pesan berdasarkan tipe
-            if message_to_forward.text:
-                # Perbaikan: Gunakan parse_mode yang benar
-                parse_mode = None
-                if message_to_forward.entities or message_to_forward.caption_entities:
-                    # Jika ada entities, gunakan MARKDOWN
-                    parse_mode = ParseMode.MARKDOWN
-                
-                await context.bot.send_message(
-                    chat_id=uid,
-                    text=message_to_forward.text,
-                    parse_mode=parse_mode,
-                    entities=message_to_forward.entities
-                )
-                
-            elif message_to_forward.photo:
-                await context.bot.send_photo(
-                    chat_id=uid,
-                    photo=message_to_forward.photo[-1].file_id,
-                    caption=message_to_forward.caption,
-                    parse_mode=ParseMode.MARKDOWN if message_to_forward.caption_entities else None,
-                    caption_entities=message_to_forward.caption_entities
-                )
-                
-            elif message_to_forward.video:
-                await context.bot.send_video(
-                    chat_id=uid,
-                    video=message_to_forward.video.file_id,
-                    caption=message_to_forward.caption,
-                    parse_mode=ParseMode.MARKDOWN if message_to_forward.caption_entities else None,
-                    caption_entities=message_to_forward.caption_entities
-                )
+    started = time.perf_counter()
+    try:
+        user_ids = UserManager.get_all_user_ids()
+        
+        await update.message.reply_text(f"📢 **Mulai broadcast ke {len(user_ids)} user...**")
+        
+        for uid in user_ids:
+            try:
+                # Kirim pesan berdasarkan tipe
+                if message_to_forward.text:
+                    # Perbaikan: Gunakan parse_mode yang benar
+                    parse_mode = None
+                    if message_to_forward.entities or message_to_forward.caption_entities:
+                        # Jika ada entities, gunakan MARKDOWN
+                        parse_mode = ParseMode.MARKDOWN
+                    
+                    await context.bot.send_message(
+                        chat_id=uid,
+                        text=message_to_forward.text,
+                        parse_mode=parse_mode,
+                        entities=message_to_forward.entities
+                    )
+                    
+                elif message_to_forward.photo:
+                    await context.bot.send_photo(
+                        chat_id=uid,
+                        photo=message_to_forward.photo[-1].file_id,
+                        caption=message_to_forward.caption,
+                        parse_mode=ParseMode.MARKDOWN if message_to_forward.caption_entities else None,
+                        caption_entities=message_to_forward.caption_entities
+                    )
+                    
+                elif message_to_forward.video:
+                    await context.bot.send_video(
+                        chat_id=uid,
+                        video=message_to_forward.video.file_id,
+                        caption=message_to_forward.caption,
+                        parse_mode=ParseMode.MARKDOWN if message_to_forward.caption_entities else None,
+                        caption_entities=message_to_forward.caption_entities
+                    )
+                    
+                elif message_to_forward.document:
+                    await context.bot.send_document(
+                        chat_id=uid,
+                        document=message_to_forward.document.file_id,
+                        caption=message_to_forward.caption,
+                        parse_mode=ParseMode.MARKDOWN if message_to_forward.caption_entities else None,
+                        caption_entities=message_to_forward.caption_entities
+                    )
+                    
+                else:
+                    # Try to forward as-is
+                    await message_to_forward.forward(chat_id=uid)
                 
-            elif message_to_forward.document:
-                await context.bot.send_document(
-                    chat_id=uid,
-                    document=message_to_forward.document.file_id,
-                    caption=message_to_forward.caption,
-                    parse_mode=ParseMode.MARKDOWN if message_to_forward.caption_entities else None,
-                    caption_entities=message_to_forward.caption_entities
-                )
+                success_count += 1
+                Metrics.inc("kapanbayar_broadcast_messages_total", {"result": "sent"})
+                await asyncio.sleep(0.1)  # Delay untuk menghindari limit
                 
+            except Exception as e:
+                logger.error(f"Failed to send to {uid}: {e}")
+                fail_count += 1
+                Metrics.inc("kapanbayar_broadcast_messages_total", {"result": "failed"})
+        
+        completed = True
+    finally:
+        if LEADER_ELECTION:
+            # Selesai (atau terputus setelah ada yang terkirim): simpan penanda agar update
+            # yang dikirim ulang tidak mengirim broadcast lagi
+            if completed or success_count:
+                await run_io(Lease.mark_done, lease_name, BROADCAST_DONE_TTL)
             else:
-                # Try to forward as-is
-                await message_to_forward.forward(chat_id=uid)
-            
-            success_count += 1
-            time.sleep(0.1)  # Delay untuk menghindari limit
-            
-        except Exception as e:
-            logger.error(f"Failed to send to {uid}: {e}")
-            fail_count += 1
+                await run_io(Lease.release, lease_name)
+    
+    duration = time.perf_counter() - started
+    Metrics.set_gauge("kapanbayar_broadcast_last_duration_seconds", duration)
+    Metrics.set_gauge("kapanbayar_broadcast_last_rate", success_count / duration if duration else 0.0)
     
     await update.message.reply_text(
         f"✅ **Broadcast selesai!**\n\n"
@@ -1188,7 +4500,7 @@ async def addjoin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not group_username.startswith('@'):
         group_username = '@' + group_username
     
-    if JoinGroupManager.add_group(group_username):
+    if await run_io(JoinGroupManager.add_group, group_username):
         await update.message.reply_text(
             f"✅ **Group berhasil ditambahkan!**\n\n"
             f"Group: {group_username}\n"
@@ -1261,7 +4573,7 @@ async def deljoin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         parse_mode=ParseMode.MARKDOWN
     )
     
-    context.user_data["state"] = "deleting_group"
+    set_state(context, "deleting_group")
 
 async def statsjoin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler untuk command /statsjoin"""
@@ -1280,14 +4592,22 @@ async def statsjoin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
-    # Dapatkan statistik join
-    join_stats = JoinGroupManager.check_all_users_joined()
+    # Export CSV dibuat di background agar command tetap cepat
+    if context.args and context.args[0].lower() == "csv":
+        await update.message.reply_text("⏳ **Menyiapkan export status join...**", parse_mode=ParseMode.MARKDOWN)
+        context.application.create_task(
+            send_join_users_export(update.effective_chat.id, context),
+            update=update
+        )
+        return
+    
+    # Dapatkan statistik join dari counter
+    join_counters = JoinGroupManager.get_join_counters()
     total_users = UserManager.get_total_users()
     
     stats_text = "📊 **Statistik Join Group**\n\n"
     
-    for group, user_ids in join_stats.items():
-        joined_count = len(user_ids)
+    for group, joined_count in join_counters.items():
         percentage = (joined_count / total_users * 100) if total_users > 0 else 0
         
         stats_text += (
@@ -1296,26 +4616,231 @@ async def statsjoin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"   📈 Persentase: {percentage:.1f}%\n\n"
         )
     
-    stats_text += f"👥 **Total User Bot:** {total_users} user"
+    stats_text += f"👥 **Total User Bot:** {total_users} user\n\n"
+    stats_text += "📁 Ketik /statsjoin csv untuk export status join."
     
-    # Kirim file join_users.json
-    if JOIN_USERS_FILE.exists():
-        with open(JOIN_USERS_FILE, 'rb') as f:
-            await update.message.reply_document(
-                document=f,
-                filename="join_users.json",
-                caption=stats_text
+    await update.message.reply_text(
+        stats_text,
+        parse_mode=ParseMode.MARKDOWN
+    )
+
+async def send_join_users_export(chat_id: int, context: ContextTypes.DEFAULT_TYPE):
+    """Membuat dan mengirim export status join ke owner"""
+    try:
+        buffer = await run_io(JoinGroupManager.export_join_users_csv)
+        with buffer:
+            await context.bot.send_document(
+                chat_id=chat_id,
+                document=buffer,
+                filename=f"join_users_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv.gz",
+                caption="📁 Export status join user"
             )
-    else:
+    except Exception as e:
+        logger.error(f"Error exporting join users: {e}")
+        await context.bot.send_message(chat_id=chat_id, text="❌ Gagal membuat export status join!")
+
+async def routestats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /routestats"""
+    user_id = update.effective_user.id
+    
+    if user_id != OWNER_ID:
+        await update.message.reply_text("❌ Akses ditolak!")
+        return
+    
+    snapshot = RouteStats.snapshot()
+    if not snapshot:
+        await update.message.reply_text("📭 Belum ada data latency route.")
+        return
+    
+    stats_text = "⏱️ Latency per route (ms)\n\n"
+    for route, stats in sorted(snapshot.items(), key=lambda item: item[1]["p95_ms"], reverse=True):
+        stats_text += (
+            f"{route}\n"
+            f"   n={stats['count']} avg={stats['avg_ms']:.1f} p50={stats['p50_ms']:.1f} "
+            f"p95={stats['p95_ms']:.1f} max={stats['max_ms']:.1f}\n"
+        )
+    
+    await update.message.reply_text(stats_text)
+
+async def floodstats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /floodstats"""
+    user_id = update.effective_user.id
+    
+    if user_id != OWNER_ID:
+        await update.message.reply_text("❌ Akses ditolak!")
+        return
+    
+    offenders = FloodLimiter.top_offenders()
+    if not offenders:
+        await update.message.reply_text("✅ Belum ada user yang terkena limit.")
+        return
+    
+    users = UserManager.load_users()["users"]
+    stats_text = (
+        f"🚦 Top user terkena limit\n"
+        f"Limit: {FLOOD_BURST} burst, {FLOOD_RATE:g}/detik • Bucket aktif: {len(FloodLimiter._buckets)}\n\n"
+    )
+    for i, (offender_id, drops) in enumerate(offenders, 1):
+        info = users.get(str(offender_id), {})
+        name = info.get("username") or info.get("first_name") or "-"
+        stats_text += f"{i}. {offender_id} ({name}) - {drops} update dibuang\n"
+    
+    await update.message.reply_text(stats_text)
+
+async def metrics_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /metrics"""
+    user_id = update.effective_user.id
+    
+    if user_id != OWNER_ID:
+        await update.message.reply_text("❌ Akses ditolak!")
+        return
+    
+    uptime = int(time.time() - Metrics.started_at)
+    stats_text = f"📈 Metrik Bot (uptime {uptime // 3600}j {uptime % 3600 // 60}m)\n\n"
+    
+    handlers = Metrics.histogram_summary("kapanbayar_handler_seconds")
+    if handlers:
+        stats_text += "⏱️ Handler (ms)\n"
+        for labels, stats in sorted(handlers.items(), key=lambda item: item[1]["count"], reverse=True)[:10]:
+            stats_text += (
+                f"{dict(labels)['handler']}\n"
+                f"   n={stats['count']} avg={stats['avg'] * 1000:.1f} "
+                f"p50={stats['p50'] * 1000:.1f} p95={stats['p95'] * 1000:.1f}\n"
+            )
+        stats_text += "\n"
+    
+    ops = Metrics.counter_values("kapanbayar_storage_ops_total")
+    if ops:
+        sizes = Metrics.counter_values("kapanbayar_storage_bytes_total")
+        stats_text += "💾 Storage\n"
+        for labels, count in sorted(ops.items()):
+            label = dict(labels)
+            stats_text += f"   {label['store']} {label['op']}: {count:.0f}x, {Metrics.format_bytes(sizes.get(labels, 0))}\n"
+        stats_text += "\n"
+    
+    api = Metrics.histogram_summary("kapanbayar_telegram_api_seconds")
+    if api:
+        calls = sum(stats["count"] for stats in api.values())
+        slowest = max(api.items(), key=lambda item: item[1]["p95"])
+        errors = Metrics.counter_values("kapanbayar_telegram_api_errors_total")
+        stats_text += (
+            f"📡 Telegram API: {calls} panggilan, {sum(errors.values()):.0f} error\n"
+            f"   p95 terlambat: {dict(slowest[0])['method']} {slowest[1]['p95'] * 1000:.0f} ms\n"
+        )
+        for labels, count in sorted(errors.items(), key=lambda item: item[1], reverse=True)[:5]:
+            label = dict(labels)
+            stats_text += f"   ❌ {label['method']} {label['error']}: {count:.0f}\n"
+        stats_text += "\n"
+    
+    ticks = Metrics.histogram_summary("kapanbayar_notification_tick_seconds").get(())
+    if ticks:
+        reminders = {dict(labels)["result"]: count for labels, count in Metrics.counter_values("kapanbayar_reminders_total").items()}
+        stats_text += (
+            f"🔔 Notifikasi: {ticks['count']} putaran, avg {ticks['avg'] * 1000:.0f} ms, "
+            f"{Metrics.gauge_value('kapanbayar_notification_users_scanned'):.0f} user\n"
+            f"   pengingat terkirim {reminders.get('sent', 0):.0f}, gagal {reminders.get('failed', 0):.0f}\n\n"
+        )
+    
+    broadcast = {dict(labels)["result"]: count for labels, count in Metrics.counter_values("kapanbayar_broadcast_messages_total").items()}
+    if broadcast:
+        stats_text += (
+            f"📢 Broadcast: {broadcast.get('sent', 0):.0f} terkirim, {broadcast.get('failed', 0):.0f} gagal\n"
+            f"   terakhir {Metrics.gauge_value('kapanbayar_broadcast_last_rate'):.1f} pesan/detik "
+            f"({Metrics.gauge_value('kapanbayar_broadcast_last_duration_seconds'):.0f} detik)\n\n"
+        )
+    
+    if Startup.total is not None:
+        stats_text += f"🚀 Startup: {Startup.total * 1000:.0f} ms{' (warm cache)' if Startup.warm_cache_used else ''}\n"
+        stats_text += f"   {Startup.report()}\n"
+        if Startup.first_response:
+            stats_text += f"   update pertama selesai {Startup.first_response[0]:.2f} s setelah start\n"
+        stats_text += "\n"
+    
+    errors = sum(Metrics.counter_values("kapanbayar_handler_errors_total").values())
+    drops = sum(Metrics.counter_values("kapanbayar_flood_drops_total").values())
+    stats_text += f"⚠️ Error handler: {errors:.0f} • Update dibuang anti-flood: {drops:.0f}"
+    if METRICS_PORT:
+        stats_text += f"\n\nPrometheus: http://{METRICS_LISTEN}:{METRICS_PORT}/metrics"
+    
+    await update.message.reply_text(stats_text)
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /profile"""
+    user_id = update.effective_user.id
+    
+    if user_id != OWNER_ID:
+        await update.message.reply_text("❌ Akses ditolak!")
+        return
+    
+    args = [arg.lower() for arg in context.args]
+    if args[:1] == ["stop"]:
+        if not Profiler.active:
+            await update.message.reply_text("ℹ️ Tidak ada profiling yang berjalan.")
+            return
+        Profiler.request_stop()
+        await update.message.reply_text("⏹️ Profiling dihentikan, laporan sedang disusun...")
+        return
+    
+    if Profiler.active:
+        elapsed = time.perf_counter() - Profiler.started_at
         await update.message.reply_text(
-            stats_text,
-            parse_mode=ParseMode.MARKDOWN
+            f"🔬 Profiling ({Profiler.mode}) sedang berjalan: {elapsed:.0f} detik, "
+            f"{Profiler.updates_seen} update.\nKirim /profile stop untuk mengakhiri."
+        )
+        return
+    
+    if Profiler.busy:
+        # Sesi sebelumnya sudah berhenti tapi laporannya belum selesai dikirim
+        await update.message.reply_text("⏳ Laporan profiling sebelumnya masih dikirim, coba lagi sebentar lagi.")
+        return
+    
+    if not args:
+        await update.message.reply_text(
+            "🔬 Profiling on-demand\n\n"
+            "/profile 30 - cProfile selama 30 detik\n"
+            "/profile updates 200 - cProfile untuk 200 update berikutnya\n"
+            "/profile 30 sample - sampling stack (overhead rendah)\n"
+            "/profile stop - akhiri lebih awal\n\n"
+            "Mencakup handler, thread notifikasi dan thread I/O. "
+            "Hasil dikirim sebagai laporan teks + file pstats (atau stack terlipat untuk mode sample)."
         )
+        return
+    
+    mode = "sample" if "sample" in args else "cprofile"
+    numbers = [arg for arg in args if arg not in ("sample", "cprofile", "updates")]
+    try:
+        value = int(numbers[0]) if numbers else 0
+    except ValueError:
+        value = 0
+    
+    if "updates" in args:
+        if not 1 <= value <= PROFILE_MAX_UPDATES:
+            await update.message.reply_text(f"❌ Jumlah update harus 1-{PROFILE_MAX_UPDATES}.")
+            return
+        seconds, updates = PROFILE_MAX_SECONDS, value
+        target = f"{updates} update berikutnya (maks {PROFILE_MAX_SECONDS // 60} menit)"
+    else:
+        if not 1 <= value <= PROFILE_MAX_SECONDS:
+            await update.message.reply_text(f"❌ Durasi harus 1-{PROFILE_MAX_SECONDS} detik.")
+            return
+        seconds, updates = value, 0
+        target = f"{seconds} detik"
+    
+    Profiler.start(mode, seconds, updates, update.effective_chat.id, update.update_id)
+    context.application.create_task(Profiler.watch(context.application))
+    await update.message.reply_text(f"🔬 Profiling {mode} dimulai untuk {target}.")
 
 # Error handler
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler untuk error"""
-    logger.error(f"Update {update} caused error {context.error}")
+    Metrics.inc("kapanbayar_handler_errors_total")
+    # Cukup id update dan user; repr Update lengkap terlalu besar untuk log
+    update_id = update.update_id if isinstance(update, Update) else "-"
+    user = update.effective_user if isinstance(update, Update) else None
+    logger.error(
+        f"Update {update_id} from user {user.id if user else '-'} caused {type(context.error).__name__}: {context.error}",
+        exc_info=context.error
+    )
     
     # Handle parse error khusus
     if "Can't parse entities" in str(context.error):
@@ -1337,49 +4862,400 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             except:
                 pass
 
-# Main function
-def main():
-    """Fungsi utama untuk menjalankan bot"""
-    # Buat aplikasi
-    application = Application.builder().token(TOKEN).build()
+# Class untuk fase startup eksplisit: siapkan direktori, muat data, catat waktunya
+class Startup:
+    timings = OrderedDict()
+    total = None
+    warm_cache_used = False
+    # (detik sejak import sampai update pertama selesai, durasi update pertama)
+    first_response = None
+    
+    @staticmethod
+    @contextlib.contextmanager
+    def phase(name: str):
+        """Mencatat durasi satu fase startup"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            Startup.timings[name] = elapsed
+            Metrics.set_gauge("kapanbayar_startup_seconds", elapsed, {"phase": name})
+    
+    @staticmethod
+    def run():
+        """Fase startup (di thread pool I/O), selesai sebelum update pertama diproses"""
+        with Startup.phase("directories"):
+            DATABASE_DIR.mkdir(exist_ok=True)
+        if WARM_CACHE:
+            with Startup.phase("warm_cache"):
+                Startup.warm_cache_used = Startup.load_warm_cache()
+        with Startup.phase("stores"):
+            JsonFileStore.load_all()
+    
+    @staticmethod
+    def finish():
+        """Mencatat total waktu sejak import dan memberi peringatan jika melewati STARTUP_BUDGET"""
+        Startup.total = time.perf_counter() - IMPORTED_AT
+        Metrics.set_gauge("kapanbayar_startup_seconds", Startup.total, {"phase": "total"})
+        message = f"Startup {Startup.total:.2f} s ({Startup.report()})"
+        if Startup.total > STARTUP_BUDGET:
+            logger.warning(f"{message} melebihi STARTUP_BUDGET {STARTUP_BUDGET:g} s")
+        else:
+            logger.info(message)
+    
+    @staticmethod
+    def report() -> str:
+        """Ringkasan durasi per fase dalam milidetik"""
+        return ", ".join(f"{name} {elapsed * 1000:.1f} ms" for name, elapsed in Startup.timings.items())
+    
+    @staticmethod
+    async def measure_first_response(coroutine):
+        """Memproses update pertama sambil mengukur time-to-first-response"""
+        start = time.perf_counter()
+        await coroutine
+        if Startup.first_response is None:
+            now = time.perf_counter()
+            Startup.first_response = (now - IMPORTED_AT, now - start)
+            Metrics.set_gauge("kapanbayar_time_to_first_response_seconds", Startup.first_response[0])
+            logger.info(
+                f"Update pertama selesai {Startup.first_response[0]:.2f} s setelah start "
+                f"(diproses {Startup.first_response[1] * 1000:.0f} ms)"
+            )
+    
+    @staticmethod
+    def load_warm_cache() -> bool:
+        """Memuat snapshot dalam satu kali baca; data store hanya dipakai jika file sumbernya tidak berubah"""
+        if not WARM_CACHE_FILE.exists():
+            return False
+        start = time.perf_counter()
+        with open(WARM_CACHE_FILE, 'rb') as f:
+            raw = f.read()
+        Metrics.record_io("warm_cache", "read", len(raw), time.perf_counter() - start)
+        try:
+            snapshot = json.loads(raw)
+        except ValueError as e:
+            logger.warning(f"Warm cache rusak, diabaikan: {e}")
+            return False
+        
+        stores = {store.path.as_posix(): store for store in JsonFileStore.instances}
+        for name, entry in snapshot.get("stores", {}).items():
+            store = stores.get(name)
+            signature = DebtManager._file_signature(store.path) if store else None
+            if signature is None or list(signature) != entry["signature"]:
+                continue
+            with store.lock:
+                if store._data is None:
+                    store._data = entry["data"]
+                    store._signature = signature
+        NotificationManager.load_schedule(snapshot.get("schedule", {}))
+        return True
+    
+    @staticmethod
+    def save_warm_cache():
+        """Menulis snapshot store dan jadwal pengingat (saat shutdown, setelah semua store di-flush)"""
+        start = time.perf_counter()
+        locks = {id(store.lock): store.lock for store in JsonFileStore.instances}
+        with contextlib.ExitStack() as stack:
+            for lock in locks.values():
+                stack.enter_context(lock)
+            stores = {}
+            for store in JsonFileStore.instances:
+                signature = DebtManager._file_signature(store.path)
+                if store._data is None or store._dirty or signature is None:
+                    continue
+                stores[store.path.as_posix()] = {"signature": list(signature), "data": store._data}
+            payload = json.dumps({
+                "created_at": datetime.now().isoformat(),
+                "stores": stores,
+                "schedule": NotificationManager.dump_schedule()
+            }, ensure_ascii=False)
+        
+        tmp_path = WARM_CACHE_FILE.with_name(WARM_CACHE_FILE.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(payload)
+        os.replace(tmp_path, WARM_CACHE_FILE)
+        Metrics.record_io("warm_cache", "write", len(payload), time.perf_counter() - start)
+
+async def post_init(application: Application):
+    """Dipanggil setelah bot siap, sambungkan pengirim notifikasi"""
+    await run_io(Startup.run)
+    if LEADER_ELECTION:
+        with Startup.phase("leader_election"):
+            await run_io(LeaderElection.renew)
+        application.bot_data["leader_task"] = asyncio.create_task(run_leader_election(application))
+    NotificationManager().attach(application.bot, asyncio.get_running_loop())
+    application.bot_data["state_expiry_task"] = asyncio.create_task(expire_conversation_states(application))
+    application.bot_data["persist_task"] = asyncio.create_task(persist_stores(application))
+    if BACKUP_INTERVAL > 0:
+        application.bot_data["backup_task"] = asyncio.create_task(scheduled_backups(application))
+    if RETENTION_INTERVAL > 0:
+        application.bot_data["retention_task"] = asyncio.create_task(scheduled_retention(application))
+    if ANALYTICS_INTERVAL > 0:
+        application.bot_data["analytics_task"] = asyncio.create_task(scheduled_analytics(application))
+    
+    if METRICS_PORT:
+        server = HTTPServer(TornadoApplication([(r"/metrics", MetricsHandler)]))
+        server.listen(METRICS_PORT, address=METRICS_LISTEN)
+        application.bot_data["metrics_server"] = server
+        logger.info(f"Metrics endpoint on http://{METRICS_LISTEN}:{METRICS_PORT}/metrics")
+    Startup.finish()
+
+async def post_shutdown(application: Application):
+    """Dipanggil saat bot berhenti"""
+    for name in ("state_expiry_task", "persist_task", "backup_task", "retention_task", "analytics_task", "leader_task"):
+        task = application.bot_data.pop(name, None)
+        if task:
+            task.cancel()
+    server = application.bot_data.pop("metrics_server", None)
+    if server:
+        server.stop()
+    if LEADER_ELECTION:
+        try:
+            await run_io(LeaderElection.resign)
+        except Exception as e:
+            logger.error(f"Error releasing leader lease: {e}")
+    # Tulis sisa perubahan data user/join yang masih di memori
+    await run_io(JsonFileStore.flush_all)
+    if WARM_CACHE:
+        try:
+            await run_io(Startup.save_warm_cache)
+        except Exception as e:
+            logger.error(f"Error writing warm cache: {e}")
+
+# Webhook server
+class WebhookState:
+    draining = False
+    started_at = time.time()
+
+class WebhookUpdateHandler(RequestHandler):
+    def initialize(self, bot_app: Application, secret: str):
+        self.bot_app = bot_app
+        self.secret = secret
+    
+    async def post(self):
+        """Menerima update dari Telegram"""
+        token = self.request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        # Dibandingkan sebagai bytes: header non-ASCII membuat compare_digest str melempar TypeError
+        if not hmac.compare_digest(token.encode("utf-8", "surrogateescape"), self.secret.encode("utf-8")):
+            self.set_status(403)
+            return
+        
+        # Saat shutdown, tolak update agar Telegram mengirim ulang nanti
+        if WebhookState.draining:
+            self.set_status(503)
+            return
+        
+        try:
+            update = Update.de_json(json.loads(self.request.body), self.bot_app.bot)
+        except Exception as e:
+            logger.warning(f"Invalid webhook payload: {e}")
+            self.set_status(400)
+            return
+        
+        await self.bot_app.update_queue.put(update)
+        self.set_status(200)
+
+class MetricsHandler(RequestHandler):
+    def get(self):
+        """Metrik dalam format Prometheus"""
+        self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.write(Metrics.render())
+
+class HealthHandler(RequestHandler):
+    def initialize(self, bot_app: Application):
+        self.bot_app = bot_app
+    
+    def get(self):
+        """Status kesehatan bot"""
+        self.set_status(503 if WebhookState.draining else 200)
+        self.write({
+            "status": "draining" if WebhookState.draining else "ok",
+            "mode": "webhook",
+            "pending_updates": self.bot_app.update_queue.qsize(),
+            "instance": INSTANCE_ID,
+            "leader": LeaderElection.holds_lease(),
+            "uptime": int(time.time() - WebhookState.started_at)
+        })
+
+async def run_webhook_server(application: Application):
+    """Menjalankan bot dengan server webhook lokal dan drain saat shutdown"""
+    # Secret acak tidak bisa dipakai untuk uji lokal dan akan berbeda di setiap instance
+    if not WEBHOOK_SECRET:
+        raise RuntimeError("WEBHOOK_SECRET wajib diisi untuk BOT_MODE=webhook")
+    secret = WEBHOOK_SECRET
+    
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    
+    if WEBHOOK_URL:
+        await application.bot.set_webhook(
+            url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+            secret_token=secret,
+            allowed_updates=Update.ALL_TYPES
+        )
+    await application.start()
+    
+    server = HTTPServer(TornadoApplication([
+        (rf"/{WEBHOOK_PATH}", WebhookUpdateHandler, {"bot_app": application, "secret": secret}),
+        (r"/health", HealthHandler, {"bot_app": application})
+    ]))
+    server.listen(WEBHOOK_PORT, address=WEBHOOK_LISTEN)
+    logger.info(f"Webhook server listening on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH}")
+    
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass  # Windows
+    
+    try:
+        await stop_event.wait()
+    finally:
+        # Drain: berhenti menerima update, selesaikan antrean yang tersisa
+        WebhookState.draining = True
+        server.stop()
+        deadline = time.monotonic() + WEBHOOK_DRAIN_TIMEOUT
+        while application.update_queue.qsize() and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        await server.close_all_connections()
+        
+        await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+# Class untuk memproses update secara paralel dengan urutan per user
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Update antar user berjalan paralel, update dari user yang sama tetap berurutan"""
+    
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self._user_locks: Dict[int, asyncio.Lock] = {}
+        self._user_waiters: Dict[int, int] = {}
+    
+    async def process_update(self, update, coroutine):
+        """Mengambil lock user dulu, baru slot semaphore, agar urutan per user terjaga"""
+        # process_update ditandai @final di PTB, tapi lock harus diambil sebelum semaphore:
+        # kalau di do_process_update, satu user yang spam bisa menghabiskan semua slot
+        user = update.effective_user if isinstance(update, Update) else None
+        if user is None:
+            await super().process_update(update, coroutine)
+            return
+        
+        user_id = user.id
+        lock = self._user_locks.setdefault(user_id, asyncio.Lock())
+        self._user_waiters[user_id] = self._user_waiters.get(user_id, 0) + 1
+        try:
+            async with lock:
+                await super().process_update(update, coroutine)
+        finally:
+            # Hapus lock yang tidak dipakai lagi agar dict tidak terus membesar
+            self._user_waiters[user_id] -= 1
+            if not self._user_waiters[user_id]:
+                del self._user_waiters[user_id]
+                del self._user_locks[user_id]
+    
+    async def do_process_update(self, update, coroutine):
+        # Setiap update berjalan di task sendiri, jadi id ini hanya berlaku untuk update ini
+        CORRELATION_ID.set(f"upd-{update.update_id}" if isinstance(update, Update) else "-")
+        if Startup.first_response is None:
+            await Startup.measure_first_response(coroutine)
+        else:
+            await coroutine
+        if Profiler.active:
+            Profiler.update_done(update)
+    
+    async def initialize(self):
+        pass
+    
+    async def shutdown(self):
+        pass
+
+def build_application(webhook: bool = False) -> Application:
+    """Membuat aplikasi bot beserta semua handler"""
+    builder = (
+        Application.builder()
+        .token(TOKEN)
+        .persistence(JsonStatePersistence())
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .concurrent_updates(PerUserUpdateProcessor(MAX_CONCURRENT_UPDATES))
+        .request(InstrumentedRequest(connection_pool_size=256))
+    )
+    if BOT_API_URL:
+        builder = builder.base_url(f"{BOT_API_URL}/bot").base_file_url(f"{BOT_API_URL}/file/bot")
+    if webhook:
+        builder = builder.updater(None)
+    application = builder.build()
+    
+    # Anti-flood, dijalankan sebelum handler lain (group -1)
+    application.add_handler(TypeHandler(Update, flood_guard), group=-1)
     
     # Command handlers
-    application.add_handler(CommandHandler("start", start_command))
-    application.add_handler(CommandHandler("help", help_command))
-    application.add_handler(CommandHandler("owner", owner_command))
-    application.add_handler(CommandHandler("stats", stats_command))
-    application.add_handler(CommandHandler("backupuser", backupuser_command))
-    application.add_handler(CommandHandler("broadcast", broadcast_command))
-    application.add_handler(CommandHandler("addjoin", addjoin_command))
-    application.add_handler(CommandHandler("listjoin", listjoin_command))
-    application.add_handler(CommandHandler("deljoin", deljoin_command))
-    application.add_handler(CommandHandler("statsjoin", statsjoin_command))
+    application.add_handler(CommandHandler("start", instrument("start_command", start_command)))
+    application.add_handler(CommandHandler("help", instrument("help_command", help_command)))
+    application.add_handler(CommandHandler("export", instrument("export_command", export_command)))
+    application.add_handler(CommandHandler("cari", instrument("cari_command", cari_command)))
+    application.add_handler(CommandHandler("jatuhtempo", instrument("jatuhtempo_command", jatuhtempo_command)))
+    application.add_handler(CommandHandler("owner", instrument("owner_command", owner_command)))
+    application.add_handler(CommandHandler("stats", instrument("stats_command", stats_command)))
+    application.add_handler(CommandHandler("backupuser", instrument("backupuser_command", backupuser_command)))
+    application.add_handler(CommandHandler("backup", instrument("backup_command", backup_command)))
+    application.add_handler(CommandHandler("retention", instrument("retention_command", retention_command)))
+    application.add_handler(CommandHandler("broadcast", instrument("broadcast_command", broadcast_command)))
+    application.add_handler(CommandHandler("addjoin", instrument("addjoin_command", addjoin_command)))
+    application.add_handler(CommandHandler("listjoin", instrument("listjoin_command", listjoin_command)))
+    application.add_handler(CommandHandler("deljoin", instrument("deljoin_command", deljoin_command)))
+    application.add_handler(CommandHandler("statsjoin", instrument("statsjoin_command", statsjoin_command)))
+    application.add_handler(CommandHandler("routestats", instrument("routestats_command", routestats_command)))
+    application.add_handler(CommandHandler("floodstats", instrument("floodstats_command", floodstats_command)))
+    application.add_handler(CommandHandler("metrics", instrument("metrics_command", metrics_command)))
+    application.add_handler(CommandHandler("profile", instrument("profile_command", profile_command)))
     
     # Callback query handler
-    application.add_handler(CallbackQueryHandler(button_handler))
+    application.add_handler(CallbackQueryHandler(instrument("button_handler", button_handler)))
     
     # Message handler
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, instrument("handle_message", handle_message)))
+    application.add_handler(MessageHandler(filters.Document.ALL, instrument("handle_document", handle_document)))
     
     # Error handler
     application.add_error_handler(error_handler)
     
+    return application
+
+# Main function
+def main():
+    """Fungsi utama untuk menjalankan bot"""
+    setup_logging()
+    webhook = BOT_MODE == "webhook"
+    application = build_application(webhook=webhook)
+    
     # Jalankan bot
     print("🤖 Kapan Bayar Bot sedang berjalan...")
     print(f"👑 Owner ID: {OWNER_ID}")
+    print(f"🌐 Mode: {'webhook' if webhook else 'polling'}")
     print("📊 Bot siap menerima perintah!")
     
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if webhook:
+        asyncio.run(run_webhook_server(application))
+    else:
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 if __name__ == "__main__":
-    # Inisialisasi Notification Manager
-    notification_manager = NotificationManager()
-    
+    # Notification Manager dijalankan dari post_init, setelah fase startup selesai
     try:
         main()
     except KeyboardInterrupt:
         print("\n🛑 Bot dihentikan.")
-        notification_manager.stop()
     except Exception as e:
         print(f"❌ Error: {e}")
-        notification_manager.stop()
+    finally:
+        if NotificationManager._instance:
+            NotificationManager._instance.stop()
@@ -0,0 +1,76 @@
+import os
+import sys
+import tempfile
+import unittest
+
+os.environ.setdefault("TOKEN", "123:test")
+os.environ.setdefault("OWNER_ID", "1")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import run  # noqa: E402
+from run import DebtManager  # noqa: E402
+
+
+class DebtManagerTest(unittest.TestCase):
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._tmp = tempfile.TemporaryDirectory()
+        os.chdir(self._tmp.name)
+        run.DATABASE_DIR.mkdir(exist_ok=True)
+        DebtManager._cache.clear()
+        DebtManager._versions.clear()
+        self.user_id = 1000
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+
+    def add(self, name, amount, payment_date):
+        return DebtManager.add_debt(self.user_id, {
+            "debtor_name": name, "amount": amount, "payment_date": payment_date,
+            "notification_time": "09:00", "notes": ""
+        })
+
+    def test_settled_debt_leaves_debtor_summary(self):
+        first = self.add("Ali", "100000", "2025/01/01")
+        self.add("Ali", "50000", "2025/03/01")
+
+        result = DebtManager.record_payment(self.user_id, first)
+
+        self.assertTrue(result["settled"])
+        entry = DebtManager.load_user_debts(self.user_id)["debtor_summary"]["ali"]
+        self.assertEqual(entry["count"], 1)
+        self.assertEqual(entry["total"], 50000)
+        self.assertEqual(entry["earliest_due"], "2025/03/01")
+
+    def test_settling_last_debt_removes_summary_entry(self):
+        debt_id = self.add("Budi", "20000", "2025/01/01")
+
+        DebtManager.record_payment(self.user_id, debt_id)
+
+        self.assertNotIn("budi", DebtManager.load_user_debts(self.user_id)["debtor_summary"])
+
+    def test_parse_amount(self):
+        cases = {
+            "100k": 100000, "1.5k": 1500, "1,5k": 1500, "50.000": 50000, "1.500.000": 1500000,
+            "Rp 25.000": 25000, "50000": 50000, "12.50": 12.5, "abc": 0, "": 0
+        }
+        for text, expected in cases.items():
+            self.assertEqual(DebtManager.parse_amount(text), expected, text)
+
+    def test_partial_payment_uses_parsed_balance(self):
+        debt_id = self.add("Citra", "1.5k", None)
+
+        result = DebtManager.record_payment(self.user_id, debt_id, 500)
+
+        self.assertFalse(result["settled"])
+        self.assertEqual(result["remaining"], 1000)
+
+    def test_invalid_amount_is_rejected(self):
+        for amount in ("abc", "0"):
+            with self.assertRaises(ValueError):
+                run.DebtImporter.parse_line(f"Dewi | {amount}")
+
+
+if __name__ == "__main__":
+    unittest.main()